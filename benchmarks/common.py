@@ -0,0 +1,80 @@
+import json
+import math
+import time
+import platform
+import contextlib
+from typing import List, Dict, Any, Optional
+
+from mcp import ClientSession
+from mcp.client.streamable_http import streamablehttp_client
+
+DEFAULT_URL = "http://127.0.0.1:8002/puddle-mcp/mcp"
+
+# ==========================================
+# STATS HELPERS
+# ==========================================
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile (pct in 0..100) of an unsorted list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+def summarize_latencies(latencies: List[float], errors: int = 0, wall_seconds: Optional[float] = None) -> Dict[str, Any]:
+    """Latency summary in milliseconds plus throughput when the wall time is known."""
+    summary = {
+        "calls": len(latencies),
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p90_ms": round(percentile(latencies, 90) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3) if latencies else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+    }
+    if wall_seconds:
+        summary["throughput_rps"] = round(len(latencies) / wall_seconds, 2)
+    return summary
+
+# ==========================================
+# RESULT FILES
+# ==========================================
+
+def save_results(path: str, results: Dict[str, Any]):
+    """Writes a results document with enough metadata to compare runs over time."""
+    document = {
+        "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "host": platform.node(),
+        **results,
+    }
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2, default=str)
+    print(f"Results written to {path}")
+
+def load_results(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+def print_table(rows: List[Dict[str, Any]], columns: List[str]):
+    """Prints a plain fixed-width table."""
+    widths = {c: max(len(c), *(len(str(r.get(c, ""))) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for r in rows:
+        print("  ".join(str(r.get(c, "")).ljust(widths[c]) for c in columns))
+
+# ==========================================
+# MCP CLIENT
+# ==========================================
+
+@contextlib.asynccontextmanager
+async def mcp_session(url: str = DEFAULT_URL, api_key: Optional[str] = None, headers: Optional[Dict[str, str]] = None):
+    """Opens an initialized MCP client session over streamable HTTP."""
+    all_headers = dict(headers or {})
+    if api_key:
+        all_headers["Authorization"] = f"Bearer {api_key}"
+    async with streamablehttp_client(url, headers=all_headers) as (read, write, _):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            yield session
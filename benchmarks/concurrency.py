@@ -0,0 +1,108 @@
+"""
+Concurrency benchmark: N parallel MCP clients calling tools on a running server.
+
+Measures per-call latency (p50/p99) and throughput while many clients share one
+worker, which is where blocking tools stall every other request.
+
+Usage (server started separately with `uvicorn server:app --port 8002`):
+
+    # Before: sync tools / blocking driver (e.g. the pre-async commit, or DB_ASYNC_DRIVER=threadpool)
+    python -m benchmarks.concurrency --clients 32 --calls 20 --label before --out before.json
+
+    # After: native async tools on the psycopg 3 pool
+    python -m benchmarks.concurrency --clients 32 --calls 20 --label after --out after.json
+
+    python -m benchmarks.concurrency --compare before.json after.json
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, Any, List
+
+from benchmarks.common import (
+    DEFAULT_URL, mcp_session, summarize_latencies, save_results, load_results, print_table,
+)
+
+DEFAULT_TOOL = "search_datasets_semantic"
+DEFAULT_ARGS = {"query": "daily stock market prices", "limit": 5}
+
+
+async def run_client(url: str, api_key: str, tool: str, args: Dict[str, Any], calls: int,
+                     latencies: List[float], errors: List[int], start: asyncio.Event):
+    async with mcp_session(url, api_key) as session:
+        await start.wait()
+        for _ in range(calls):
+            t0 = time.perf_counter()
+            try:
+                result = await session.call_tool(tool, args)
+                if result.isError:
+                    errors.append(1)
+            except Exception:
+                errors.append(1)
+            latencies.append(time.perf_counter() - t0)
+
+
+async def run_benchmark(url: str, api_key: str, tool: str, args: Dict[str, Any], clients: int, calls: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors: List[int] = []
+    start = asyncio.Event()
+
+    tasks = [
+        asyncio.create_task(run_client(url, api_key, tool, args, calls, latencies, errors, start))
+        for _ in range(clients)
+    ]
+    # Let every client finish its handshake so only tool calls are timed
+    await asyncio.sleep(1.0)
+    t0 = time.perf_counter()
+    start.set()
+    await asyncio.gather(*tasks)
+    wall = time.perf_counter() - t0
+
+    return summarize_latencies(latencies, errors=len(errors), wall_seconds=wall)
+
+
+def compare(paths: List[str]):
+    rows = []
+    for path in paths:
+        doc = load_results(path)
+        rows.append({"label": doc.get("label", path), "clients": doc.get("clients"), **doc["summary"]})
+    print_table(rows, ["label", "clients", "calls", "errors", "p50_ms", "p99_ms", "max_ms", "throughput_rps"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=DEFAULT_URL)
+    parser.add_argument("--api-key", default=None)
+    parser.add_argument("--tool", default=DEFAULT_TOOL)
+    parser.add_argument("--args", default=json.dumps(DEFAULT_ARGS), help="Tool arguments as JSON")
+    parser.add_argument("--clients", type=int, default=16, help="Number of parallel MCP clients")
+    parser.add_argument("--calls", type=int, default=20, help="Calls per client")
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--out", default=None, help="Write results JSON to this path")
+    parser.add_argument("--compare", nargs="+", default=None, help="Compare previously saved result files")
+    opts = parser.parse_args()
+
+    if opts.compare:
+        compare(opts.compare)
+        return
+
+    tool_args = json.loads(opts.args)
+    summary = asyncio.run(run_benchmark(opts.url, opts.api_key, opts.tool, tool_args, opts.clients, opts.calls))
+    print_table([{"label": opts.label, "clients": opts.clients, **summary}],
+                ["label", "clients", "calls", "errors", "p50_ms", "p99_ms", "max_ms", "throughput_rps"])
+
+    if opts.out:
+        save_results(opts.out, {
+            "benchmark": "concurrency",
+            "label": opts.label,
+            "tool": opts.tool,
+            "args": tool_args,
+            "clients": opts.clients,
+            "calls_per_client": opts.calls,
+            "summary": summary,
+        })
+
+
+if __name__ == "__main__":
+    main()
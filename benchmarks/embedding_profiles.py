@@ -0,0 +1,181 @@
+"""
+Embedding profiles compared on the stored catalog: index size, build time, latency and recall@k.
+
+For each profile the searchable dataset embeddings are copied into a scratch table
+(bench_profile_vectors), truncated to the profile's Matryoshka dimensions and
+stored at its precision, and indexed the way schema.ensure_vector_index would.
+Queries then run the same ordering semantic search uses (vector_search.vector_ordering),
+including the Hamming scan + exact re-rank of binary profiles. Recall@k is measured
+against exact full-precision search (1536-dim vector, index scans disabled).
+
+Run it while the stored embeddings use the full profile. Recall of truncated profiles
+is only meaningful with model embeddings: the fake client's vectors are not Matryoshka
+trained, so their prefixes lose information a real model keeps. halfvec and binary
+profiles need pgvector >= 0.7 and are reported as unsupported on older versions.
+
+    python -m benchmarks.seed --scale medium
+    python -m benchmarks.embedding_profiles --queries 50 --k 10 --out profiles.json
+    python -m benchmarks.embedding_profiles --profiles full 768 256-half 768-binary
+"""
+import argparse
+import random
+import time
+from typing import Any, Dict, List
+
+import psycopg2
+
+from benchmarks.common import summarize_latencies, save_results, print_table
+from benchmarks.seed import DOMAINS
+from puddle_server.embedding_profiles import EMBEDDING_PROFILES, active_profile, column_type, get_profile
+from puddle_server.fake_embeddings import fake_embedding
+from puddle_server.schema import vector_index_key
+from puddle_server.utils import get_db_connection
+from puddle_server.vector_search import (
+    HNSW_EF_CONSTRUCTION, HNSW_M, SEARCHABLE_DATASETS_PREDICATE, search_settings, vector_ordering,
+)
+
+TABLE = "bench_profile_vectors"
+QUERY_WORDS = ["daily", "history", "panel", "coverage", "feed", "global", "weekly", "regional"]
+
+
+def make_queries(count: int, dims: int, seed: int) -> List[List[float]]:
+    rng = random.Random(seed)
+    topics = [topic for topics in DOMAINS.values() for topic in topics]
+    texts = [f"{rng.choice(topics)} {' '.join(rng.sample(QUERY_WORDS, 2))}" for _ in range(count)]
+    return [fake_embedding(text, dims) for text in texts]
+
+
+def load_table(conn, profile: Dict[str, Any]) -> int:
+    """(Re)creates the scratch table with the datasets' vectors truncated and cast to the profile."""
+    dims = profile["dims"]
+    with conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cur.execute(f"CREATE TABLE {TABLE} (id uuid PRIMARY KEY, embedding {column_type(profile)})")
+        cur.execute(
+            f"""
+            INSERT INTO {TABLE}
+            SELECT id, (embedding::real[])[1:{dims}]::{column_type(profile)}
+            FROM datasets
+            WHERE embedding IS NOT NULL AND {SEARCHABLE_DATASETS_PREDICATE}
+            """
+        )
+        rows = cur.rowcount
+        cur.execute(f"ANALYZE {TABLE}")
+    conn.commit()
+    return rows
+
+
+def build_index(conn, profile: Dict[str, Any]) -> Dict[str, Any]:
+    with conn.cursor() as cur:
+        t0 = time.perf_counter()
+        cur.execute(
+            f"CREATE INDEX {TABLE}_ann_idx ON {TABLE} USING hnsw ({vector_index_key(profile, 'embedding')}) "
+            f"WITH (m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION})"
+        )
+        build_seconds = time.perf_counter() - t0
+        cur.execute(f"SELECT pg_relation_size('{TABLE}_ann_idx'), pg_table_size('{TABLE}')")
+        index_bytes, table_bytes = cur.fetchone()
+    conn.commit()
+    return {"build_seconds": round(build_seconds, 2), "index_bytes": index_bytes, "table_bytes": table_bytes}
+
+
+def top_k(conn, profile: Dict[str, Any], query: List[float], k: int, settings: Dict[str, Any]) -> List[str]:
+    distance_sql, scan_order_sql, scan_limit = vector_ordering(profile, k)
+    vector_param = str(query[:profile["dims"]])
+    with conn.cursor() as cur:
+        for name, value in settings.items():
+            cur.execute("SELECT set_config(%s, %s, true)", (name, str(value)))
+        cur.execute(
+            f"""
+            WITH nearest AS MATERIALIZED (
+                SELECT d.id, {distance_sql} AS distance
+                FROM {TABLE} d
+                ORDER BY {scan_order_sql}
+                LIMIT %s
+            )
+            SELECT id FROM nearest ORDER BY distance, id LIMIT %s
+            """,
+            (vector_param, vector_param, scan_limit, k),
+        )
+        ids = [str(r[0]) for r in cur.fetchall()]
+    conn.commit()
+    return ids
+
+
+def measure(conn, profile: Dict[str, Any], queries: List[List[float]], k: int, settings: Dict[str, Any]):
+    latencies, results = [], []
+    for query in queries:
+        t0 = time.perf_counter()
+        results.append(top_k(conn, profile, query, k, settings))
+        latencies.append(time.perf_counter() - t0)
+    return results, summarize_latencies(latencies)
+
+
+def recall(results: List[List[str]], truth: List[List[str]]) -> float:
+    found = sum(len(set(r) & set(t)) for r, t in zip(results, truth))
+    total = sum(len(t) for t in truth)
+    return round(found / total, 4) if total else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", nargs="+", choices=list(EMBEDDING_PROFILES), default=list(EMBEDDING_PROFILES))
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", default=None)
+    opts = parser.parse_args()
+
+    if active_profile()["name"] != "full":
+        raise SystemExit("Stored embeddings must use the full profile (the exact reference); switch back first.")
+
+    full = get_profile("full")
+    queries = make_queries(opts.queries, full["dims"], opts.seed)
+    conn = get_db_connection()
+    rows = []
+    try:
+        print("Computing exact full-precision top-k ...")
+        if not load_table(conn, full):
+            raise SystemExit("No searchable embeddings found; run `python -m benchmarks.seed` first.")
+        truth, exact = measure(conn, full, queries, opts.k, {"enable_indexscan": "off", "enable_bitmapscan": "off"})
+        rows.append({"profile": "exact", "type": column_type(full), "recall_at_k": 1.0, "p50_ms": exact["p50_ms"], "p99_ms": exact["p99_ms"]})
+
+        for name in opts.profiles:
+            profile = get_profile(name)
+            label = column_type(profile) + (" + bit" if profile["binary"] else "")
+            try:
+                count = load_table(conn, profile)
+                index = build_index(conn, profile)
+                scan_limit = vector_ordering(profile, opts.k)[2]
+                # Small catalogs with TOASTed 1536-dim rows look cheaper to scan than to index-search
+                settings = {**search_settings(min_candidates=scan_limit), "enable_seqscan": "off"}
+                results, summary = measure(conn, profile, queries, opts.k, settings)
+            except psycopg2.Error as e:
+                conn.rollback()
+                print(f"  {name}: unsupported here ({str(e).strip().splitlines()[0]})")
+                rows.append({"profile": name, "type": label, "error": str(e).strip().splitlines()[0]})
+                continue
+            row = {
+                "profile": name,
+                "type": label,
+                "rows": count,
+                "recall_at_k": recall(results, truth),
+                "p50_ms": summary["p50_ms"],
+                "p99_ms": summary["p99_ms"],
+                **index,
+            }
+            rows.append(row)
+            print(f"  {name}: recall {row['recall_at_k']}, p50 {row['p50_ms']} ms, index {row['index_bytes']} bytes")
+    finally:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        conn.commit()
+        conn.close()
+
+    print_table(rows, ["profile", "type", "recall_at_k", "p50_ms", "p99_ms", "index_bytes", "table_bytes", "build_seconds"])
+    if opts.out:
+        save_results(opts.out, {"benchmark": "embedding_profiles", "config": vars(opts), "rows": rows})
+
+
+if __name__ == "__main__":
+    main()
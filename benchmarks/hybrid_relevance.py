@@ -0,0 +1,127 @@
+"""
+Offline relevance and latency harness: pure vector search vs hybrid (full-text + vector) search.
+
+Reads a labeled query file (JSON Lines, one object per line):
+
+    {"query": "ACME-123 tick data", "relevant_ids": ["<dataset uuid>", ...]}
+
+embeds each query once, then runs every ranking mode over the same embedding and
+reports recall@k, MRR@k and nDCG@k alongside SQL latency percentiles.
+
+    python -m benchmarks.hybrid_relevance --labels queries.jsonl --k 10 --weights 1:1 1:2 2:1
+    python -m benchmarks.hybrid_relevance --make-labels sample.jsonl --count 200   # title -> dataset pairs
+"""
+import argparse
+import asyncio
+import json
+import math
+import time
+from typing import List, Dict, Any
+
+from benchmarks.common import summarize_latencies, save_results, print_table
+from puddle_server.embedding_profiles import active_profile
+from puddle_server.utils import run_pg_sql_async, get_embedding_async
+from puddle_server.vector_search import semantic_search_rows, hybrid_search_rows
+
+
+def load_labels(path: str) -> List[Dict[str, Any]]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def make_labels(path: str, count: int):
+    """Writes a synthetic label file: each query is a dataset title, relevant to that dataset."""
+    rows = await run_pg_sql_async(
+        """
+        SELECT id, title FROM datasets
+        WHERE visibility = 'public' AND status = 'active' AND embedding IS NOT NULL
+        ORDER BY random() LIMIT %s
+        """,
+        (count,),
+    )
+    with open(path, "w") as f:
+        for r in rows:
+            f.write(json.dumps({"query": r["title"], "relevant_ids": [str(r["id"])]}) + "\n")
+    print(f"Wrote {len(rows)} labeled queries to {path}")
+
+
+def score_ranking(ranked_ids: List[str], relevant: set, k: int) -> Dict[str, float]:
+    top = ranked_ids[:k]
+    hits = [1 if doc_id in relevant else 0 for doc_id in top]
+    recall = sum(hits) / len(relevant) if relevant else 0.0
+    mrr = next((1 / (i + 1) for i, h in enumerate(hits) if h), 0.0)
+    dcg = sum(h / math.log2(i + 2) for i, h in enumerate(hits))
+    ideal = sum(1 / math.log2(i + 2) for i in range(min(len(relevant), k)))
+    return {"recall": recall, "mrr": mrr, "ndcg": dcg / ideal if ideal else 0.0}
+
+
+async def evaluate(labels: List[Dict[str, Any]], k: int, weights: List[tuple]) -> List[Dict[str, Any]]:
+    dims = active_profile()["dims"]
+    embeddings = [await get_embedding_async(item["query"], output_dim=dims) for item in labels]
+
+    modes = [("vector", None)] + [(f"hybrid {vw:g}:{tw:g}", (vw, tw)) for vw, tw in weights]
+    report = []
+    for name, mode_weights in modes:
+        latencies, scores = [], []
+        for item, embedding in zip(labels, embeddings):
+            t0 = time.perf_counter()
+            if mode_weights is None:
+                rows = await semantic_search_rows(embedding, k)
+            else:
+                rows = await hybrid_search_rows(
+                    item["query"], embedding, k, vector_weight=mode_weights[0], text_weight=mode_weights[1],
+                )
+            latencies.append(time.perf_counter() - t0)
+            scores.append(score_ranking([str(r["id"]) for r in rows], set(item["relevant_ids"]), k))
+
+        n = len(scores) or 1
+        report.append({
+            "mode": name,
+            f"recall@{k}": round(sum(s["recall"] for s in scores) / n, 4),
+            f"mrr@{k}": round(sum(s["mrr"] for s in scores) / n, 4),
+            f"ndcg@{k}": round(sum(s["ndcg"] for s in scores) / n, 4),
+            **summarize_latencies(latencies),
+        })
+    return report
+
+
+def parse_weights(values: List[str]) -> List[tuple]:
+    pairs = []
+    for value in values:
+        vector_weight, text_weight = value.split(":")
+        pairs.append((float(vector_weight), float(text_weight)))
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--labels", help="Labeled query file (JSON Lines)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--weights", nargs="+", default=["1:1"], help="Hybrid vector:text weight pairs to compare")
+    parser.add_argument("--make-labels", metavar="PATH", help="Write a synthetic label file and exit")
+    parser.add_argument("--count", type=int, default=100, help="Queries for --make-labels")
+    parser.add_argument("--out", default=None)
+    opts = parser.parse_args()
+
+    if opts.make_labels:
+        asyncio.run(make_labels(opts.make_labels, opts.count))
+        return
+    if not opts.labels:
+        parser.error("--labels is required (or use --make-labels)")
+
+    labels = load_labels(opts.labels)
+    report = asyncio.run(evaluate(labels, opts.k, parse_weights(opts.weights)))
+    print_table(report, ["mode", f"recall@{opts.k}", f"mrr@{opts.k}", f"ndcg@{opts.k}", "p50_ms", "p99_ms"])
+
+    if opts.out:
+        save_results(opts.out, {
+            "benchmark": "hybrid_relevance",
+            "labels": opts.labels,
+            "queries": len(labels),
+            "k": opts.k,
+            "report": report,
+        })
+
+
+if __name__ == "__main__":
+    main()
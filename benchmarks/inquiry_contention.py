@@ -0,0 +1,109 @@
+"""
+Concurrency stress test for optimistic concurrency on inquiry writes.
+
+Creates one inquiry, then fires N parallel buyer agents at it. Each agent reads the
+state, adds its own key to buyer_inquiry and writes it back with update_buyer_json
+using the version it read, retrying on CONFLICT. Afterwards it checks that no update
+was lost: every key is present, every summary addition is there, and the version
+advanced exactly once per agent. Exits non-zero if any check fails.
+
+Runs the tool functions in-process against DATABASE_URL (a local Postgres):
+
+    python -m benchmarks.inquiry_contention --workers 300 --out contention.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+from typing import Dict, Any, List
+
+from benchmarks.common import summarize_latencies, save_results, print_table
+from puddle_server.utils import run_pg_sql_async
+from puddle_server.tools.inquiry_tools import (
+    create_buyer_inquiry, get_inquiry_full_state, update_buyer_json,
+)
+
+
+async def create_inquiry() -> str:
+    dataset = await run_pg_sql_async("SELECT id FROM datasets LIMIT 1", fetch_one=True)
+    if not dataset:
+        raise SystemExit("No datasets in the database; seed some first.")
+    message = await create_buyer_inquiry(
+        str(uuid.uuid4()), str(dataset["id"]), str(uuid.uuid4()), {"answers": {}}, "Stress test started.",
+    )
+    return message.split("ID: ")[1].split(",")[0]
+
+
+async def agent(inquiry_id: str, n: int, max_retries: int, stats: Dict[str, List]):
+    """One read-modify-write with retry; records latency until success and conflicts seen."""
+    t0 = time.perf_counter()
+    for attempt in range(max_retries + 1):
+        state = json.loads(await get_inquiry_full_state(inquiry_id))
+        buyer_inquiry = state["buyer_inquiry"]
+        buyer_inquiry["answers"][f"agent_{n}"] = n
+        result = await update_buyer_json(inquiry_id, state["version"], buyer_inquiry, f"Agent {n} answered.")
+        if not result.startswith("CONFLICT"):
+            stats["latencies"].append(time.perf_counter() - t0)
+            stats["conflicts"].append(attempt)
+            return
+        await asyncio.sleep(random.uniform(0, 0.002 * (attempt + 1)))
+    stats["gave_up"].append(n)
+
+
+async def run(workers: int, max_retries: int, keep: bool) -> Dict[str, Any]:
+    inquiry_id = await create_inquiry()
+    stats = {"latencies": [], "conflicts": [], "gave_up": []}
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(agent(inquiry_id, n, max_retries, stats) for n in range(workers)))
+    wall = time.perf_counter() - t0
+
+    final = json.loads(await get_inquiry_full_state(inquiry_id))
+    answers = final["buyer_inquiry"]["answers"]
+    succeeded = workers - len(stats["gave_up"])
+    checks = {
+        "all_keys_present": len(answers) == succeeded,
+        "all_summaries_present": final["summary"].count("answered.") == succeeded,
+        "version_matches_writes": final["version"] == 1 + succeeded,
+    }
+
+    if not keep:
+        await run_pg_sql_async("DELETE FROM inquiries WHERE id = %s", (inquiry_id,))
+
+    return {
+        "workers": workers,
+        "succeeded": succeeded,
+        "gave_up": len(stats["gave_up"]),
+        "total_conflicts": sum(stats["conflicts"]),
+        "max_retries_used": max(stats["conflicts"], default=0),
+        **summarize_latencies(stats["latencies"], wall_seconds=wall),
+        **checks,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=200, help="Parallel agents updating the same inquiry")
+    parser.add_argument("--max-retries", type=int, default=1000)
+    parser.add_argument("--keep", action="store_true", help="Keep the test inquiry afterwards")
+    parser.add_argument("--out", default=None)
+    opts = parser.parse_args()
+
+    report = asyncio.run(run(opts.workers, opts.max_retries, opts.keep))
+    print_table([report], [
+        "workers", "succeeded", "total_conflicts", "max_retries_used", "p50_ms", "p99_ms",
+        "all_keys_present", "all_summaries_present", "version_matches_writes",
+    ])
+
+    if opts.out:
+        save_results(opts.out, {"benchmark": "inquiry_contention", "config": vars(opts), "report": report})
+
+    ok = report["all_keys_present"] and report["all_summaries_present"] and report["version_matches_writes"]
+    sys.exit(0 if ok and not report["gave_up"] else 1)
+
+
+if __name__ == "__main__":
+    main()
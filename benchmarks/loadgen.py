@@ -0,0 +1,429 @@
+"""
+Load generator that replays recorded (or synthesized) agent sessions against the
+MCP endpoint and sweeps the load to find where the server saturates.
+
+A trace is a JSON-lines file of tool calls grouped by session, as written by a
+server running with TOOL_TRACE_PATH set (see puddle_server.trace_recorder). The
+`synthesize` command writes one from scripted personas over the data seeded by
+benchmarks.seed: buyer discovery sessions, buyers who go on to open and refine
+an inquiry, and vendor agents that poll, claim and answer their queue.
+
+Replays keep each session's think time (scaled by --think-scale). Inquiry IDs
+created or claimed during a session are re-bound to the IDs the replay gets back,
+and expected_version follows the versions the server reports. A CONFLICT is
+counted and retried once, as an agent would.
+
+  closed loop:  --concurrency 1 2 4 8 16   virtual users, each replaying sessions back to back
+  open loop:    --rate 0.5 1 2 4           session arrivals per second (Poisson)
+
+Each level runs for --duration seconds and reports throughput, per-tool latency
+percentiles and error rates. The saturation curve marks the last level at which
+throughput still grew. Unless --url is given, a server is spawned with uvicorn
+in a separate process (EMBEDDING_CLIENT=fake by default); set DB_ASYNC_DRIVER=threadpool
+to load the sync/psycopg2 path.
+
+    python -m benchmarks.seed --scale small
+    python -m benchmarks.loadgen synthesize --sessions 200 --out trace.jsonl
+    python -m benchmarks.loadgen replay trace.jsonl --concurrency 1 4 16 64 --duration 30 --out curve.json
+    DB_ASYNC_DRIVER=threadpool python -m benchmarks.loadgen replay trace.jsonl --rate 1 2 4 8 --think-scale 0.1
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from benchmarks.common import mcp_session, percentile, summarize_latencies, save_results, print_table
+from benchmarks.seed import BENCH_EMAIL_DOMAIN
+from benchmarks.tool_suite import READ_SCENARIOS
+from puddle_server.utils import get_db_connection
+from puddle_server.trace_recorder import result_id
+
+# Also matches the compact and structured JSON of output modes ("version":3)
+_VERSION = re.compile(r'"?version"?: ?(\d+)')
+
+# ==========================================
+# TRACES
+# ==========================================
+
+def load_trace(path: str) -> List[List[Dict[str, Any]]]:
+    """Reads a trace file into sessions: lists of calls with `offset` seconds from the session start."""
+    sessions: Dict[str, List[Dict[str, Any]]] = {}
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                sessions.setdefault(str(entry.get("session")), []).append(entry)
+    result = []
+    for calls in sessions.values():
+        calls.sort(key=lambda c: c["at"])
+        start = calls[0]["at"]
+        result.append([{**c, "offset": c["at"] - start} for c in calls])
+    return result
+
+
+def _hot_fixtures(vendors: int) -> Dict[str, Any]:
+    """A few seeded vendors and their public datasets, so vendor personas find buyer inquiries."""
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT v.id::text, array_agg(d.id::text ORDER BY d.id)
+                FROM vendors v JOIN datasets d ON d.vendor_id = v.id
+                WHERE v.contact_email LIKE %s AND d.visibility = 'public' AND d.status = 'active'
+                GROUP BY v.id ORDER BY v.id LIMIT %s
+                """,
+                (f"%.{BENCH_EMAIL_DOMAIN}", vendors),
+            )
+            rows = cur.fetchall()
+            cur.execute(
+                "SELECT id::text, name FROM vendors WHERE contact_email LIKE %s ORDER BY id LIMIT 500",
+                (f"%.{BENCH_EMAIL_DOMAIN}",),
+            )
+            all_vendors = cur.fetchall()
+    finally:
+        conn.close()
+    if not rows:
+        raise SystemExit("No seeded data found; run `python -m benchmarks.seed` first.")
+    return {
+        "hot_vendors": {vendor_id: datasets for vendor_id, datasets in rows},
+        "vendor_ids": [v[0] for v in all_vendors],
+        "vendor_words": sorted({w for _, name in all_vendors for w in name.split() if not w.isdigit()}),
+        "dataset_ids": [d for _, datasets in rows for d in datasets],
+    }
+
+
+def synthesize(sessions: int, seed: int, hot_vendors: int) -> List[Dict[str, Any]]:
+    """Trace entries for `sessions` scripted agent sessions (5:3:2 discovery / inquiry / vendor)."""
+    rng = random.Random(seed)
+    fx = _hot_fixtures(hot_vendors)
+    entries = []
+
+    for n in range(sessions):
+        session, clock = f"synthetic-{n}", 0.0
+        calls: List[Dict[str, Any]] = []
+
+        def add(tool: str, args: Dict[str, Any], result_id: Optional[str] = None, think: tuple = (0.5, 3.0)):
+            nonlocal clock
+            clock += rng.uniform(*think)
+            entry = {"session": session, "at": clock, "tool": tool, "args": args}
+            if result_id:
+                entry["result_id"] = result_id
+            calls.append(entry)
+
+        persona = rng.choices(["discovery", "inquiry", "vendor"], weights=[5, 3, 2])[0]
+        if persona in ("discovery", "inquiry"):
+            steps = rng.randint(3, 6) if persona == "discovery" else 2
+            for tool in rng.choices(list(READ_SCENARIOS), k=steps):
+                add(tool, READ_SCENARIOS[tool](rng, fx))
+        if persona == "inquiry":
+            vendor_id = rng.choice(list(fx["hot_vendors"]))
+            placeholder = f"$inquiry-{n}"
+            add("create_buyer_inquiry", {
+                "buyer_id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "dataset_id": rng.choice(fx["hot_vendors"][vendor_id]),
+                "conversation_id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "initial_state_json": {"questions": ["Coverage?"], "budget": rng.randint(1, 50) * 1000},
+                "initial_summary": "The buyer asked about coverage.",
+            }, result_id=placeholder)
+            add("get_inquiry_full_state", {"inquiry_id": placeholder})
+            add("patch_buyer_json", {
+                "inquiry_id": placeholder, "expected_version": 1,
+                "merge_patch": {"questions": ["Coverage?", "Update frequency?"]},
+                "summary_addition": "They asked about the update frequency.",
+            })
+            add("get_inquiry_full_state", {"inquiry_id": placeholder, "paths": ["vendor_response"]}, think=(5.0, 15.0))
+        if persona == "vendor":
+            vendor_id, worker = rng.choice(list(fx["hot_vendors"])), f"vendor-agent-{n}"
+            placeholder = f"$claim-{n}"
+            add("get_vendor_work_queue", {"vendor_id": vendor_id})
+            add("wait_for_vendor_work", {"vendor_id": vendor_id, "timeout_seconds": 5})
+            add("claim_vendor_work", {"vendor_id": vendor_id, "worker_id": worker}, result_id=placeholder)
+            add("update_vendor_response_json", {
+                "inquiry_id": placeholder, "expected_version": 1,
+                "new_response_json": {"answers": ["Yes"], "price": rng.randint(1, 50) * 1000},
+                "summary_addition": "The vendor sent a quote.", "worker_id": worker,
+            }, think=(2.0, 8.0))
+        entries.extend(calls)
+    return entries
+
+# ==========================================
+# REPLAY
+# ==========================================
+
+class LevelStats:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.conflicts = 0
+        self.skipped = 0
+        self.sessions = 0
+        self.dropped = 0
+
+    def record(self, tool: str, seconds: float, failed: bool):
+        self.latencies.setdefault(tool, []).append(seconds)
+        if failed:
+            self.errors[tool] = self.errors.get(tool, 0) + 1
+
+
+def _bound_id(tool: str, text: str) -> Optional[str]:
+    # Parsed like the recorder parsed the original result, whatever the output mode
+    return result_id(tool, text)
+
+
+def _resolve(args: Dict[str, Any], bindings: Dict[str, str], versions: Dict[str, int]) -> Optional[Dict[str, Any]]:
+    """Maps recorded inquiry IDs to this replay's, or None if the session never got one (e.g. empty claim)."""
+    resolved = {}
+    for key, value in args.items():
+        if isinstance(value, str) and value in bindings:
+            value = bindings[value]
+        elif isinstance(value, str) and value.startswith("$"):
+            return None
+        resolved[key] = value
+    inquiry_id = resolved.get("inquiry_id")
+    if "expected_version" in resolved and inquiry_id in versions:
+        resolved["expected_version"] = versions[inquiry_id]
+    return resolved
+
+
+async def _call(session, stats: LevelStats, tool: str, args: Dict[str, Any]) -> str:
+    t0 = time.perf_counter()
+    try:
+        result = await session.call_tool(tool, args)
+        text = "\n".join(getattr(c, "text", "") for c in result.content)
+        failed = result.isError or text.startswith("Error")
+    except Exception as e:
+        text, failed = f"Error: {e}", True
+    stats.record(tool, time.perf_counter() - t0, failed)
+    return text
+
+
+async def replay_session(session, calls: List[Dict[str, Any]], think_scale: float, stats: LevelStats, deadline: float):
+    bindings: Dict[str, str] = {}
+    versions: Dict[str, int] = {}
+    previous = 0.0
+    for entry in calls:
+        pause = (entry["offset"] - previous) * think_scale
+        previous = entry["offset"]
+        if time.monotonic() + pause > deadline:
+            return
+        if pause > 0:
+            await asyncio.sleep(pause)
+
+        args = _resolve(entry["args"], bindings, versions)
+        if args is None:
+            stats.skipped += 1
+            continue
+        tool = entry["tool"]
+        text = await _call(session, stats, tool, args)
+        if text.startswith("CONFLICT"):
+            stats.conflicts += 1
+            match = _VERSION.search(text)
+            if match:
+                args["expected_version"] = int(match.group(1))
+                text = await _call(session, stats, tool, args)
+
+        new_id = _bound_id(tool, text) if entry.get("result_id") else None
+        if new_id:
+            bindings[entry["result_id"]] = new_id
+        inquiry_id = new_id or args.get("inquiry_id")
+        match = _VERSION.search(text)
+        if inquiry_id and match:
+            versions[inquiry_id] = int(match.group(1))
+    stats.sessions += 1
+
+
+async def closed_loop(url: str, api_key: Optional[str], sessions: List[List[Dict[str, Any]]], users: int,
+                      duration: float, think_scale: float) -> LevelStats:
+    """`users` virtual users, each replaying sessions back to back until the deadline."""
+    stats = LevelStats()
+    deadline = time.monotonic() + duration
+
+    async def user(i: int):
+        n = i
+        async with mcp_session(url, api_key, {"X-Trace-Session": f"loadgen-user-{i}"}) as session:
+            while time.monotonic() < deadline:
+                await replay_session(session, sessions[n % len(sessions)], think_scale, stats, deadline)
+                n += users
+
+    await asyncio.gather(*(user(i) for i in range(users)))
+    return stats
+
+
+async def open_loop(url: str, api_key: Optional[str], sessions: List[List[Dict[str, Any]]], rate: float,
+                    duration: float, think_scale: float, max_inflight: int, seed: int) -> LevelStats:
+    """Sessions arrive as a Poisson process at `rate` per second, each on its own MCP session."""
+    stats = LevelStats()
+    rng = random.Random(seed)
+    deadline = time.monotonic() + duration
+    tasks = set()
+
+    async def visit(n: int):
+        try:
+            async with mcp_session(url, api_key, {"X-Trace-Session": f"loadgen-visit-{n}"}) as session:
+                await replay_session(session, sessions[n % len(sessions)], think_scale, stats, deadline)
+        except Exception:
+            stats.record("session_setup", 0.0, True)
+
+    n = 0
+    while time.monotonic() < deadline:
+        await asyncio.sleep(rng.expovariate(rate))
+        if len(tasks) >= max_inflight:
+            stats.dropped += 1
+            continue
+        task = asyncio.create_task(visit(n))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        n += 1
+    if tasks:
+        await asyncio.gather(*tasks)
+    return stats
+
+
+def summarize_level(level: float, stats: LevelStats, duration: float) -> Dict[str, Any]:
+    all_latencies = [x for values in stats.latencies.values() for x in values]
+    errors = sum(stats.errors.values())
+    summary = summarize_latencies(all_latencies, errors=errors, wall_seconds=duration)
+    summary.update({
+        "level": level,
+        "error_rate": round(errors / len(all_latencies), 4) if all_latencies else 0.0,
+        "sessions": stats.sessions,
+        "conflicts": stats.conflicts,
+        "skipped": stats.skipped,
+        "dropped": stats.dropped,
+        "tools": {
+            tool: {
+                "calls": len(values),
+                "error_rate": round(stats.errors.get(tool, 0) / len(values), 4),
+                "p50_ms": round(percentile(values, 50) * 1000, 3),
+                "p90_ms": round(percentile(values, 90) * 1000, 3),
+                "p99_ms": round(percentile(values, 99) * 1000, 3),
+            }
+            for tool, values in sorted(stats.latencies.items())
+        },
+    })
+    return summary
+
+
+def saturation_level(curve: List[Dict[str, Any]], min_gain: float = 0.05) -> Optional[float]:
+    """Last level whose throughput grew by at least `min_gain` over the level before it."""
+    best = curve[0]["level"] if curve else None
+    for previous, current in zip(curve, curve[1:]):
+        if current.get("throughput_rps", 0) >= previous.get("throughput_rps", 0) * (1 + min_gain):
+            best = current["level"]
+        else:
+            break
+    return best
+
+# ==========================================
+# SERVER
+# ==========================================
+
+@contextlib.contextmanager
+def spawned_server(startup_timeout: float = 30.0):
+    """Runs `uvicorn server:app` in a child process on a free port."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    env = {"EMBEDDING_CLIENT": "fake", **os.environ}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            if proc.poll() is not None:
+                raise SystemExit("Server process exited during startup")
+            with contextlib.suppress(OSError), socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                break
+            if time.monotonic() > deadline:
+                raise SystemExit("Server did not start in time")
+            time.sleep(0.2)
+        yield f"http://127.0.0.1:{port}/puddle-mcp/mcp"
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+async def sweep(url: str, opts) -> List[Dict[str, Any]]:
+    sessions = load_trace(opts.trace)
+    levels = opts.rate or opts.concurrency
+    curve = []
+    for level in levels:
+        if opts.rate:
+            stats = await open_loop(url, opts.api_key, sessions, level, opts.duration, opts.think_scale,
+                                    opts.max_inflight, opts.seed)
+        else:
+            stats = await closed_loop(url, opts.api_key, sessions, int(level), opts.duration, opts.think_scale)
+        summary = summarize_level(level, stats, opts.duration)
+        curve.append(summary)
+        print(f"  level {level}: {summary['throughput_rps']} calls/s, p99 {summary['p99_ms']} ms, "
+              f"errors {summary['error_rate']:.2%}, sessions {summary['sessions']}")
+    return curve
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    synth = commands.add_parser("synthesize", help="Write a trace of scripted agent sessions")
+    synth.add_argument("--sessions", type=int, default=200)
+    synth.add_argument("--hot-vendors", type=int, default=10, help="Vendors that receive the synthetic inquiries")
+    synth.add_argument("--seed", type=int, default=42)
+    synth.add_argument("--out", required=True)
+
+    replay = commands.add_parser("replay", help="Replay a trace at increasing load")
+    replay.add_argument("trace")
+    replay.add_argument("--url", default=None, help="Target a running server instead of spawning one")
+    replay.add_argument("--api-key", default=None)
+    mode = replay.add_mutually_exclusive_group()
+    mode.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="Closed-loop virtual users per level")
+    mode.add_argument("--rate", type=float, nargs="+", default=None, help="Open-loop session arrivals per second per level")
+    replay.add_argument("--duration", type=float, default=30.0, help="Seconds per level")
+    replay.add_argument("--think-scale", type=float, default=1.0, help="Multiplier for recorded think time (0 = none)")
+    replay.add_argument("--max-inflight", type=int, default=2000, help="Open loop: sessions in flight before arrivals are dropped")
+    replay.add_argument("--seed", type=int, default=42)
+    replay.add_argument("--label", default="run")
+    replay.add_argument("--out", default=None)
+    opts = parser.parse_args()
+
+    if opts.command == "synthesize":
+        entries = synthesize(opts.sessions, opts.seed, opts.hot_vendors)
+        with open(opts.out, "w") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+        print(f"Wrote {len(entries)} calls in {opts.sessions} sessions to {opts.out}")
+        return
+
+    with contextlib.ExitStack() as stack:
+        url = opts.url or stack.enter_context(spawned_server())
+        curve = asyncio.run(sweep(url, opts))
+
+    print_table(curve, ["level", "calls", "errors", "error_rate", "p50_ms", "p99_ms", "throughput_rps", "sessions", "conflicts", "dropped"])
+    knee = saturation_level(curve)
+    print(f"Throughput stopped growing after level {knee}" if knee != curve[-1]["level"] else "No saturation within the tested levels")
+
+    if opts.out:
+        save_results(opts.out, {
+            "benchmark": "loadgen",
+            "label": opts.label,
+            "mode": "open" if opts.rate else "closed",
+            "config": {k: v for k, v in vars(opts).items() if k != "api_key"},
+            "db_async_driver": os.environ.get("DB_ASYNC_DRIVER", "psycopg"),
+            "saturation_level": knee,
+            "curve": curve,
+        })
+
+
+if __name__ == "__main__":
+    main()
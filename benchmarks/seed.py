@@ -0,0 +1,267 @@
+"""
+Deterministic synthetic catalog for benchmarks.
+
+Seeds vendors, datasets (with embeddings from the fake embedding client at the
+active embedding profile's dimensions, so semantic search behaves sensibly without
+Gemini), dataset_columns and inquiries at a named scale. The same --seed always produces the same rows and IDs, so runs
+on different machines or commits see identical data. Seeded vendors use
+@bench.invalid contact emails; --reset removes everything seeded (including
+inquiries created by benchmark runs against those vendors).
+
+    python -m benchmarks.seed --scale small
+    python -m benchmarks.seed --scale medium --seed 7
+    python -m benchmarks.seed --vendors 100 --datasets 5000 --columns 10 --inquiries 1000
+    python -m benchmarks.seed --reset
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+from typing import Dict, Any, List
+
+from psycopg2.extras import execute_values
+
+from puddle_server.backfill import build_embedding_text, content_hash
+from puddle_server.embedding_profiles import active_profile
+from puddle_server.fake_embeddings import fake_embedding
+from puddle_server.schema import apply_migrations
+from puddle_server.utils import get_db_connection
+
+# vendors, datasets, columns per dataset, inquiries
+SCALES = {
+    "small": (50, 1_000, 8, 200),
+    "medium": (500, 20_000, 12, 5_000),
+    "large": (2_000, 100_000, 16, 50_000),
+}
+BENCH_EMAIL_DOMAIN = "bench.invalid"
+NAMESPACE = uuid.UUID("6f1c1e52-4d1b-4a39-9a57-2f0c8f1e8b10")
+
+DOMAINS = {
+    "Finance": ["stock prices", "bond yields", "fx rates", "credit card transactions", "earnings estimates"],
+    "Healthcare": ["hospital admissions", "drug prescriptions", "clinical trials", "insurance claims", "patient outcomes"],
+    "Retail": ["point of sale transactions", "product prices", "foot traffic", "basket composition", "online reviews"],
+    "Energy": ["electricity demand", "oil production", "solar generation", "gas prices", "grid outages"],
+    "Logistics": ["shipping container movements", "freight rates", "port congestion", "truck GPS traces", "delivery times"],
+    "Real Estate": ["home sales", "rental listings", "commercial leases", "building permits", "property tax assessments"],
+    "Agriculture": ["crop yields", "soil moisture", "livestock prices", "fertilizer usage", "weather stations"],
+    "Telecom": ["mobile network coverage", "call detail records", "broadband speeds", "device shipments", "roaming usage"],
+}
+INDUSTRY_WORDS = ["Analytics", "Data", "Insights", "Intelligence", "Labs", "Metrics", "Research", "Signals"]
+VENDOR_PREFIXES = ["Global", "Northwind", "Blue Harbor", "Summit", "Vertex", "Meridian", "Atlas", "Cobalt", "Pioneer", "Keystone"]
+ADJECTIVES = ["Daily", "Global", "Historical", "Real-time", "Regional", "Granular", "Aggregated", "Weekly"]
+PRICING = ["Free", "Subscription", "Usage-based", "One-time purchase"]
+GRANULARITY = ["Hourly", "Daily", "Weekly", "Monthly", "Transaction-level"]
+LICENSES = ["CC-BY-4.0", "Commercial", "Research only", "Proprietary"]
+COUNTRIES = ["United States", "Germany", "France", "Japan", "Brazil", "India", "United Kingdom", "Canada"]
+REGIONS = {"United States": "North America", "Canada": "North America", "Brazil": "South America",
+           "Germany": "Europe", "France": "Europe", "United Kingdom": "Europe", "Japan": "Asia", "India": "Asia"}
+COLUMN_TYPES = [("date", "date", ["2024-01-01", "2024-01-02"]), ("region", "text", ["North", "South"]),
+                ("value", "numeric", [12.5, 13.1]), ("count", "integer", [10, 42]), ("category", "text", ["A", "B"]),
+                ("price", "numeric", [99.9, 101.2]), ("country_code", "text", ["US", "DE"]), ("source", "text", ["api", "survey"]),
+                ("latitude", "numeric", [40.71, 52.52]), ("longitude", "numeric", [-74.0, 13.4]), ("is_verified", "boolean", [True, False]),
+                ("updated_at", "timestamp", ["2024-01-01T00:00:00Z"]), ("quantity", "integer", [1, 5]), ("currency", "text", ["USD", "EUR"]),
+                ("segment", "text", ["enterprise", "consumer"]), ("score", "numeric", [0.42, 0.87])]
+
+
+def seeded_id(kind: str, seed: int, n: int) -> str:
+    return str(uuid.uuid5(NAMESPACE, f"{kind}:{seed}:{n}"))
+
+
+def make_vendor(rng: random.Random, seed: int, n: int) -> Dict[str, Any]:
+    domain = rng.choice(list(DOMAINS))
+    country = rng.choice(COUNTRIES)
+    name = f"{rng.choice(VENDOR_PREFIXES)} {domain} {rng.choice(INDUSTRY_WORDS)} {n}"
+    return {
+        "id": seeded_id("vendor", seed, n),
+        "name": name,
+        "industry_focus": domain,
+        "description": f"{name} sells {domain.lower()} data covering {', '.join(rng.sample(DOMAINS[domain], 2))}.",
+        "country": country,
+        "region": REGIONS[country],
+        "city": None,
+        "organization_type": rng.choice(["Private company", "Public company", "Non-profit", "Government agency"]),
+        "founded_year": rng.randint(1980, 2022),
+        "website_url": f"https://vendor-{n}.{BENCH_EMAIL_DOMAIN}",
+        "contact_email": f"sales@vendor-{n}.{BENCH_EMAIL_DOMAIN}",
+    }
+
+
+def make_dataset(rng: random.Random, seed: int, n: int, vendor: Dict[str, Any], columns: int) -> Dict[str, Any]:
+    domain = vendor["industry_focus"] if rng.random() < 0.8 else rng.choice(list(DOMAINS))
+    subject = rng.choice(DOMAINS[domain])
+    countries = rng.sample(COUNTRIES, rng.randint(1, 3))
+    start_year = rng.randint(2000, 2020)
+    cols = rng.sample(COLUMN_TYPES, min(columns, len(COLUMN_TYPES)))
+    while len(cols) < columns:
+        base = rng.choice(COLUMN_TYPES)
+        cols.append((f"{base[0]}_{len(cols)}", base[1], base[2]))
+    return {
+        "id": seeded_id("dataset", seed, n),
+        "vendor_id": vendor["id"],
+        "title": f"{rng.choice(ADJECTIVES)} {subject} ({', '.join(countries)}) #{n}",
+        "description": (
+            f"{rng.choice(GRANULARITY)} {subject} for {', '.join(countries)} from {start_year}. "
+            f"Collected by {vendor['name']} and cleaned for {domain.lower()} analysis."
+        ),
+        "domain": domain,
+        "granularity": rng.choice(GRANULARITY),
+        "pricing_model": rng.choice(PRICING),
+        "license": rng.choice(LICENSES),
+        "temporal_coverage": json.dumps({"start": f"{start_year}-01-01", "end": "2024-12-31"}),
+        "geographic_coverage": json.dumps({"countries": countries}),
+        "visibility": "public" if rng.random() < 0.95 else "private",
+        "status": "active" if rng.random() < 0.97 else "archived",
+        "columns": [
+            {
+                "id": seeded_id("column", seed, n * 1000 + i),
+                "name": name,
+                "description": f"{name.replace('_', ' ').capitalize()} of the {subject} record",
+                "data_type": data_type,
+                "sample_values": json.dumps(samples),
+            }
+            for i, (name, data_type, samples) in enumerate(cols)
+        ],
+    }
+
+
+def make_inquiry(rng: random.Random, seed: int, n: int, dataset: Dict[str, Any]) -> tuple:
+    status = rng.choices(["submitted", "responded", "accepted", "rejected"], weights=[4, 3, 2, 1])[0]
+    buyer_inquiry = {"questions": [f"Does it cover {rng.choice(COUNTRIES)}?", "What is the update frequency?"], "budget": rng.randint(1, 50) * 1000}
+    vendor_response = {"answers": ["Yes", dataset["granularity"]], "price": rng.randint(1, 50) * 1000} if status != "submitted" else None
+    return (
+        seeded_id("inquiry", seed, n), seeded_id("buyer", seed, rng.randint(0, 999)), dataset["id"], dataset["vendor_id"],
+        seeded_id("conversation", seed, n), json.dumps(buyer_inquiry),
+        json.dumps(vendor_response) if vendor_response else None,
+        f"The buyer asked about {dataset['title']}.", status,
+    )
+
+
+def _insert(cur, sql: str, rows: List[tuple], page_size: int = 500):
+    if rows:
+        execute_values(cur, sql, rows, page_size=page_size)
+
+
+def seed(vendors: int, datasets: int, columns: int, inquiries: int, seed_value: int, batch: int = 1000) -> Dict[str, Any]:
+    """Inserts the synthetic catalog (idempotent for a given seed) and returns row counts and timings."""
+    rng = random.Random(seed_value)
+    started = time.monotonic()
+    vendor_rows = [make_vendor(rng, seed_value, n) for n in range(vendors)]
+    dims = active_profile()["dims"]
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            _insert(cur, """
+                INSERT INTO vendors (id, name, industry_focus, description, country, region, city,
+                                     organization_type, founded_year, website_url, contact_email)
+                VALUES %s ON CONFLICT (id) DO NOTHING
+            """, [tuple(v.values()) for v in vendor_rows])
+        conn.commit()
+
+        sample: List[Dict[str, Any]] = []
+        for start in range(0, datasets, batch):
+            chunk = [make_dataset(rng, seed_value, n, rng.choice(vendor_rows), columns)
+                     for n in range(start, min(start + batch, datasets))]
+            dataset_rows, column_rows = [], []
+            for d in chunk:
+                text = build_embedding_text({
+                    "title": d["title"], "description": d["description"],
+                    "column_names": ", ".join(sorted(c["name"] for c in d["columns"])),
+                })
+                dataset_rows.append((
+                    d["id"], d["vendor_id"], d["title"], d["description"], d["domain"], d["granularity"],
+                    d["pricing_model"], d["license"], d["temporal_coverage"], d["geographic_coverage"],
+                    d["visibility"], d["status"], str(fake_embedding(text, dims)), content_hash(text, output_dim=dims),
+                ))
+                column_rows.extend(
+                    (c["id"], d["id"], c["name"], c["description"], c["data_type"], c["sample_values"]) for c in d["columns"]
+                )
+            with conn.cursor() as cur:
+                _insert(cur, """
+                    INSERT INTO datasets (id, vendor_id, title, description, domain, granularity, pricing_model,
+                                          license, temporal_coverage, geographic_coverage, visibility, status,
+                                          embedding, embedding_hash)
+                    VALUES %s ON CONFLICT (id) DO NOTHING
+                """, dataset_rows, page_size=200)
+                _insert(cur, """
+                    INSERT INTO dataset_columns (id, dataset_id, name, description, data_type, sample_values)
+                    VALUES %s ON CONFLICT (id) DO NOTHING
+                """, column_rows)
+            conn.commit()
+            # Keep a bounded, uniform sample of datasets to attach inquiries to
+            sample.extend(chunk[:: max(1, datasets // 2000)])
+            print(f"  datasets {min(start + batch, datasets)}/{datasets}")
+
+        for start in range(0, inquiries, batch):
+            rows = [make_inquiry(rng, seed_value, n, rng.choice(sample))
+                    for n in range(start, min(start + batch, inquiries))]
+            with conn.cursor() as cur:
+                _insert(cur, """
+                    INSERT INTO inquiries (id, buyer_id, dataset_id, vendor_id, conversation_id,
+                                           buyer_inquiry, vendor_response, summary, status)
+                    VALUES %s ON CONFLICT (id) DO NOTHING
+                """, rows)
+            conn.commit()
+
+        with conn.cursor() as cur:
+            cur.execute("ANALYZE vendors; ANALYZE datasets; ANALYZE dataset_columns; ANALYZE inquiries;")
+        conn.commit()
+    finally:
+        conn.close()
+
+    return {
+        "vendors": vendors, "datasets": datasets, "columns_per_dataset": columns,
+        "inquiries": inquiries, "seed": seed_value, "seconds": round(time.monotonic() - started, 1),
+    }
+
+
+def reset() -> Dict[str, int]:
+    """Deletes every seeded row (vendors with @bench.invalid emails and everything under them)."""
+    vendor_filter = f"SELECT id FROM vendors WHERE contact_email LIKE '%.{BENCH_EMAIL_DOMAIN}'"
+    counts = {}
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            for table, sql in (
+                ("inquiries", f"DELETE FROM inquiries WHERE vendor_id IN ({vendor_filter})"),
+                ("dataset_columns", f"DELETE FROM dataset_columns WHERE dataset_id IN (SELECT id FROM datasets WHERE vendor_id IN ({vendor_filter}))"),
+                ("datasets", f"DELETE FROM datasets WHERE vendor_id IN ({vendor_filter})"),
+                ("vendors", f"DELETE FROM vendors WHERE id IN ({vendor_filter})"),
+            ):
+                cur.execute(sql)
+                counts[table] = cur.rowcount
+        conn.commit()
+    finally:
+        conn.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--vendors", type=int, default=None)
+    parser.add_argument("--datasets", type=int, default=None)
+    parser.add_argument("--columns", type=int, default=None, help="Columns per dataset")
+    parser.add_argument("--inquiries", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="Delete previously seeded rows and exit")
+    opts = parser.parse_args()
+
+    if opts.reset:
+        print(f"Deleted: {reset()}")
+        return
+
+    apply_migrations()
+    vendors, datasets, columns, inquiries = SCALES[opts.scale]
+    result = seed(
+        opts.vendors if opts.vendors is not None else vendors,
+        opts.datasets if opts.datasets is not None else datasets,
+        opts.columns if opts.columns is not None else columns,
+        opts.inquiries if opts.inquiries is not None else inquiries,
+        opts.seed,
+    )
+    print(f"Seeded: {result}")
+
+
+if __name__ == "__main__":
+    main()
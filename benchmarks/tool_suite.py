@@ -0,0 +1,437 @@
+"""
+End-to-end benchmark of every MCP tool over streamable HTTP.
+
+Starts server.app in-process with uvicorn (or targets --url), using the fake
+embedding client unless --real-embeddings is given. It then drives every tool through
+real MCP client sessions against data seeded by benchmarks.seed:
+
+  1. read phase: each catalog/search tool is called --calls times from --clients
+     parallel sessions with varied arguments;
+  2. flow phase: each client runs --flows complete inquiry lifecycles (create,
+     patch/update, queue, claim, lease extend/release, respond, follow-up,
+     revised response, then accept or reject) against a vendor of its own,
+     timing every step under its tool name;
+  3. allocation pass (in-process server only): a few sequential calls per tool
+     with tracemalloc on, reporting peak and retained bytes per call. The MCP
+     client runs in the same process, so compare these between runs rather than
+     reading them as server-only numbers.
+
+Per tool it reports calls, errors, latency percentiles and throughput. With the
+in-process server it also splits mean time into DB, embedding and other (from
+puddle_server.metrics). Results are saved as JSON for --compare.
+
+    python -m benchmarks.seed --scale small
+    python -m benchmarks.tool_suite --calls 50 --clients 4 --label after --out after.json
+    python -m benchmarks.tool_suite --compare before.json after.json
+    python -m benchmarks.tool_suite --output compact --label compact --out compact.json
+
+Response bytes are the mean size of the text content each tool call returned.
+
+Set RESPONSE_CACHE_SIZE=0 to measure the uncached catalog paths.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import random
+import time
+import tracemalloc
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.common import (
+    mcp_session, summarize_latencies, save_results, load_results, print_table,
+)
+from benchmarks.seed import BENCH_EMAIL_DOMAIN, DOMAINS, COUNTRIES, PRICING, NAMESPACE
+from puddle_server.utils import get_db_connection
+
+# ==========================================
+# FIXTURES
+# ==========================================
+
+def load_fixtures(clients: int) -> Dict[str, Any]:
+    """Samples seeded IDs and creates one flow vendor (with one dataset) per client."""
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT id::text, name FROM vendors WHERE contact_email LIKE %s ORDER BY id LIMIT 500",
+                (f"%.{BENCH_EMAIL_DOMAIN}",),
+            )
+            vendors = cur.fetchall()
+            if not vendors:
+                raise SystemExit("No seeded data found; run `python -m benchmarks.seed` first.")
+            cur.execute(
+                """
+                SELECT d.id::text FROM datasets d
+                WHERE d.vendor_id = ANY(%s::uuid[]) AND d.visibility = 'public' AND d.status = 'active'
+                ORDER BY d.id LIMIT 2000
+                """,
+                ([v[0] for v in vendors],),
+            )
+            datasets = [r[0] for r in cur.fetchall()]
+
+            flow_vendors = []
+            for n in range(clients):
+                vendor_id = str(uuid.uuid5(NAMESPACE, f"flow-vendor:{n}"))
+                dataset_id = str(uuid.uuid5(NAMESPACE, f"flow-dataset:{n}"))
+                cur.execute(
+                    """
+                    INSERT INTO vendors (id, name, industry_focus, contact_email)
+                    VALUES (%s, %s, 'Benchmarks', %s) ON CONFLICT (id) DO NOTHING
+                    """,
+                    (vendor_id, f"Flow Vendor {n}", f"flows@flow-{n}.{BENCH_EMAIL_DOMAIN}"),
+                )
+                cur.execute(
+                    """
+                    INSERT INTO datasets (id, vendor_id, title, description, domain, visibility, status)
+                    VALUES (%s, %s, %s, 'Dataset used by tool_suite inquiry flows.', 'Benchmarks', 'private', 'active')
+                    ON CONFLICT (id) DO NOTHING
+                    """,
+                    (dataset_id, vendor_id, f"Flow dataset {n}"),
+                )
+                # Leftovers from an interrupted run would be claimed instead of this run's inquiries
+                cur.execute("DELETE FROM inquiries WHERE vendor_id = %s", (vendor_id,))
+                flow_vendors.append({"vendor_id": vendor_id, "dataset_id": dataset_id})
+        conn.commit()
+    finally:
+        conn.close()
+
+    return {
+        "vendor_ids": [v[0] for v in vendors],
+        "vendor_words": sorted({w for _, name in vendors for w in name.split() if not w.isdigit()}),
+        "dataset_ids": datasets,
+        "flow_vendors": flow_vendors,
+    }
+
+
+def cleanup_flows(fixtures: Dict[str, Any]):
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "DELETE FROM inquiries WHERE vendor_id = ANY(%s::uuid[])",
+                ([v["vendor_id"] for v in fixtures["flow_vendors"]],),
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def dataset_query(rng: random.Random) -> str:
+    domain = rng.choice(list(DOMAINS))
+    return f"{rng.choice(DOMAINS[domain])} in {rng.choice(COUNTRIES)}"
+
+
+# Argument generators for the read-only tools: (rng, fixtures) -> arguments
+READ_SCENARIOS: Dict[str, Callable[[random.Random, Dict[str, Any]], Dict[str, Any]]] = {
+    "search_vendors": lambda rng, fx: {"query": rng.choice(fx["vendor_words"]), "limit": 5},
+    "get_vendor_details": lambda rng, fx: {"vendor_id": rng.choice(fx["vendor_ids"])},
+    "search_datasets_semantic": lambda rng, fx: {
+        "query": dataset_query(rng), "limit": 5,
+        **({"domain": rng.choice(list(DOMAINS))} if rng.random() < 0.3 else {}),
+    },
+    "search_datasets_hybrid": lambda rng, fx: {"query": dataset_query(rng), "limit": 5},
+    "batch_search": lambda rng, fx: {"queries": [dataset_query(rng) for _ in range(3)], "limit": 5},
+    "filter_datasets": lambda rng, fx: {"domain": rng.choice(list(DOMAINS)), "price_model": rng.choice(PRICING), "limit": 10},
+    "get_dataset_details_complete": lambda rng, fx: {"dataset_id": rng.choice(fx["dataset_ids"])},
+    "get_dataset_details_bulk": lambda rng, fx: {"dataset_ids": rng.sample(fx["dataset_ids"], min(5, len(fx["dataset_ids"])))},
+}
+
+# ==========================================
+# TIMED CALLS
+# ==========================================
+
+class Recorder:
+    """Latencies, errors and (when tracemalloc runs) allocations per tool."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.allocations: Dict[str, List[tuple]] = {}
+        self.sizes: Dict[str, List[int]] = {}
+
+    async def call(self, session, tool: str, args: Dict[str, Any]) -> str:
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        text, failed = "", False
+        try:
+            result = await session.call_tool(tool, args)
+            text = "\n".join(getattr(c, "text", "") for c in result.content)
+            failed = result.isError or text.startswith(("Error", "CONFLICT"))
+        except Exception as e:
+            text, failed = str(e), True
+        elapsed = time.perf_counter() - t0
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            self.allocations.setdefault(tool, []).append((peak - before, current - before))
+        else:
+            self.latencies.setdefault(tool, []).append(elapsed)
+            self.sizes.setdefault(tool, []).append(len(text.encode()))
+            if failed:
+                self.errors[tool] = self.errors.get(tool, 0) + 1
+        return text
+
+
+def _version(text: str) -> int:
+    return json.loads(text)["version"]
+
+
+async def inquiry_flow(rec: Recorder, session, flow: Dict[str, str], n: int):
+    """One buyer/vendor lifecycle on the client's own vendor, so claims only see this flow's inquiry."""
+    vendor_id, worker = flow["vendor_id"], f"bench-worker-{n}"
+    created = await rec.call(session, "create_buyer_inquiry", {
+        "buyer_id": str(uuid.uuid4()), "dataset_id": flow["dataset_id"], "conversation_id": str(uuid.uuid4()),
+        "initial_state_json": {"questions": ["Coverage?"], "budget": 10000},
+        "initial_summary": "The buyer asked about coverage.",
+    })
+    if "ID: " not in created:
+        return
+    inquiry_id = created.split("ID: ")[1].split(",")[0]
+
+    state = await rec.call(session, "get_inquiry_full_state", {"inquiry_id": inquiry_id})
+    await rec.call(session, "patch_buyer_json", {
+        "inquiry_id": inquiry_id, "expected_version": _version(state),
+        "merge_patch": {"questions": ["Coverage?", "Update frequency?"]}, "summary_addition": "They asked about updates.",
+    })
+    state = await rec.call(session, "get_inquiry_full_state", {"inquiry_id": inquiry_id, "paths": ["buyer_inquiry.budget"]})
+    await rec.call(session, "update_buyer_json", {
+        "inquiry_id": inquiry_id, "expected_version": _version(state),
+        "new_state_json": {"questions": ["Coverage?", "Update frequency?"], "budget": 12000},
+        "summary_addition": "They raised the budget.",
+    })
+
+    await rec.call(session, "get_vendor_work_queue", {"vendor_id": vendor_id})
+    await rec.call(session, "wait_for_vendor_work", {"vendor_id": vendor_id, "timeout_seconds": 5})
+    await rec.call(session, "claim_vendor_work", {"vendor_id": vendor_id, "worker_id": worker})
+    await rec.call(session, "extend_vendor_lease", {"inquiry_id": inquiry_id, "worker_id": worker})
+    await rec.call(session, "release_vendor_lease", {"inquiry_id": inquiry_id, "worker_id": worker})
+    claimed = await rec.call(session, "claim_vendor_work", {"vendor_id": vendor_id, "worker_id": worker})
+    if not claimed.startswith("["):
+        return
+    await rec.call(session, "update_vendor_response_json", {
+        "inquiry_id": inquiry_id, "expected_version": json.loads(claimed)[0]["version"],
+        "new_response_json": {"answers": ["Global", "Daily"], "price": 15000},
+        "summary_addition": "The vendor quoted 15000.", "worker_id": worker,
+    })
+
+    state = await rec.call(session, "get_inquiry_full_state", {"inquiry_id": inquiry_id})
+    await rec.call(session, "resubmit_inquiry_to_vendor", {"inquiry_id": inquiry_id, "expected_version": _version(state)})
+    claimed = await rec.call(session, "claim_vendor_work", {"vendor_id": vendor_id, "worker_id": worker})
+    if not claimed.startswith("["):
+        return
+    await rec.call(session, "patch_vendor_response_json", {
+        "inquiry_id": inquiry_id, "expected_version": json.loads(claimed)[0]["version"],
+        "merge_patch": {"price": 11000}, "summary_addition": "The vendor lowered the price.", "worker_id": worker,
+    })
+    state = await rec.call(session, "get_inquiry_full_state", {"inquiry_id": inquiry_id})
+    # Alternate the buyer's final decision so both outcomes are measured
+    if n % 2 == 0:
+        await rec.call(session, "accept_vendor_response", {
+            "inquiry_id": inquiry_id, "expected_version": _version(state), "final_notes": "Deal.",
+        })
+    else:
+        await rec.call(session, "reject_vendor_response", {
+            "inquiry_id": inquiry_id, "expected_version": _version(state), "rejection_reason": "Too expensive.",
+        })
+
+# ==========================================
+# PHASES
+# ==========================================
+
+def read_args(tool: str, rng: random.Random, fixtures: Dict[str, Any], output: str) -> Dict[str, Any]:
+    """Arguments of one read call; a non-default output mode is passed to every read tool."""
+    args = READ_SCENARIOS[tool](rng, fixtures)
+    return {**args, "output": output} if output != "text" else args
+
+
+async def read_phase(rec: Recorder, url: str, api_key: Optional[str], fixtures: Dict[str, Any],
+                     tools: List[str], calls: int, clients: int, seed: int, output: str = "text") -> Dict[str, float]:
+    """Runs each read tool on its own (all clients in parallel) and returns its wall time."""
+    walls = {}
+    async with contextlib.AsyncExitStack() as stack:
+        sessions = [await stack.enter_async_context(mcp_session(url, api_key)) for _ in range(clients)]
+        for tool in tools:
+            rng = random.Random(f"{seed}:{tool}")
+            arg_list = [read_args(tool, rng, fixtures, output) for _ in range(calls)]
+
+            async def worker(i: int):
+                for args in arg_list[i::clients]:
+                    await rec.call(sessions[i], tool, args)
+
+            t0 = time.perf_counter()
+            await asyncio.gather(*(worker(i) for i in range(clients)))
+            walls[tool] = time.perf_counter() - t0
+    return walls
+
+
+async def flow_phase(rec: Recorder, url: str, api_key: Optional[str], fixtures: Dict[str, Any],
+                     flows: int, clients: int) -> float:
+    async def client(i: int):
+        async with mcp_session(url, api_key) as session:
+            for n in range(flows):
+                await inquiry_flow(rec, session, fixtures["flow_vendors"][i], n)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    return time.perf_counter() - t0
+
+
+async def allocation_pass(rec: Recorder, url: str, api_key: Optional[str], fixtures: Dict[str, Any],
+                          tools: List[str], calls: int, seed: int, output: str = "text"):
+    tracemalloc.start()
+    try:
+        async with mcp_session(url, api_key) as session:
+            for tool in tools:
+                rng = random.Random(f"{seed}:alloc:{tool}")
+                for _ in range(calls):
+                    await rec.call(session, tool, read_args(tool, rng, fixtures, output))
+            for n in range(2):
+                await inquiry_flow(rec, session, fixtures["flow_vendors"][0], n)
+    finally:
+        tracemalloc.stop()
+
+
+@contextlib.asynccontextmanager
+async def local_server():
+    """Serves server.app on a free local port for the duration of the block."""
+    import uvicorn
+    import server
+
+    config = uvicorn.Config(server.app, host="127.0.0.1", port=0, log_level="warning")
+    # Per-request INFO lines from the MCP SDK and httpx would drown the report
+    for name in ("mcp", "httpx"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    srv = uvicorn.Server(config)
+    task = asyncio.create_task(srv.serve())
+    while not srv.started:
+        if task.done():
+            task.result()
+            raise SystemExit("Server failed to start")
+        await asyncio.sleep(0.05)
+    port = srv.servers[0].sockets[0].getsockname()[1]
+    try:
+        yield f"http://127.0.0.1:{port}/puddle-mcp/mcp"
+    finally:
+        srv.should_exit = True
+        await task
+
+
+async def run(opts) -> Dict[str, Any]:
+    fixtures = load_fixtures(opts.clients)
+    rec = Recorder()
+    server_metrics = None
+
+    async with contextlib.AsyncExitStack() as stack:
+        url = opts.url
+        if url is None:
+            if not opts.real_embeddings:
+                from puddle_server.utils import set_embedding_client
+                from puddle_server.fake_embeddings import FakeEmbeddingClient
+                set_embedding_client(FakeEmbeddingClient())
+            from puddle_server import metrics
+            url = await stack.enter_async_context(local_server())
+            server_metrics = metrics
+
+        async with mcp_session(url, opts.api_key) as session:
+            available = sorted(t.name for t in (await session.list_tools()).tools)
+        read_tools = [t for t in available if t in READ_SCENARIOS]
+
+        before = server_metrics.snapshot() if server_metrics else {}
+        walls = await read_phase(rec, url, opts.api_key, fixtures, read_tools, opts.calls, opts.clients, opts.seed, opts.output)
+        flow_wall = await flow_phase(rec, url, opts.api_key, fixtures, opts.flows, opts.clients)
+        after = server_metrics.snapshot() if server_metrics else {}
+        if server_metrics and opts.alloc_calls:
+            await allocation_pass(rec, url, opts.api_key, fixtures, read_tools, opts.alloc_calls, opts.seed, opts.output)
+
+    cleanup_flows(fixtures)
+
+    tools = {}
+    for tool, latencies in sorted(rec.latencies.items()):
+        wall = walls.get(tool, flow_wall)
+        summary = summarize_latencies(latencies, errors=rec.errors.get(tool, 0), wall_seconds=wall)
+        summary["phase"] = "read" if tool in walls else "flow"
+        sizes = rec.sizes.get(tool, [])
+        summary["response_bytes"] = round(sum(sizes) / len(sizes)) if sizes else 0
+        if tool in after:
+            prev = before.get(tool, {})
+            n = after[tool]["calls"] - prev.get("calls", 0)
+            for key in ("db_seconds", "embedding_seconds", "other_seconds"):
+                delta = after[tool][key] - prev.get(key, 0.0)
+                summary[f"server_{key.replace('_seconds', '')}_ms"] = round(delta / n * 1000, 3) if n else 0.0
+        allocs = rec.allocations.get(tool)
+        if allocs:
+            summary["alloc_peak_kb"] = round(max(p for p, _ in allocs) / 1024, 1)
+            summary["alloc_retained_kb"] = round(sum(r for _, r in allocs) / len(allocs) / 1024, 1)
+        tools[tool] = summary
+
+    return {
+        "tools": tools,
+        "uncovered_tools": [t for t in available if t not in tools],
+        "flow_throughput_per_s": round(opts.flows * opts.clients / flow_wall, 2) if flow_wall else 0.0,
+        "fixtures": {"vendors": len(fixtures["vendor_ids"]), "datasets": len(fixtures["dataset_ids"])},
+    }
+
+
+COLUMNS = ["tool", "phase", "calls", "errors", "p50_ms", "p90_ms", "p99_ms", "throughput_rps", "response_bytes",
+           "server_db_ms", "server_embedding_ms", "server_other_ms", "alloc_peak_kb"]
+
+
+def compare(paths: List[str]):
+    docs = [load_results(p) for p in paths]
+    tools = sorted({t for d in docs for t in d["report"]["tools"]})
+    rows = []
+    for tool in tools:
+        row = {"tool": tool}
+        for doc, path in zip(docs, paths):
+            label = doc.get("label", path)
+            stats = doc["report"]["tools"].get(tool, {})
+            row[f"{label} p50_ms"] = stats.get("p50_ms", "")
+            row[f"{label} p99_ms"] = stats.get("p99_ms", "")
+            row[f"{label} bytes"] = stats.get("response_bytes", "")
+        rows.append(row)
+    print_table(rows, list(rows[0].keys()) if rows else ["tool"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="Benchmark a running server instead of an in-process one")
+    parser.add_argument("--api-key", default=None)
+    parser.add_argument("--calls", type=int, default=50, help="Calls per read tool")
+    parser.add_argument("--clients", type=int, default=4, help="Parallel MCP sessions")
+    parser.add_argument("--flows", type=int, default=4, help="Inquiry lifecycles per client")
+    parser.add_argument("--alloc-calls", type=int, default=5, help="Calls per tool in the tracemalloc pass, 0 skips it")
+    parser.add_argument("--real-embeddings", action="store_true", help="Use the configured embedding client instead of the fake")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for the generated tool arguments")
+    parser.add_argument("--output", choices=["text", "compact", "structured"], default="text",
+                        help="Output mode requested from every read tool")
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--out", default=None)
+    parser.add_argument("--compare", nargs="+", default=None, help="Compare previously saved result files")
+    opts = parser.parse_args()
+
+    if opts.compare:
+        compare(opts.compare)
+        return
+
+    report = asyncio.run(run(opts))
+    print_table([{"tool": name, **stats} for name, stats in report["tools"].items()], COLUMNS)
+    print(f"Inquiry flows: {report['flow_throughput_per_s']}/s")
+    if report["uncovered_tools"]:
+        print(f"Not exercised: {', '.join(report['uncovered_tools'])}")
+
+    if opts.out:
+        save_results(opts.out, {
+            "benchmark": "tool_suite",
+            "label": opts.label,
+            "config": {k: v for k, v in vars(opts).items() if k not in ("compare", "api_key")},
+            "report": report,
+        })
+
+
+if __name__ == "__main__":
+    main()
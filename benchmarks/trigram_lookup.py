@@ -0,0 +1,149 @@
+"""
+Sequential ILIKE scan vs pg_trgm GIN index for the search_vendors lookup.
+
+For each scale, seeds a scratch vendor table (bench_trgm_vendors), runs the
+search_vendors query for a set of exact and misspelled terms without and then
+with the trigram indexes, and reports execution time and the plan's scan type.
+
+    python -m benchmarks.trigram_lookup --scales 10000 100000 1000000 --out trgm.json
+"""
+import argparse
+import json
+import random
+from typing import List, Dict, Any
+
+from benchmarks.common import percentile, save_results, print_table
+from puddle_server.utils import get_db_connection
+
+TABLE = "bench_trgm_vendors"
+
+INDUSTRIES = [
+    "Healthcare", "Finance", "Retail", "Energy", "Logistics", "Insurance", "Real Estate",
+    "Agriculture", "Telecommunications", "Automotive", "Pharmaceuticals", "Media",
+]
+SUFFIXES = ["Analytics", "Data", "Labs", "Insights", "Systems", "Metrics", "Research", "Intelligence"]
+
+# Mirrors the search_vendors query in puddle_server/tools/context_tools.py
+SEARCH_SQL = f"""
+    SELECT id, name, industry_focus,
+        GREATEST(word_similarity(%s, name), word_similarity(%s, coalesce(industry_focus, ''))) as match_score
+    FROM {TABLE}
+    WHERE name ILIKE %s OR industry_focus ILIKE %s OR %s <%% name OR %s <%% industry_focus
+    ORDER BY match_score DESC, name
+    LIMIT 5
+"""
+
+
+def seed(conn, rows: int):
+    with conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cur.execute(f"CREATE TABLE {TABLE} (id bigint PRIMARY KEY, name text, industry_focus text)")
+        cur.execute(
+            f"""
+            INSERT INTO {TABLE}
+            SELECT g,
+                   initcap(substr(md5(g::text), 1, 7)) || ' ' || (%s::text[])[1 + g %% %s],
+                   (%s::text[])[1 + (g / 7) %% %s]
+            FROM generate_series(1, %s) g
+            """,
+            (SUFFIXES, len(SUFFIXES), INDUSTRIES, len(INDUSTRIES), rows),
+        )
+        cur.execute(f"ANALYZE {TABLE}")
+    conn.commit()
+
+
+def sample_terms(conn, count: int) -> List[str]:
+    """Half exact name fragments, half the same fragments with a typo."""
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT split_part(name, ' ', 1) FROM {TABLE} ORDER BY random() LIMIT %s", (count,))
+        fragments = [r[0] for r in cur.fetchall()]
+    conn.commit()
+    terms = []
+    for i, fragment in enumerate(fragments):
+        if i % 2 and len(fragment) > 3:
+            pos = random.randrange(1, len(fragment) - 1)
+            fragment = fragment[:pos] + fragment[pos + 1:]
+        terms.append(fragment)
+    return terms
+
+
+def run_queries(conn, terms: List[str], threshold: float) -> Dict[str, Any]:
+    times, scans, found = [], set(), 0
+    with conn.cursor() as cur:
+        for term in terms:
+            cur.execute("SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)", (str(threshold),))
+            like = f"%{term}%"
+            cur.execute(
+                "EXPLAIN (ANALYZE, FORMAT JSON) " + SEARCH_SQL,
+                (term, term, like, like, term, term),
+            )
+            plan = cur.fetchone()[0]
+            plan = plan[0] if isinstance(plan, list) else json.loads(plan)[0]
+            times.append(plan["Execution Time"] / 1000)
+            scans.update(_scan_nodes(plan["Plan"]))
+            found += int(_rows(plan["Plan"]) > 0)
+            conn.rollback()
+    return {
+        "p50_ms": round(percentile(times, 50) * 1000, 3),
+        "p99_ms": round(percentile(times, 99) * 1000, 3),
+        "hit_rate": round(found / len(terms), 3),
+        "scans": ",".join(sorted(scans)),
+    }
+
+
+def _scan_nodes(node: Dict[str, Any]) -> set:
+    found = {node["Node Type"]} if "Scan" in node["Node Type"] else set()
+    for child in node.get("Plans", []):
+        found |= _scan_nodes(child)
+    return found
+
+
+def _rows(node: Dict[str, Any]) -> int:
+    return node.get("Actual Rows", 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=40)
+    parser.add_argument("--threshold", type=float, default=0.5, help="pg_trgm.word_similarity_threshold")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch table afterwards")
+    parser.add_argument("--out", default=None)
+    opts = parser.parse_args()
+
+    conn = get_db_connection()
+    rows = []
+    try:
+        with conn.cursor() as cur:
+            cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        conn.commit()
+
+        for scale in opts.scales:
+            print(f"Seeding {scale} vendors ...")
+            seed(conn, scale)
+            terms = sample_terms(conn, opts.queries)
+
+            rows.append({"rows": scale, "mode": "seq scan", **run_queries(conn, terms, opts.threshold)})
+
+            with conn.cursor() as cur:
+                cur.execute(f"CREATE INDEX ON {TABLE} USING gin (name gin_trgm_ops)")
+                cur.execute(f"CREATE INDEX ON {TABLE} USING gin (industry_focus gin_trgm_ops)")
+                cur.execute(f"ANALYZE {TABLE}")
+            conn.commit()
+            rows.append({"rows": scale, "mode": "trigram gin", **run_queries(conn, terms, opts.threshold)})
+
+        print_table(rows, ["rows", "mode", "p50_ms", "p99_ms", "hit_rate", "scans"])
+
+        if not opts.keep:
+            with conn.cursor() as cur:
+                cur.execute(f"DROP TABLE IF EXISTS {TABLE}")
+            conn.commit()
+    finally:
+        conn.close()
+
+    if opts.out:
+        save_results(opts.out, {"benchmark": "trigram_lookup", "config": vars(opts), "rows": rows})
+
+
+if __name__ == "__main__":
+    main()
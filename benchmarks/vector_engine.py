@@ -0,0 +1,155 @@
+"""
+In-process vector engine vs pgvector: latency, recall and memory footprint.
+
+Builds a snapshot of the searchable dataset embeddings (seed them with
+benchmarks.seed) for each stored precision and compares, on the same queries:
+
+  - numpy engine, one query per search and --batch queries per matrix product
+  - the pgvector SQL path of search_datasets_semantic (semantic_search_rows)
+
+Recall@k is measured against the float32 engine, which is exact. Memory is
+reported as the snapshot's size on disk and the resident set growth of this
+process once the mapped matrix has been scanned. That growth is file-backed page
+cache, shared by every worker that maps the same snapshot.
+
+    python -m benchmarks.seed --scale medium
+    python -m benchmarks.vector_engine --queries 100 --k 10 --out engine.json
+    python -m benchmarks.vector_engine --dtypes float32 int8 --batch 16
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from benchmarks.common import summarize_latencies, save_results, print_table
+from benchmarks.seed import DOMAINS
+from puddle_server.fake_embeddings import fake_embedding
+from puddle_server.vector_engine import SNAPSHOT_DTYPES, build_snapshot, load_snapshot
+from puddle_server.vector_search import semantic_search_rows
+from puddle_server.async_db_pool import close_async_pool
+
+QUERY_WORDS = ["daily", "history", "panel", "coverage", "feed", "global", "weekly", "regional"]
+
+
+def rss_bytes() -> int:
+    """Resident set size of this process (Linux), 0 where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def make_queries(count: int, dims: int, seed: int) -> List[List[float]]:
+    rng = random.Random(seed)
+    topics = [topic for topics in DOMAINS.values() for topic in topics]
+    texts = [f"{rng.choice(topics)} {' '.join(rng.sample(QUERY_WORDS, 2))}" for _ in range(count)]
+    return [fake_embedding(text, dims) for text in texts]
+
+
+def recall(results: List[List[str]], truth: List[List[str]]) -> float:
+    found = sum(len(set(r) & set(t)) for r, t in zip(results, truth))
+    total = sum(len(t) for t in truth)
+    return round(found / total, 4) if total else 1.0
+
+
+def measure_engine(snapshot, queries: List[List[float]], k: int, batch: int) -> Dict[str, Any]:
+    latencies, results = [], []
+    for query in queries:
+        t0 = time.perf_counter()
+        hits = snapshot.search([query], k)[0]
+        latencies.append(time.perf_counter() - t0)
+        results.append([dataset_id for dataset_id, _ in hits])
+
+    batched = []
+    for start in range(0, len(queries), batch):
+        chunk = queries[start:start + batch]
+        t0 = time.perf_counter()
+        snapshot.search(chunk, k)
+        # Per-query share of one batched matrix product
+        batched.extend([(time.perf_counter() - t0) / len(chunk)] * len(chunk))
+    return {"results": results, "single": summarize_latencies(latencies), "batched": summarize_latencies(batched)}
+
+
+async def measure_pgvector(queries: List[List[float]], k: int) -> Dict[str, Any]:
+    latencies, results = [], []
+    for query in queries:
+        t0 = time.perf_counter()
+        rows = await semantic_search_rows(query, k)
+        latencies.append(time.perf_counter() - t0)
+        results.append([str(r["id"]) for r in rows or []])
+    await close_async_pool()
+    return {"results": results, "single": summarize_latencies(latencies)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dtypes", nargs="+", choices=SNAPSHOT_DTYPES, default=list(SNAPSHOT_DTYPES))
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=8, help="Queries per matrix product in the batched run")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--dir", default=None, help="Snapshot directory (default: a temporary one)")
+    parser.add_argument("--out", default=None)
+    opts = parser.parse_args()
+
+    directory = opts.dir or tempfile.mkdtemp(prefix="vector-engine-bench-")
+    rows, truth, dims = [], None, None
+    try:
+        # float32 first: it is the exact reference for the quantized snapshots
+        for dtype in sorted(opts.dtypes, key=lambda d: d != "float32"):
+            subdir = os.path.join(directory, dtype)
+            t0 = time.perf_counter()
+            meta = build_snapshot(subdir, dtype)
+            build_seconds = round(time.perf_counter() - t0, 2)
+            if not meta["rows"]:
+                raise SystemExit("No searchable embeddings found; run `python -m benchmarks.seed` first.")
+            dims = meta["dims"]
+            queries = make_queries(opts.queries, dims, opts.seed)
+
+            rss_before = rss_bytes()
+            snapshot = load_snapshot(subdir)
+            snapshot.search(queries[:1], opts.k)  # fault the matrix in
+            rss_growth = rss_bytes() - rss_before
+            disk = sum(os.path.getsize(os.path.join(subdir, f)) for f in os.listdir(subdir))
+
+            result = measure_engine(snapshot, queries, opts.k, opts.batch)
+            if truth is None and dtype == "float32":
+                truth = result["results"]
+            row = {
+                "backend": f"numpy {dtype}",
+                "rows": meta["rows"],
+                "recall_at_k": recall(result["results"], truth) if truth else None,
+                "p50_ms": result["single"]["p50_ms"],
+                "p99_ms": result["single"]["p99_ms"],
+                "batched_p50_ms": result["batched"]["p50_ms"],
+                "disk_bytes": disk,
+                "rss_growth_bytes": rss_growth,
+                "build_seconds": build_seconds,
+            }
+            rows.append(row)
+            print(f"  {row['backend']}: p50 {row['p50_ms']} ms, recall {row['recall_at_k']}, {disk} bytes on disk")
+
+        queries = make_queries(opts.queries, dims, opts.seed)
+        sql = asyncio.run(measure_pgvector(queries, opts.k))
+        rows.append({
+            "backend": "pgvector",
+            "recall_at_k": recall(sql["results"], truth) if truth else None,
+            "p50_ms": sql["single"]["p50_ms"],
+            "p99_ms": sql["single"]["p99_ms"],
+        })
+    finally:
+        if not opts.dir:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    print_table(rows, ["backend", "recall_at_k", "p50_ms", "p99_ms", "batched_p50_ms", "disk_bytes", "rss_growth_bytes", "build_seconds"])
+    if opts.out:
+        save_results(opts.out, {"benchmark": "vector_engine", "config": vars(opts), "rows": rows})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Recall-vs-latency benchmark for the ANN index used by search_datasets_semantic.
+
+Builds a synthetic clustered corpus of 1536-dim vectors in a scratch table
+(bench_vectors), computes exact top-k with index scans disabled, then measures
+recall@k and latency for each hnsw.ef_search / ivfflat.probes value. Use the
+output to pick HNSW_EF_SEARCH / IVFFLAT_PROBES (see puddle_server.vector_search).
+
+    python -m benchmarks.vector_recall --rows 20000 --queries 50 --out recall.json
+    python -m benchmarks.vector_recall --index ivfflat --probes 1 5 10 20 40
+"""
+import argparse
+import time
+from typing import List, Dict, Any
+
+from benchmarks.common import summarize_latencies, save_results, print_table
+from puddle_server.utils import get_db_connection
+
+TABLE = "bench_vectors"
+
+
+def seed_corpus(conn, rows: int, dim: int, clusters: int, noise: float):
+    """(Re)creates the scratch corpus: `clusters` random centres plus uniform noise per row."""
+    with conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {TABLE}, {TABLE}_centers")
+        cur.execute(f"CREATE TABLE {TABLE}_centers (cid int PRIMARY KEY, v float4[])")
+        cur.execute(
+            f"""
+            INSERT INTO {TABLE}_centers
+            SELECT c, ARRAY(SELECT random() - 0.5 FROM generate_series(1, %s) WHERE c >= 0)
+            FROM generate_series(0, %s - 1) c
+            """,
+            (dim, clusters),
+        )
+        cur.execute(f"CREATE TABLE {TABLE} (id int PRIMARY KEY, embedding vector({dim}))")
+        cur.execute(
+            f"""
+            INSERT INTO {TABLE}
+            SELECT g, (
+                SELECT array_agg(bc.v[i] + (random() - 0.5) * %s ORDER BY i)
+                FROM generate_series(1, %s) i
+            )::vector
+            FROM generate_series(1, %s) g
+            JOIN {TABLE}_centers bc ON bc.cid = g %% %s
+            """,
+            (noise, dim, rows, clusters),
+        )
+        cur.execute(f"ANALYZE {TABLE}")
+    conn.commit()
+
+
+def make_queries(conn, count: int, dim: int, noise: float) -> List[str]:
+    """Query vectors drawn around random centres, returned in pgvector text form."""
+    with conn.cursor() as cur:
+        cur.execute(
+            f"""
+            SELECT (
+                SELECT array_agg(bc.v[i] + (random() - 0.5) * %s ORDER BY i)
+                FROM generate_series(1, %s) i
+            )::vector::text
+            FROM generate_series(1, %s) q
+            JOIN LATERAL (
+                SELECT v FROM {TABLE}_centers WHERE q > 0 ORDER BY random() LIMIT 1
+            ) bc ON true
+            """,
+            (noise, dim, count),
+        )
+        queries = [r[0] for r in cur.fetchall()]
+    conn.commit()
+    return queries
+
+
+def top_k(conn, query: str, k: int, settings: Dict[str, Any]) -> List[int]:
+    with conn.cursor() as cur:
+        for name, value in settings.items():
+            cur.execute("SELECT set_config(%s, %s, true)", (name, str(value)))
+        cur.execute(f"SELECT id FROM {TABLE} ORDER BY embedding <=> %s::vector LIMIT %s", (query, k))
+        ids = [r[0] for r in cur.fetchall()]
+    conn.commit()
+    return ids
+
+
+def measure(conn, queries: List[str], k: int, settings: Dict[str, Any], truth: List[List[int]] = None) -> Dict[str, Any]:
+    latencies, recalls, results = [], [], []
+    for i, query in enumerate(queries):
+        t0 = time.perf_counter()
+        ids = top_k(conn, query, k, settings)
+        latencies.append(time.perf_counter() - t0)
+        results.append(ids)
+        if truth is not None:
+            recalls.append(len(set(ids) & set(truth[i])) / k)
+    summary = summarize_latencies(latencies)
+    if truth is not None:
+        summary["recall_at_k"] = round(sum(recalls) / len(recalls), 4)
+    return {"summary": summary, "results": results}
+
+
+def build_index(conn, kind: str, m: int, ef_construction: int, lists: int) -> Dict[str, Any]:
+    with conn.cursor() as cur:
+        cur.execute(f"DROP INDEX IF EXISTS {TABLE}_ann_idx")
+        with_clause = f"(lists = {lists})" if kind == "ivfflat" else f"(m = {m}, ef_construction = {ef_construction})"
+        t0 = time.perf_counter()
+        cur.execute(f"CREATE INDEX {TABLE}_ann_idx ON {TABLE} USING {kind} (embedding vector_cosine_ops) WITH {with_clause}")
+        build_seconds = time.perf_counter() - t0
+        cur.execute(f"SELECT pg_relation_size('{TABLE}_ann_idx')")
+        size_bytes = cur.fetchone()[0]
+    conn.commit()
+    return {"kind": kind, "params": with_clause, "build_seconds": round(build_seconds, 2), "size_bytes": size_bytes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--clusters", type=int, default=100)
+    parser.add_argument("--noise", type=float, default=0.6)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--index", choices=["hnsw", "ivfflat"], default="hnsw")
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=64)
+    parser.add_argument("--lists", type=int, default=0, help="IVFFlat lists (default rows / 1000)")
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[10, 20, 40, 80, 160, 320])
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 2, 5, 10, 20, 40])
+    parser.add_argument("--reuse", action="store_true", help="Reuse an existing bench_vectors corpus")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch tables afterwards")
+    parser.add_argument("--out", default=None)
+    opts = parser.parse_args()
+
+    conn = get_db_connection()
+    try:
+        if not opts.reuse:
+            print(f"Seeding {opts.rows} x {opts.dim} vectors ...")
+            seed_corpus(conn, opts.rows, opts.dim, opts.clusters, opts.noise)
+        queries = make_queries(conn, opts.queries, opts.dim, opts.noise)
+
+        with conn.cursor() as cur:
+            cur.execute(f"DROP INDEX IF EXISTS {TABLE}_ann_idx")
+        conn.commit()
+        exact_settings = {"enable_indexscan": "off", "enable_bitmapscan": "off"}
+        exact = measure(conn, queries, opts.k, exact_settings)
+        truth = exact["results"]
+        rows = [{"mode": "exact", "param": "-", "recall_at_k": 1.0, **exact["summary"]}]
+
+        index_info = build_index(conn, opts.index, opts.m, opts.ef_construction, opts.lists or max(1, opts.rows // 1000))
+        print(f"Built {index_info['kind']} {index_info['params']} in {index_info['build_seconds']}s, {index_info['size_bytes']} bytes")
+
+        if opts.index == "hnsw":
+            sweep = [("hnsw.ef_search", v) for v in opts.ef_search]
+        else:
+            sweep = [("ivfflat.probes", v) for v in opts.probes]
+        for name, value in sweep:
+            result = measure(conn, queries, opts.k, {name: value}, truth)
+            rows.append({"mode": opts.index, "param": f"{name}={value}", **result["summary"]})
+
+        print_table(rows, ["mode", "param", "recall_at_k", "p50_ms", "p99_ms", "mean_ms"])
+
+        if not opts.keep:
+            with conn.cursor() as cur:
+                cur.execute(f"DROP TABLE IF EXISTS {TABLE}, {TABLE}_centers")
+            conn.commit()
+    finally:
+        conn.close()
+
+    if opts.out:
+        save_results(opts.out, {
+            "benchmark": "vector_recall",
+            "config": vars(opts),
+            "index": index_info,
+            "rows": rows,
+        })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import os
+import asyncio
+from typing import Optional, Dict, Any
+
+from psycopg_pool import AsyncConnectionPool
+
+from puddle_server.db_pool import (
+    SYNC_DATABASE_URL,
+    DB_POOL_MIN_SIZE,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_POOL_MAX_LIFETIME,
+    DB_STATEMENT_TIMEOUT_MS,
+)
+
+# The async pool shares the sync pool settings unless overridden.
+ASYNC_DB_POOL_MIN_SIZE = int(os.environ.get("ASYNC_DB_POOL_MIN_SIZE", DB_POOL_MIN_SIZE))
+ASYNC_DB_POOL_MAX_SIZE = int(os.environ.get("ASYNC_DB_POOL_MAX_SIZE", DB_POOL_MAX_SIZE))
+
+_async_pool: Optional[AsyncConnectionPool] = None
+_async_pool_lock: Optional[asyncio.Lock] = None
+
+
+async def get_async_pool() -> AsyncConnectionPool:
+    """
+    Returns the process-wide psycopg 3 async pool, opening it on first use.
+    Must be called from inside the running event loop (the pool is bound to it).
+    """
+    global _async_pool, _async_pool_lock
+    if _async_pool is not None:
+        return _async_pool
+
+    if _async_pool_lock is None:
+        _async_pool_lock = asyncio.Lock()
+
+    async with _async_pool_lock:
+        if _async_pool is None:
+            kwargs = {}
+            if DB_STATEMENT_TIMEOUT_MS:
+                kwargs["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+            pool = AsyncConnectionPool(
+                SYNC_DATABASE_URL,
+                min_size=ASYNC_DB_POOL_MIN_SIZE,
+                max_size=ASYNC_DB_POOL_MAX_SIZE,
+                timeout=DB_POOL_TIMEOUT,
+                max_lifetime=DB_POOL_MAX_LIFETIME,
+                check=AsyncConnectionPool.check_connection,
+                kwargs=kwargs,
+                name="puddle-async",
+                open=False,
+            )
+            await pool.open()
+            _async_pool = pool
+    return _async_pool
+
+
+async def close_async_pool():
+    """Closes the async pool (called on server shutdown)."""
+    global _async_pool
+    if _async_pool is not None:
+        pool, _async_pool = _async_pool, None
+        await pool.close()
+
+
+def get_async_pool_stats() -> Dict[str, Any]:
+    """Stats for the async pool, or an empty dict if it has not been opened yet."""
+    pool = _async_pool
+    return pool.get_stats() if pool is not None else {}
@@ -0,0 +1,184 @@
+"""
+Backfill / re-embed dataset embeddings.
+
+Streams datasets whose embedding is missing or stale (its content hash of
+title + description + column names no longer matches) and writes fresh vectors
+back with batched UPDATEs.
+
+    python -m puddle_server.backfill                 # missing or stale rows only
+    python -m puddle_server.backfill --all           # re-embed every dataset
+    python -m puddle_server.backfill --dry-run       # count what would be embedded
+    EMBEDDING_CLIENT=fake python -m puddle_server.backfill   # local run without Gemini
+
+Vectors are requested and stored with the active embedding profile (see embedding_profiles).
+"""
+import argparse
+import hashlib
+import time
+from typing import Dict, Any, List, Optional, Iterator
+
+from psycopg2.extras import RealDictCursor, execute_values
+
+from puddle_server.db_pool import get_pool
+from puddle_server.embedding_profiles import active_profile, column_type
+from puddle_server.schema import apply_migrations
+from puddle_server.utils import get_db_connection, get_embeddings_batch
+
+EMBEDDING_MODEL = "gemini-embedding-001"
+EMBEDDING_DIM = 1536
+
+# {column} is the vector column being filled: datasets.embedding, or the shadow
+# column of an embedding profile switch; its hash lives in {column}_hash.
+STREAM_SQL = """
+    SELECT
+        d.id, d.title, d.description, d.{column}_hash AS embedding_hash,
+        d.{column} IS NULL AS missing_embedding,
+        cols.column_names
+    FROM datasets d
+    LEFT JOIN LATERAL (
+        SELECT string_agg(c.name, ', ' ORDER BY c.name) AS column_names
+        FROM dataset_columns c
+        WHERE c.dataset_id = d.id
+    ) cols ON true
+    ORDER BY d.id
+"""
+
+UPDATE_SQL = """
+    UPDATE datasets AS d
+    SET {column} = v.embedding::{cast}, {column}_hash = v.embedding_hash
+    FROM (VALUES %s) AS v(id, embedding, embedding_hash)
+    WHERE d.id = v.id::uuid
+"""
+
+
+def build_embedding_text(row: Dict[str, Any]) -> str:
+    """The text a dataset's embedding is built from."""
+    parts = [row.get("title") or "", row.get("description") or ""]
+    if row.get("column_names"):
+        parts.append(f"Columns: {row['column_names']}")
+    return "\n".join(p for p in parts if p)
+
+
+def content_hash(text: str, model: str = EMBEDDING_MODEL, output_dim: int = EMBEDDING_DIM) -> str:
+    """Hash identifying the embedding input, so edits (or a model change) mark a row stale."""
+    return hashlib.sha256(f"{model}\x1f{output_dim}\x1f{text}".encode()).hexdigest()
+
+
+def iter_datasets(fetch_size: int = 2000, column: str = "embedding") -> Iterator[Dict[str, Any]]:
+    """Streams every dataset through a server-side cursor instead of loading the table."""
+    conn = get_db_connection()
+    try:
+        with conn.cursor(name="puddle_backfill", cursor_factory=RealDictCursor) as cur:
+            cur.itersize = fetch_size
+            cur.execute(STREAM_SQL.format(column=column))
+            for row in cur:
+                yield row
+    finally:
+        conn.close()
+
+
+def write_embeddings(rows: List[tuple], page_size: int = 500, column: str = "embedding", cast: str = "vector"):
+    """Writes (id, vector, hash) tuples with batched UPDATE ... FROM (VALUES ...)."""
+    if not rows:
+        return
+    values = [(dataset_id, str(list(vector)), digest) for dataset_id, vector, digest in rows]
+    with get_pool().connection() as conn:
+        with conn.cursor() as cur:
+            execute_values(cur, UPDATE_SQL.format(column=column, cast=cast), values, page_size=page_size)
+        conn.commit()
+
+
+def _embed_and_write(pending: List[tuple], model: str, output_dim: int, stats: Dict[str, Any], column: str, cast: str):
+    texts = [text for _, text, _ in pending]
+    result = get_embeddings_batch(texts, model=model, output_dim=output_dim)
+
+    rows = []
+    for i, (dataset_id, _, digest) in enumerate(pending):
+        vector = result["embeddings"][i]
+        if vector is None:
+            stats["failed"] += 1
+            stats["failed_ids"].append(str(dataset_id))
+            continue
+        rows.append((dataset_id, vector, digest))
+
+    write_embeddings(rows, column=column, cast=cast)
+    stats["embedded"] += len(rows)
+
+
+def backfill(
+    batch_size: int = 1000,
+    reembed_all: bool = False,
+    dry_run: bool = False,
+    limit: Optional[int] = None,
+    model: str = EMBEDDING_MODEL,
+    output_dim: Optional[int] = None,
+    column: str = "embedding",
+    profile: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Re-embeds missing/stale datasets (or all of them) and returns run statistics.
+    Failed rows are reported in stats["failed_ids"] and left untouched for the next run.
+
+    Vectors are written to `column` with the dimensions and storage type of `profile`
+    (default: the active embedding profile).
+    """
+    profile = profile or active_profile()
+    output_dim = output_dim or profile["dims"]
+    cast = column_type(profile)
+    stats = {"scanned": 0, "queued": 0, "embedded": 0, "failed": 0, "failed_ids": []}
+    pending: List[tuple] = []
+    started = time.monotonic()
+
+    for row in iter_datasets(column=column):
+        stats["scanned"] += 1
+        text = build_embedding_text(row)
+        digest = content_hash(text, model, output_dim)
+        if not reembed_all and not row["missing_embedding"] and row["embedding_hash"] == digest:
+            continue
+
+        stats["queued"] += 1
+        if not dry_run:
+            pending.append((row["id"], text, digest))
+            if len(pending) >= batch_size:
+                _embed_and_write(pending, model, output_dim, stats, column, cast)
+                pending = []
+                rate = stats["embedded"] / (time.monotonic() - started)
+                print(f"  scanned={stats['scanned']} embedded={stats['embedded']} failed={stats['failed']} ({rate:.0f} rows/s)")
+
+        if limit is not None and stats["queued"] >= limit:
+            break
+
+    if pending:
+        _embed_and_write(pending, model, output_dim, stats, column, cast)
+
+    stats["seconds"] = round(time.monotonic() - started, 2)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--all", action="store_true", help="Re-embed every dataset, not only missing/stale ones")
+    parser.add_argument("--dry-run", action="store_true", help="Only count rows that need embedding")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows embedded and written per round")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after this many queued rows")
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--output-dim", type=int, default=None, help="Default: the active embedding profile's dims")
+    opts = parser.parse_args()
+
+    apply_migrations(verbose=False)
+    stats = backfill(
+        batch_size=opts.batch_size,
+        reembed_all=opts.all,
+        dry_run=opts.dry_run,
+        limit=opts.limit,
+        model=opts.model,
+        output_dim=opts.output_dim,
+    )
+    failed_ids = stats.pop("failed_ids")
+    print(f"Backfill finished: {stats}")
+    if failed_ids:
+        print(f"Failed dataset IDs ({len(failed_ids)}): {', '.join(failed_ids[:50])}{' ...' if len(failed_ids) > 50 else ''}")
+
+
+if __name__ == "__main__":
+    main()
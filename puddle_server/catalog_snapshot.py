@@ -0,0 +1,467 @@
+"""
+In-memory catalog snapshot for the vendor lookup and dataset filter tools.
+
+With CATALOG_BACKEND=memory, all vendors and the public, active datasets are
+loaded at startup into compact `__slots__` records, keyed by ID and indexed by
+domain, pricing model and industry focus, and vendor names by trigram.
+search_vendors, get_vendor_details and filter_datasets then run without a database
+round trip. Matching follows the SQL
+path: case-insensitive substring (ILIKE) or pg_trgm word similarity over the same
+threshold. Rows are ranked the same way: scores are rounded to float4 like pg_trgm's
+`real` results, and the SQL sorts names and titles with COLLATE "C", which is the
+codepoint order Python compares strings in. A keyset cursor issued by either backend
+therefore resumes at the same row on the other, e.g. when a stale snapshot hands a
+paginated search over to Postgres mid-way.
+
+A new snapshot is built next to the current one and swapped in with a single
+reference assignment, so a tool call always sees one consistent catalog. Catalog
+change notifications (see the catalog triggers in schema.py) mark the snapshot
+stale: tools fall back to Postgres until a refresh that started after the last
+change has been swapped in. CATALOG_SNAPSHOT_REFRESH_SECONDS also reloads it
+periodically, for deployments without the event listener.
+"""
+import os
+import re
+import time
+import struct
+import uuid
+import heapq
+import bisect
+import asyncio
+import logging
+import collections
+import functools
+import itertools
+import contextlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from puddle_server.utils import run_pg_sql_async
+from puddle_server.events import CATALOG_EVENTS_CHANNEL, register_listener
+from puddle_server.vector_search import TRGM_WORD_SIMILARITY_THRESHOLD
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# 'postgres' (default) queries the database on every call; 'memory' serves the catalog tools from a snapshot
+CATALOG_BACKEND = os.environ.get("CATALOG_BACKEND", "postgres")
+# Periodic full reload in seconds, 0 = only on change notifications
+CATALOG_SNAPSHOT_REFRESH_SECONDS = float(os.environ.get("CATALOG_SNAPSHOT_REFRESH_SECONDS", 3600))
+# Delay before reloading after a change notification, so bursts of changes cause one reload
+CATALOG_SNAPSHOT_DEBOUNCE_SECONDS = float(os.environ.get("CATALOG_SNAPSHOT_DEBOUNCE_SECONDS", 0.5))
+
+VENDORS_SQL = """
+    SELECT id, name, industry_focus, description, website_url,
+           country, region, city, organization_type, founded_year
+    FROM vendors;
+"""
+
+DATASETS_SQL = """
+    SELECT d.id, d.title, d.domain, d.pricing_model, d.description,
+           d.vendor_id, v.name as vendor_name
+    FROM datasets d
+    JOIN vendors v ON d.vendor_id = v.id
+    WHERE d.visibility = 'public' AND d.status = 'active';
+"""
+
+# ==========================================
+# TRIGRAM MATCHING
+# ==========================================
+
+# Sized for the catalog's names and attribute values plus recent queries
+@functools.lru_cache(maxsize=65536)
+def trigrams(text: str) -> Tuple[str, ...]:
+    """pg_trgm trigrams of `text` in order: each lower-cased word padded as '  word '."""
+    result = []
+    for word in re.findall(r"[^\W_]+", text.lower()):
+        padded = f"  {word} "
+        result.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return tuple(result)
+
+
+def float4(value: float) -> float:
+    """`value` rounded to single precision, like Postgres `real` arithmetic."""
+    return struct.unpack("f", struct.pack("f", value))[0]
+
+
+def word_similarity(query: str, text: Optional[str]) -> float:
+    """
+    pg_trgm's word_similarity(query, text): the best similarity between the query's
+    trigrams and a continuous extent of the text's trigrams, using the same greedy
+    extent search as the extension so scores and thresholds agree with the SQL path.
+    """
+    wanted = frozenset(trigrams(query))
+    if not wanted or not text:
+        return 0.0
+    sequence = trigrams(text)
+    lastpos: Dict[str, int] = {}
+    lower, count, extent, best = -1, 0, 0, 0.0
+    for i, trigram in enumerate(sequence):
+        found = trigram in wanted
+        if lower >= 0 or found:
+            if trigram not in lastpos:
+                extent += 1
+                count += found
+            lastpos[trigram] = i
+        if not found:
+            continue
+        if lower == -1:
+            lower, extent = i, 1
+        current = count / (len(wanted) + extent - count)
+        # Moving the start of the extent forward may drop unmatched trigrams
+        tmp_count, tmp_extent, prev_lower = count, extent, lower
+        for tmp_lower in range(lower, i + 1):
+            candidate = tmp_count / (len(wanted) + tmp_extent - tmp_count)
+            if candidate > current:
+                current, extent, lower, count = candidate, tmp_extent, tmp_lower, tmp_count
+            skipped = sequence[tmp_lower]
+            if lastpos.get(skipped) == tmp_lower:
+                tmp_extent -= 1
+                tmp_count -= skipped in wanted
+        best = max(best, current)
+        for tmp_lower in range(prev_lower, lower):
+            skipped = sequence[tmp_lower]
+            if lastpos.get(skipped) == tmp_lower:
+                del lastpos[skipped]
+    return float4(best)
+
+
+@functools.lru_cache(maxsize=1024)
+def _contains_pattern(value: str) -> re.Pattern:
+    """The ILIKE '%value%' pattern as a regex (`%` and `_` keep their wildcard meaning)."""
+    parts, escaped = [], False
+    for char in value:
+        if escaped:
+            parts.append(re.escape(char))
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == "%":
+            parts.append(".*")
+        elif char == "_":
+            parts.append(".")
+        else:
+            parts.append(re.escape(char))
+    return re.compile("".join(parts), re.IGNORECASE | re.DOTALL)
+
+
+def fuzzy_match(value: str, text: Optional[str]) -> Tuple[bool, float]:
+    """(`text ILIKE '%value%' OR value <% text`, word_similarity(value, text))."""
+    if text is None:
+        return False, 0.0
+    score = word_similarity(value, text)
+    return bool(_contains_pattern(value).search(text)) or score >= TRGM_WORD_SIMILARITY_THRESHOLD, score
+
+# ==========================================
+# RECORDS
+# ==========================================
+
+class VendorRecord:
+    """One vendor row; `id` is a uuid.UUID whichever driver loaded it, so it sorts like the uuid column."""
+
+    FIELDS = (
+        "id", "name", "industry_focus", "description", "website_url",
+        "country", "region", "city", "organization_type", "founded_year",
+    )
+    __slots__ = FIELDS
+
+    def __init__(self, row: Dict[str, Any]):
+        for field in self.FIELDS:
+            setattr(self, field, row.get(field))
+        self.id = _canonical_uuid(self.id)
+
+    def as_row(self, **extra) -> Dict[str, Any]:
+        return {**{field: getattr(self, field) for field in self.FIELDS}, **extra}
+
+
+class DatasetRecord:
+    FIELDS = ("id", "title", "domain", "pricing_model", "description", "vendor_id", "vendor_name")
+    __slots__ = FIELDS
+
+    def __init__(self, row: Dict[str, Any]):
+        for field in self.FIELDS:
+            setattr(self, field, row.get(field))
+        self.id = _canonical_uuid(self.id)
+        self.vendor_id = _canonical_uuid(self.vendor_id)
+
+    def as_row(self, **extra) -> Dict[str, Any]:
+        return {**{field: getattr(self, field) for field in self.FIELDS}, **extra}
+
+
+def _index_by(records, field: str) -> Dict[Any, Tuple]:
+    """Inverted index: attribute value -> records with that value."""
+    index: Dict[Any, list] = {}
+    for record in records:
+        index.setdefault(getattr(record, field), []).append(record)
+    return {value: tuple(items) for value, items in index.items()}
+
+
+def _trigram_index(records, field: str) -> Dict[str, Tuple]:
+    """Inverted index: trigram -> records whose `field` has that trigram (like a GIN gin_trgm_ops index)."""
+    index: Dict[str, list] = {}
+    for record in records:
+        for trigram in set(trigrams(getattr(record, field) or "")):
+            index.setdefault(trigram, []).append(record)
+    return {trigram: tuple(items) for trigram, items in index.items()}
+
+
+def _canonical_uuid(value: Any) -> Optional[uuid.UUID]:
+    try:
+        return uuid.UUID(str(value).strip())
+    except ValueError:
+        return None
+
+# ==========================================
+# SNAPSHOT
+# ==========================================
+
+class CatalogSnapshot:
+    """Immutable view of the catalog; a refresh builds a new instance instead of mutating this one."""
+
+    def __init__(self, vendor_rows: List[Dict[str, Any]], dataset_rows: List[Dict[str, Any]]):
+        self.loaded_at = time.time()
+        self.vendors = {record.id: record for record in map(VendorRecord, vendor_rows)}
+        self.datasets = {record.id: record for record in map(DatasetRecord, dataset_rows)}
+        self.vendors_by_industry = _index_by(self.vendors.values(), "industry_focus")
+        self.datasets_by_domain = _index_by(self.datasets.values(), "domain")
+        self.datasets_by_pricing = _index_by(self.datasets.values(), "pricing_model")
+        self.vendors_by_name_trigram = _trigram_index(self.vendors.values(), "name")
+        # Lower-cased names joined one per line, for substring search in one pass
+        named = [record for record in self.vendors.values() if record.name is not None]
+        lowered = [record.name.lower() for record in named]
+        self._vendor_name_text = "\n".join(lowered)
+        self._vendor_name_starts = list(itertools.accumulate((len(name) + 1 for name in lowered[:-1]), initial=0))
+        self._vendor_name_records = named
+
+    def vendor(self, vendor_id: str) -> Optional[Dict[str, Any]]:
+        record = self.vendors.get(_canonical_uuid(vendor_id))
+        return record.as_row() if record else None
+
+    def search_vendors(self, query: str, limit: int, after: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Same rows and order as the search_vendors SQL: name or industry match, by score DESC, name, id."""
+        # Each distinct industry is matched once and applies to all of its vendors
+        scores: Dict[VendorRecord, float] = {}
+        for industry, records in self.vendors_by_industry.items():
+            is_match, score = fuzzy_match(query, industry)
+            if is_match:
+                scores.update((record, score) for record in records)
+
+        # Only names sharing a trigram with the query score above 0, and a name reaches the
+        # similarity threshold only if it shares that fraction of the query's trigrams
+        # (less a margin for float4 rounding); the rest can only match through ILIKE. Vendors
+        # matched by industry still rank by their name score when it is higher
+        wanted = set(trigrams(query))
+        shared = collections.Counter()
+        for trigram in wanted:
+            shared.update(self.vendors_by_name_trigram.get(trigram, ()))
+        min_shared = (TRGM_WORD_SIMILARITY_THRESHOLD - 1e-6) * len(wanted)
+        pattern = _contains_pattern(query)
+        to_score = {record for record, count in shared.items() if count >= min_shared or record in scores}
+        to_score.update(self._vendors_named_like(query, pattern))
+        for record in to_score:
+            if record in shared:
+                name_match, name_score = fuzzy_match(query, record.name)
+            else:
+                name_match, name_score = True, 0.0  # an ILIKE match without a shared trigram
+            if name_match or record in scores:
+                scores[record] = max(name_score, scores.get(record, 0.0))
+
+        candidates = [(score, record) for record, score in scores.items()]
+        return self._page(candidates, "name", limit, after)
+
+    def _vendors_named_like(self, query: str, pattern: re.Pattern) -> List[VendorRecord]:
+        """Vendors whose name matches `name ILIKE '%query%'` (`pattern` is its regex)."""
+        records = self._vendor_name_records
+        if not query or re.search(r"[%_\\\n]", query):
+            return [record for record in records if pattern.search(record.name)]
+        # A literal query: find it in the joined names, then confirm with the regex
+        needle, text, starts = query.lower(), self._vendor_name_text, self._vendor_name_starts
+        found, start = [], 0
+        while (position := text.find(needle, start)) != -1:
+            i = bisect.bisect_right(starts, position) - 1
+            if pattern.search(records[i].name):
+                found.append(records[i])
+            if i + 1 == len(starts):
+                break
+            start = starts[i + 1]
+        return found
+
+    def filter_datasets(
+        self,
+        domain: Optional[str],
+        price_model: Optional[str],
+        limit: int,
+        after: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Same rows and order as the filter_datasets SQL: summed filter similarity DESC, title, id."""
+        # Each distinct attribute value is matched once; its posting list gives the datasets
+        scores: Optional[Dict[uuid.UUID, float]] = None
+        for value, index in ((domain, self.datasets_by_domain), (price_model, self.datasets_by_pricing)):
+            if not value:
+                continue
+            matched = {}
+            for attribute, records in index.items():
+                is_match, score = fuzzy_match(value, attribute)
+                if not is_match:
+                    continue
+                for record in records:
+                    if scores is None:
+                        matched[record.id] = score
+                    elif record.id in scores:
+                        # The SQL sums `real` scores, so the sum is single precision too
+                        matched[record.id] = float4(scores[record.id] + score)
+            scores = matched
+        if scores is None:
+            candidates = [(0.0, record) for record in self.datasets.values()]
+        else:
+            candidates = [(score, self.datasets[record_id]) for record_id, score in scores.items()]
+        return self._page(candidates, "title", limit, after)
+
+    @staticmethod
+    def _page(candidates, sort_field: str, limit: int, after: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Keyset page over (score DESC, sort_field, id), resuming strictly after the cursor row."""
+        if after:
+            score, key = after["score"], (after[sort_field], _canonical_uuid(after["id"]))
+            candidates = [
+                (s, r) for s, r in candidates
+                if s < score or (s == score and (getattr(r, sort_field), r.id) > key)
+            ]
+        top = heapq.nsmallest(limit, candidates, key=lambda c: (-c[0], getattr(c[1], sort_field), c[1].id))
+        return [record.as_row(match_score=score) for score, record in top]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "vendors": len(self.vendors),
+            "datasets": len(self.datasets),
+            "industries": len(self.vendors_by_industry),
+            "domains": len(self.datasets_by_domain),
+            "pricing_models": len(self.datasets_by_pricing),
+            "loaded_at": self.loaded_at,
+            "age_seconds": round(time.time() - self.loaded_at, 1),
+        }
+
+
+async def load_catalog_snapshot() -> CatalogSnapshot:
+    vendor_rows = await run_pg_sql_async(VENDORS_SQL)
+    dataset_rows = await run_pg_sql_async(DATASETS_SQL)
+    if vendor_rows is None or dataset_rows is None:
+        raise RuntimeError("catalog query failed")
+    return CatalogSnapshot(vendor_rows, dataset_rows)
+
+# ==========================================
+# REFRESH
+# ==========================================
+
+class CatalogSnapshotManager:
+    """Owns the current snapshot, its staleness and the background refreshes."""
+
+    def __init__(self, refresh_seconds: float, debounce_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self.debounce_seconds = debounce_seconds
+        self._snapshot: Optional[CatalogSnapshot] = None
+        # Bumped by every change notification; a refresh only clears `_stale` if none arrived while it loaded
+        self._generation = 0
+        self._stale = True
+        self._lock = asyncio.Lock()
+        self._pending: Optional[asyncio.Task] = None
+        self._interval_task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.failures = 0
+        self.last_load_ms = 0.0
+
+    @property
+    def snapshot(self) -> Optional[CatalogSnapshot]:
+        """The current snapshot, or None while it is missing or behind a catalog change."""
+        return None if self._stale else self._snapshot
+
+    async def start(self):
+        register_listener(CATALOG_EVENTS_CHANNEL, self.on_catalog_event)
+        await self.refresh()
+        if self.refresh_seconds > 0:
+            self._interval_task = asyncio.create_task(self._refresh_periodically(), name="puddle-catalog-snapshot")
+
+    async def close(self):
+        for task in (self._pending, self._interval_task):
+            if task:
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+
+    async def refresh(self):
+        async with self._lock:
+            generation = self._generation
+            t0 = time.perf_counter()
+            try:
+                snapshot = await load_catalog_snapshot()
+            except Exception as e:
+                self.failures += 1
+                logger.error("Catalog snapshot refresh failed, serving from Postgres: %s", e)
+                return
+            self._snapshot = snapshot
+            self.refreshes += 1
+            self.last_load_ms = round((time.perf_counter() - t0) * 1000, 3)
+            if generation == self._generation:
+                self._stale = False
+            else:
+                self._schedule_refresh()
+
+    def on_catalog_event(self, event: Optional[Dict[str, Any]]):
+        """Event hub listener: any catalog change (or a reconnect that may have missed one) needs a reload."""
+        self._generation += 1
+        self._stale = True
+        self._schedule_refresh()
+
+    def _schedule_refresh(self):
+        if self._pending is None or self._pending.done():
+            self._pending = asyncio.create_task(self._refresh_soon())
+
+    async def _refresh_soon(self):
+        await asyncio.sleep(self.debounce_seconds)
+        await self.refresh()
+
+    async def _refresh_periodically(self):
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            await self.refresh()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            "backend": CATALOG_BACKEND,
+            "stale": self._stale,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "last_load_ms": self.last_load_ms,
+        }
+        if self._snapshot:
+            stats.update(self._snapshot.stats())
+        return stats
+
+
+_manager: Optional[CatalogSnapshotManager] = None
+
+
+def current_snapshot() -> Optional[CatalogSnapshot]:
+    """The snapshot to answer from, or None to query Postgres (backend disabled, not loaded or stale)."""
+    return _manager.snapshot if _manager else None
+
+
+async def start_catalog_snapshot():
+    """Loads the snapshot when CATALOG_BACKEND=memory (called from the server lifespan)."""
+    global _manager
+    if CATALOG_BACKEND != "memory" or _manager is not None:
+        return
+    _manager = CatalogSnapshotManager(CATALOG_SNAPSHOT_REFRESH_SECONDS, CATALOG_SNAPSHOT_DEBOUNCE_SECONDS)
+    await _manager.start()
+
+
+async def close_catalog_snapshot():
+    global _manager
+    if _manager is not None:
+        await _manager.close()
+        _manager = None
+
+
+def get_catalog_snapshot_stats() -> Dict[str, Any]:
+    return _manager.stats() if _manager else {"backend": CATALOG_BACKEND}
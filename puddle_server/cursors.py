@@ -0,0 +1,81 @@
+"""
+Opaque, signed continuation cursors for keyset pagination.
+
+A cursor carries the sort key of the last row returned, the tool it belongs to,
+a fingerprint of the query arguments and an expiry time, signed with HMAC-SHA256.
+Agents pass it back verbatim; anything altered, expired or reused with different
+arguments is rejected.
+"""
+import os
+import json
+import hmac
+import time
+import base64
+import hashlib
+import secrets
+from typing import Dict, Any
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Set CURSOR_SECRET when running several workers so cursors work across all of them;
+# otherwise each process signs with its own random key.
+CURSOR_SECRET = (os.environ.get("CURSOR_SECRET") or secrets.token_hex(32)).encode()
+CURSOR_TTL_SECONDS = int(os.environ.get("CURSOR_TTL_SECONDS", 3600))
+
+
+class InvalidCursor(ValueError):
+    """Raised for cursors that are malformed, tampered with, expired or used with other arguments."""
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _sign(payload: bytes) -> str:
+    return _b64encode(hmac.new(CURSOR_SECRET, payload, hashlib.sha256).digest()[:18])
+
+
+def fingerprint(args: Dict[str, Any]) -> str:
+    """Short stable hash of the arguments a cursor is only valid for."""
+    canonical = json.dumps(args, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+
+def encode_cursor(scope: str, args: Dict[str, Any], position: Dict[str, Any]) -> str:
+    """
+    Creates a cursor for `scope` (the tool name) resuming after `position`
+    (the last row's sort key), valid only for the same `args`.
+    """
+    payload = json.dumps(
+        {"s": scope, "f": fingerprint(args), "p": position, "e": int(time.time()) + CURSOR_TTL_SECONDS},
+        separators=(",", ":"),
+        default=str,
+    ).encode()
+    return f"{_b64encode(payload)}.{_sign(payload)}"
+
+
+def decode_cursor(token: str, scope: str, args: Dict[str, Any]) -> Dict[str, Any]:
+    """Verifies a cursor and returns its position, or raises InvalidCursor."""
+    try:
+        body, signature = token.strip().split(".", 1)
+        payload = _b64decode(body)
+    except Exception:
+        raise InvalidCursor("Malformed cursor.")
+
+    if not hmac.compare_digest(signature, _sign(payload)):
+        raise InvalidCursor("Cursor signature is invalid.")
+
+    data = json.loads(payload)
+    if data.get("s") != scope:
+        raise InvalidCursor("Cursor belongs to a different tool.")
+    if data.get("f") != fingerprint(args):
+        raise InvalidCursor("Cursor was issued for different search arguments.")
+    if data.get("e", 0) < time.time():
+        raise InvalidCursor("Cursor has expired; run the search again.")
+    return data["p"]
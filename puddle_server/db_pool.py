@@ -0,0 +1,299 @@
+import os
+import threading
+import time
+import contextlib
+from collections import deque
+from typing import Optional, Dict, Any
+
+import psycopg2
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DATABASE_URL = os.environ.get("DATABASE_URL")
+
+# psycopg2 does not support the 'postgresql+asyncpg://' scheme used in .env,
+# so the URL is rewritten once here instead of on every connection.
+SYNC_DATABASE_URL = (DATABASE_URL or "").replace("postgresql+asyncpg://", "postgresql://")
+
+# Pool settings (all optional, see README)
+DB_POOL_MIN_SIZE = int(os.environ.get("DB_POOL_MIN_SIZE", 1))
+DB_POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", 10))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+DB_POOL_MAX_LIFETIME = float(os.environ.get("DB_POOL_MAX_LIFETIME", 1800))
+DB_POOL_HEALTH_CHECK_AFTER = float(os.environ.get("DB_POOL_HEALTH_CHECK_AFTER", 30))
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", 30000))
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the pool timeout."""
+
+
+class _PooledConnection:
+    __slots__ = ("conn", "created_at", "last_used")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class ConnectionPool:
+    """
+    A bounded, thread-safe pool of psycopg2 connections.
+
+    - Keeps between min_size and max_size connections open.
+    - Checks connections on checkout: closed ones, ones older than max_lifetime
+      and ones idle for longer than health_check_after (that fail a ping) are replaced.
+    - Blocks up to `timeout` seconds when every connection is in use, then raises PoolTimeout.
+    - Applies `statement_timeout_ms` to every connection it opens (0 disables it).
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        min_size: int = 1,
+        max_size: int = 10,
+        timeout: float = 30,
+        max_lifetime: float = 1800,
+        health_check_after: float = 30,
+        statement_timeout_ms: int = 0,
+    ):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError("Pool size must satisfy 0 <= min_size <= max_size and max_size >= 1")
+
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_after = health_check_after
+        self.statement_timeout_ms = statement_timeout_ms
+
+        self._cond = threading.Condition()
+        self._idle: deque = deque()
+        self._checked_out: Dict[int, _PooledConnection] = {}
+        self._size = 0
+        self._waiting = 0
+        self._closed = False
+
+        # Counters exposed through stats()
+        self._checkouts = 0
+        self._timeouts = 0
+        self._opened = 0
+        self._discarded = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+        for _ in range(min_size):
+            with self._cond:
+                self._size += 1
+            try:
+                entry = self._open()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                raise
+            with self._cond:
+                self._idle.append(entry)
+
+    # ------------------------------------------
+    # Connection lifecycle
+    # ------------------------------------------
+
+    def _open(self) -> _PooledConnection:
+        kwargs = {}
+        if self.statement_timeout_ms:
+            kwargs["options"] = f"-c statement_timeout={self.statement_timeout_ms}"
+        conn = psycopg2.connect(self.dsn, **kwargs)
+        with self._cond:
+            self._opened += 1
+        return _PooledConnection(conn)
+
+    def _discard(self, entry: _PooledConnection):
+        try:
+            entry.conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._discarded += 1
+            self._cond.notify()
+
+    def _is_expired(self, entry: _PooledConnection, now: float) -> bool:
+        return bool(self.max_lifetime) and now - entry.created_at > self.max_lifetime
+
+    def _is_usable(self, entry: _PooledConnection) -> bool:
+        now = time.monotonic()
+        if entry.conn.closed or self._is_expired(entry, now):
+            return False
+        if now - entry.last_used < self.health_check_after:
+            return True
+        try:
+            with entry.conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            entry.conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    # ------------------------------------------
+    # Checkout / return
+    # ------------------------------------------
+
+    def getconn(self):
+        """Checks a connection out of the pool, opening a new one if there is room."""
+        start = time.monotonic()
+        deadline = start + self.timeout
+
+        while True:
+            entry = None
+            with self._cond:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed.")
+                if self._idle:
+                    entry = self._idle.pop()
+                elif self._size < self.max_size:
+                    # Reserve the slot, open the connection outside the lock
+                    self._size += 1
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(
+                            f"No database connection available after {self.timeout}s "
+                            f"(pool max_size={self.max_size})."
+                        )
+                    self._waiting += 1
+                    self._cond.wait(remaining)
+                    self._waiting -= 1
+                    continue
+
+            if entry is None:
+                try:
+                    entry = self._open()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._is_usable(entry):
+                self._discard(entry)
+                continue
+
+            waited = time.monotonic() - start
+            with self._cond:
+                self._checked_out[id(entry.conn)] = entry
+                self._checkouts += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+            return entry.conn
+
+    def putconn(self, conn, discard: bool = False):
+        """Returns a connection to the pool (or closes it if it is broken, expired or discarded)."""
+        with self._cond:
+            entry = self._checked_out.pop(id(conn), None)
+        if entry is None:
+            conn.close()
+            return
+
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                discard = True
+
+        now = time.monotonic()
+        if discard or conn.closed or self._closed or self._is_expired(entry, now):
+            self._discard(entry)
+            return
+
+        entry.last_used = now
+        with self._cond:
+            self._idle.append(entry)
+            self._cond.notify()
+
+    @contextlib.contextmanager
+    def connection(self):
+        """Context manager that checks out a connection and always returns it."""
+        conn = self.getconn()
+        discard = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            discard = True
+            raise
+        finally:
+            self.putconn(conn, discard=discard)
+
+    def close(self):
+        """Closes all idle connections; checked-out ones are closed when returned."""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for entry in idle:
+            self._discard(entry)
+
+    def stats(self) -> Dict[str, Any]:
+        """Point-in-time pool statistics, suitable for scraping."""
+        with self._cond:
+            in_use = len(self._checked_out)
+            return {
+                "size": self._size,
+                "in_use": in_use,
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "checkouts_total": self._checkouts,
+                "timeouts_total": self._timeouts,
+                "connections_opened_total": self._opened,
+                "connections_discarded_total": self._discarded,
+                "wait_seconds_total": round(self._wait_total, 6),
+                "wait_seconds_max": round(self._wait_max, 6),
+                "wait_seconds_avg": round(self._wait_total / self._checkouts, 6) if self._checkouts else 0.0,
+            }
+
+
+# ==========================================
+# SHARED POOL
+# ==========================================
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Returns the process-wide pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    SYNC_DATABASE_URL,
+                    min_size=DB_POOL_MIN_SIZE,
+                    max_size=DB_POOL_MAX_SIZE,
+                    timeout=DB_POOL_TIMEOUT,
+                    max_lifetime=DB_POOL_MAX_LIFETIME,
+                    health_check_after=DB_POOL_HEALTH_CHECK_AFTER,
+                    statement_timeout_ms=DB_STATEMENT_TIMEOUT_MS,
+                )
+    return _pool
+
+
+def close_pool():
+    """Closes the process-wide pool (called on server shutdown)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Stats for the shared pool, or an empty dict if it has not been created yet."""
+    pool = _pool
+    return pool.stats() if pool is not None else {}
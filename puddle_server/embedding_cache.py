@@ -0,0 +1,305 @@
+import os
+import time
+import array
+import hashlib
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple, Dict, Any
+
+from dotenv import load_dotenv
+
+from puddle_server.db_pool import get_pool
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Cache settings (all optional, see README)
+EMBEDDING_CACHE_SIZE = int(os.environ.get("EMBEDDING_CACHE_SIZE", 2048))
+EMBEDDING_CACHE_TTL = float(os.environ.get("EMBEDDING_CACHE_TTL", 7 * 24 * 3600))
+# '' (memory only), 'sqlite' or 'postgres'
+EMBEDDING_CACHE_BACKEND = os.environ.get("EMBEDDING_CACHE_BACKEND", "")
+EMBEDDING_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", ".embedding_cache.sqlite3")
+EMBEDDING_CACHE_MAX_ROWS = int(os.environ.get("EMBEDDING_CACHE_MAX_ROWS", 100_000))
+
+CacheKey = Tuple[str, str, int]
+
+
+def normalize_text(text: str) -> str:
+    """Case-folds and collapses whitespace so trivially different queries share an entry."""
+    return " ".join(text.casefold().split())
+
+
+def make_key(text: str, model: str, output_dim: int) -> CacheKey:
+    return (normalize_text(text), model, output_dim)
+
+
+def _digest(key: CacheKey) -> str:
+    text, model, output_dim = key
+    return hashlib.sha256(f"{model}\x1f{output_dim}\x1f{text}".encode()).hexdigest()
+
+
+# ==========================================
+# PERSISTENT TIERS
+# ==========================================
+
+class SQLiteEmbeddingStore:
+    """Embeddings persisted in a local SQLite file, shared by every worker on the host."""
+
+    def __init__(self, path: str, ttl: float, max_rows: int):
+        self.path = path
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._local = threading.local()
+        self._puts = 0
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embedding_cache ("
+                " cache_key TEXT PRIMARY KEY, vector BLOB NOT NULL,"
+                " created_at REAL NOT NULL, last_used_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS embedding_cache_last_used ON embedding_cache (last_used_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: CacheKey) -> Optional[List[float]]:
+        digest = _digest(key)
+        now = time.time()
+        with self._conn() as conn:
+            row = conn.execute(
+                "SELECT vector, created_at FROM embedding_cache WHERE cache_key = ?", (digest,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self.ttl and now - row[1] > self.ttl:
+                conn.execute("DELETE FROM embedding_cache WHERE cache_key = ?", (digest,))
+                return None
+            conn.execute("UPDATE embedding_cache SET last_used_at = ? WHERE cache_key = ?", (now, digest))
+        return array.array("f", row[0]).tolist()
+
+    def put(self, key: CacheKey, vector: List[float]):
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO embedding_cache (cache_key, vector, created_at, last_used_at) VALUES (?, ?, ?, ?)",
+                (_digest(key), array.array("f", vector).tobytes(), now, now),
+            )
+            self._puts += 1
+            # Size-based eviction is amortized over puts
+            if self._puts % 100 == 0:
+                conn.execute(
+                    "DELETE FROM embedding_cache WHERE cache_key IN ("
+                    " SELECT cache_key FROM embedding_cache ORDER BY last_used_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_rows,),
+                )
+                if self.ttl:
+                    conn.execute("DELETE FROM embedding_cache WHERE created_at < ?", (now - self.ttl,))
+
+
+class PostgresEmbeddingStore:
+    """Embeddings persisted in a Postgres table, shared by every server instance."""
+
+    def __init__(self, ttl: float, max_rows: int):
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._puts = 0
+        self._execute(
+            """
+            CREATE TABLE IF NOT EXISTS embedding_cache (
+                cache_key TEXT PRIMARY KEY,
+                embedding REAL[] NOT NULL,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                last_used_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            );
+            CREATE INDEX IF NOT EXISTS embedding_cache_last_used_idx ON embedding_cache (last_used_at);
+            """
+        )
+
+    def _execute(self, sql: str, params: tuple = None, fetch: bool = False):
+        with get_pool().connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(sql, params)
+                row = cur.fetchone() if fetch else None
+            conn.commit()
+            return row
+
+    def get(self, key: CacheKey) -> Optional[List[float]]:
+        row = self._execute(
+            """
+            UPDATE embedding_cache SET last_used_at = NOW()
+            WHERE cache_key = %s
+              AND (%s = 0 OR created_at > NOW() - make_interval(secs => %s))
+            RETURNING embedding;
+            """,
+            (_digest(key), self.ttl, self.ttl),
+            fetch=True,
+        )
+        return list(row[0]) if row else None
+
+    def put(self, key: CacheKey, vector: List[float]):
+        self._execute(
+            """
+            INSERT INTO embedding_cache (cache_key, embedding) VALUES (%s, %s)
+            ON CONFLICT (cache_key) DO UPDATE
+              SET embedding = EXCLUDED.embedding, created_at = NOW(), last_used_at = NOW();
+            """,
+            (_digest(key), list(vector)),
+        )
+        self._puts += 1
+        if self._puts % 100 == 0:
+            self._execute(
+                """
+                DELETE FROM embedding_cache
+                WHERE (%s > 0 AND created_at < NOW() - make_interval(secs => %s))
+                   OR cache_key IN (
+                        SELECT cache_key FROM embedding_cache
+                        ORDER BY last_used_at DESC OFFSET %s
+                   );
+                """,
+                (self.ttl, self.ttl, self.max_rows),
+            )
+
+
+# ==========================================
+# TWO-TIER CACHE
+# ==========================================
+
+class EmbeddingCache:
+    """
+    Query-embedding cache keyed by (normalized text, model, output_dim).
+
+    Tier 1 is an in-process LRU with a TTL; tier 2 is an optional persistent store.
+    Persistent hits are promoted into the LRU.
+    """
+
+    def __init__(self, max_size: int, ttl: float, persistent=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.persistent = persistent
+        self._entries: "OrderedDict[CacheKey, Tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {
+            "memory_hits": 0,
+            "persistent_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "persistent_errors": 0,
+        }
+
+    def get_memory(self, key: CacheKey) -> Optional[List[float]]:
+        """Looks up the in-process tier only (never blocks on I/O)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, vector = entry
+            if self.ttl and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self._counters["expirations"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["memory_hits"] += 1
+            return vector
+
+    def get_persistent(self, key: CacheKey) -> Optional[List[float]]:
+        """Looks up the persistent tier (blocking) and promotes hits into memory."""
+        if self.persistent is None:
+            return None
+        try:
+            vector = self.persistent.get(key)
+        except Exception as e:
+            self._counters["persistent_errors"] += 1
+            logger.error("Embedding cache read error: %s", e)
+            return None
+        if vector is not None:
+            self._counters["persistent_hits"] += 1
+            self.put_memory(key, vector)
+        return vector
+
+    def get(self, key: CacheKey) -> Optional[List[float]]:
+        vector = self.get_memory(key)
+        if vector is None:
+            vector = self.get_persistent(key)
+        if vector is None:
+            self.record_miss()
+        return vector
+
+    def record_miss(self):
+        with self._lock:
+            self._counters["misses"] += 1
+
+    def put_memory(self, key: CacheKey, vector: List[float]):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def put_persistent(self, key: CacheKey, vector: List[float]):
+        if self.persistent is None:
+            return
+        try:
+            self.persistent.put(key, vector)
+        except Exception as e:
+            self._counters["persistent_errors"] += 1
+            logger.error("Embedding cache write error: %s", e)
+
+    def put(self, key: CacheKey, vector: List[float]):
+        self.put_memory(key, vector)
+        self.put_persistent(key, vector)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            size = len(self._entries)
+        hits = counters["memory_hits"] + counters["persistent_hits"]
+        lookups = hits + counters["misses"]
+        return {
+            **counters,
+            "size": size,
+            "max_size": self.max_size,
+            "backend": EMBEDDING_CACHE_BACKEND or "memory",
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def _build_persistent_store():
+    if EMBEDDING_CACHE_BACKEND == "sqlite":
+        return SQLiteEmbeddingStore(EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_TTL, EMBEDDING_CACHE_MAX_ROWS)
+    if EMBEDDING_CACHE_BACKEND == "postgres":
+        return PostgresEmbeddingStore(EMBEDDING_CACHE_TTL, EMBEDDING_CACHE_MAX_ROWS)
+    return None
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Returns the process-wide embedding cache, creating it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    persistent = _build_persistent_store()
+                except Exception as e:
+                    # A broken persistent tier should not take embeddings down with it
+                    logger.warning("Embedding cache backend '%s' unavailable: %s", EMBEDDING_CACHE_BACKEND, e)
+                    persistent = None
+                _cache = EmbeddingCache(EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_TTL, persistent)
+    return _cache
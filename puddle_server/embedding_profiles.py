@@ -0,0 +1,277 @@
+"""
+Embedding profiles: dimensions, storage precision and search strategy of datasets.embedding.
+
+A profile fixes how many Matryoshka dimensions are requested from the embedding
+model (lower ones are prefixes of the full vector), whether they are stored as
+`vector` (float4) or `halfvec` (float2, pgvector >= 0.7), and whether semantic
+search first ranks candidates by the Hamming distance of binary-quantized vectors
+(a small bit index) before re-ranking them by full cosine distance.
+
+Queries must be embedded with the same profile as the stored vectors. The profile
+the stored vectors were built with is therefore recorded in the database
+(embedding_profile table), and servers follow that record rather than their own
+setting. Switching profile re-embeds into a shadow column, indexes it, and swaps
+it in, while searches keep running on the old column:
+
+    python -m puddle_server.embedding_profiles status
+    python -m puddle_server.embedding_profiles switch 768-half
+    EMBEDDING_CLIENT=fake python -m puddle_server.embedding_profiles switch full
+"""
+import os
+import json
+import asyncio
+import logging
+import argparse
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from puddle_server.utils import get_db_connection, run_pg_sql_async
+from puddle_server.events import CATALOG_EVENTS_CHANNEL, register_listener
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_PROFILES: Dict[str, Dict[str, Any]] = {
+    "full": {"dims": 1536, "storage": "vector", "binary": False},
+    "half": {"dims": 1536, "storage": "halfvec", "binary": False},
+    "768": {"dims": 768, "storage": "vector", "binary": False},
+    "768-half": {"dims": 768, "storage": "halfvec", "binary": False},
+    "512-half": {"dims": 512, "storage": "halfvec", "binary": False},
+    "256-half": {"dims": 256, "storage": "halfvec", "binary": False},
+    "binary": {"dims": 1536, "storage": "halfvec", "binary": True},
+    "768-binary": {"dims": 768, "storage": "halfvec", "binary": True},
+}
+
+# Profile assumed before one is recorded in the database (and the target of a first switch)
+EMBEDDING_PROFILE = os.environ.get("EMBEDDING_PROFILE", "full")
+# Binary profiles: coarse Hamming candidates fetched per requested result before re-ranking
+BINARY_RERANK_FACTOR = int(os.environ.get("BINARY_RERANK_FACTOR", 10))
+
+ACTIVE_PROFILE_SQL = "SELECT name FROM embedding_profile"
+
+
+def get_profile(name: str) -> Dict[str, Any]:
+    if name not in EMBEDDING_PROFILES:
+        raise ValueError(f"Unknown embedding profile '{name}'. Use one of: {', '.join(EMBEDDING_PROFILES)}")
+    return {"name": name, **EMBEDDING_PROFILES[name]}
+
+
+def column_type(profile: Dict[str, Any]) -> str:
+    """SQL type of the embedding column, e.g. halfvec(768); also used to cast query vectors."""
+    return f"{profile['storage']}({profile['dims']})"
+
+
+def cosine_opclass(profile: Dict[str, Any]) -> str:
+    return f"{profile['storage']}_cosine_ops"
+
+
+def binary_expression(profile: Dict[str, Any], value: str = "d.embedding") -> str:
+    """Bit-string (sign) quantization of a vector, what the Hamming index is built on."""
+    return f"binary_quantize({value})::bit({profile['dims']})"
+
+# ==========================================
+# ACTIVE PROFILE
+# ==========================================
+
+_active: Optional[Dict[str, Any]] = None
+
+
+def _resolve(recorded: Optional[str]) -> Dict[str, Any]:
+    if recorded is None:
+        return get_profile(EMBEDDING_PROFILE)
+    if recorded != EMBEDDING_PROFILE:
+        logger.warning(
+            "EMBEDDING_PROFILE=%s ignored: stored embeddings use '%s'. "
+            "Switch with `python -m puddle_server.embedding_profiles switch %s`.",
+            EMBEDDING_PROFILE, recorded, EMBEDDING_PROFILE,
+        )
+    return get_profile(recorded)
+
+
+def active_profile() -> Dict[str, Any]:
+    """The profile of the stored embeddings (loaded once, refreshed when a switch is announced)."""
+    if _active is None:
+        load_active_profile()
+    return _active
+
+
+def load_active_profile() -> Dict[str, Any]:
+    global _active
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('embedding_profile') IS NOT NULL")
+            recorded = None
+            if cur.fetchone()[0]:
+                cur.execute(ACTIVE_PROFILE_SQL)
+                row = cur.fetchone()
+                recorded = row[0] if row else None
+    finally:
+        conn.close()
+    _active = _resolve(recorded)
+    return _active
+
+
+async def load_active_profile_async() -> Dict[str, Any]:
+    """Loads the recorded profile without blocking the event loop (server startup and switches)."""
+    global _active
+    exists = await run_pg_sql_async("SELECT to_regclass('embedding_profile') IS NOT NULL AS present", fetch_one=True)
+    row = await run_pg_sql_async(ACTIVE_PROFILE_SQL, fetch_one=True) if exists and exists["present"] else None
+    _active = _resolve(row["name"] if row else None)
+    return _active
+
+
+def on_catalog_event(event: Optional[Dict[str, Any]]):
+    """Event hub listener: reloads the profile after a switch (or a reconnect that may have missed one)."""
+    if event is None or event.get("table") == "embedding_profile":
+        asyncio.get_running_loop().create_task(load_active_profile_async())
+
+
+register_listener(CATALOG_EVENTS_CHANNEL, on_catalog_event)
+
+# ==========================================
+# SWITCHING
+# ==========================================
+
+NEXT_COLUMN = "embedding_next"
+
+
+def _column_type_of(cur, column: str) -> Optional[str]:
+    cur.execute(
+        "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+        "WHERE attrelid = 'datasets'::regclass AND attname = %s AND NOT attisdropped",
+        (column,),
+    )
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def _vector_indexes(cur) -> List[str]:
+    cur.execute(
+        "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "JOIN pg_am am ON am.oid = c.relam "
+        "WHERE i.indrelid = 'datasets'::regclass AND am.amname IN ('hnsw', 'ivfflat')"
+    )
+    return [row[0] for row in cur.fetchall()]
+
+
+def switch_profile(name: str, batch_size: int = 1000, keep_previous: bool = False) -> Dict[str, Any]:
+    """
+    Moves the stored embeddings to profile `name`.
+
+    When the column type changes, every dataset is re-embedded into a shadow column
+    (resumable: rows whose hash already matches are skipped on a rerun). The ANN index
+    is built on that column concurrently, and both columns are then swapped by renames
+    in one short transaction. Servers reload the profile from the change notification.
+    A switch that only toggles binary re-ranking just builds the other index.
+    """
+    from puddle_server.backfill import backfill
+    from puddle_server.schema import apply_migrations, ensure_vector_index, vector_index_name
+    from puddle_server.vector_search import VECTOR_INDEX_TYPE
+
+    apply_migrations(verbose=False)
+    target = get_profile(name)
+    current = load_active_profile()
+    stats: Dict[str, Any] = {"from": current["name"], "to": name, "reembedded": False}
+
+    conn = get_db_connection()
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            needs_reembed = _column_type_of(cur, "embedding") != column_type(target)
+            if needs_reembed:
+                if _column_type_of(cur, NEXT_COLUMN) not in (None, column_type(target)):
+                    # Leftover of an abandoned switch to another profile
+                    cur.execute(f"ALTER TABLE datasets DROP COLUMN {NEXT_COLUMN}, DROP COLUMN IF EXISTS {NEXT_COLUMN}_hash")
+                cur.execute(
+                    f"ALTER TABLE datasets ADD COLUMN IF NOT EXISTS {NEXT_COLUMN} {column_type(target)}, "
+                    f"ADD COLUMN IF NOT EXISTS {NEXT_COLUMN}_hash TEXT"
+                )
+    finally:
+        conn.close()
+
+    column = "embedding"
+    if needs_reembed:
+        column = NEXT_COLUMN
+        print(f"Re-embedding datasets as {column_type(target)} into {NEXT_COLUMN} ...")
+        result = backfill(batch_size=batch_size, column=NEXT_COLUMN, profile=target)
+        if result["failed"]:
+            raise RuntimeError(f"{result['failed']} datasets failed to embed; rerun the switch to retry them")
+        stats["reembedded"] = True
+        stats["backfill"] = {k: v for k, v in result.items() if k != "failed_ids"}
+
+    index = vector_index_name(VECTOR_INDEX_TYPE, target, column)
+    ensure_vector_index(VECTOR_INDEX_TYPE, profile=target, column=column)
+    stats["index"] = vector_index_name(VECTOR_INDEX_TYPE, target)
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            if needs_reembed:
+                cur.execute("LOCK TABLE datasets IN ACCESS EXCLUSIVE MODE")
+                # The old indexes go with the old vectors (a kept embedding_prev is for rollback only)
+                for old in _vector_indexes(cur):
+                    if not old.startswith(f"datasets_{NEXT_COLUMN}_"):
+                        cur.execute(f"DROP INDEX {old}")
+                cur.execute("ALTER TABLE datasets DROP COLUMN IF EXISTS embedding_prev, DROP COLUMN IF EXISTS embedding_prev_hash")
+                cur.execute("ALTER TABLE datasets RENAME COLUMN embedding TO embedding_prev")
+                cur.execute("ALTER TABLE datasets RENAME COLUMN embedding_hash TO embedding_prev_hash")
+                cur.execute(f"ALTER TABLE datasets RENAME COLUMN {NEXT_COLUMN} TO embedding")
+                cur.execute(f"ALTER TABLE datasets RENAME COLUMN {NEXT_COLUMN}_hash TO embedding_hash")
+                cur.execute(f"ALTER INDEX {index} RENAME TO {stats['index']}")
+                if not keep_previous:
+                    cur.execute("ALTER TABLE datasets DROP COLUMN embedding_prev, DROP COLUMN embedding_prev_hash")
+            cur.execute(
+                """
+                INSERT INTO embedding_profile (singleton, name, dims, storage, binary_rerank, updated_at)
+                VALUES (true, %s, %s, %s, %s, now())
+                ON CONFLICT (singleton) DO UPDATE
+                SET name = EXCLUDED.name, dims = EXCLUDED.dims, storage = EXCLUDED.storage,
+                    binary_rerank = EXCLUDED.binary_rerank, updated_at = now()
+                """,
+                (name, target["dims"], target["storage"], target["binary"]),
+            )
+            cur.execute(
+                "SELECT pg_notify(%s, %s)",
+                (CATALOG_EVENTS_CHANNEL, json.dumps({"table": "embedding_profile", "op": "update"})),
+            )
+        conn.commit()
+
+        if not needs_reembed:
+            # Same vectors, other search strategy: the index of the previous one is now unused
+            unused = vector_index_name(VECTOR_INDEX_TYPE, {**target, "binary": not target["binary"]})
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {unused}")
+    finally:
+        conn.close()
+
+    load_active_profile()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="Show the recorded profile and the available ones")
+    switch = commands.add_parser("switch", help="Re-embed and index the datasets with another profile")
+    switch.add_argument("profile", choices=sorted(EMBEDDING_PROFILES))
+    switch.add_argument("--batch-size", type=int, default=1000, help="Rows embedded and written per round")
+    switch.add_argument("--keep-previous", action="store_true", help="Keep the old vectors as embedding_prev")
+    opts = parser.parse_args()
+
+    if opts.command == "status":
+        profile = load_active_profile()
+        print(f"Active profile: {profile['name']} ({column_type(profile)}, binary re-rank: {profile['binary']})")
+        for name, spec in EMBEDDING_PROFILES.items():
+            print(f"  {name:12} {spec['storage']}({spec['dims']}){'  + binary coarse search' if spec['binary'] else ''}")
+        return
+
+    stats = switch_profile(opts.profile, opts.batch_size, opts.keep_previous)
+    print(f"Switched embedding profile: {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Inquiry change events over Postgres LISTEN/NOTIFY.
+
+The inquiry tools publish an event in the same statement that changes the row
+(see notify_returning), so a NOTIFY is delivered only if the change commits.
+Catalog tables publish changes from triggers (schema migration 0010).
+Each server process holds a single LISTEN connection and fans events out to any
+number of waiting tool calls, keyed by vendor, and to in-process listeners.
+"""
+import os
+import json
+import asyncio
+import logging
+from typing import Optional, Dict, Any, Set, List, Callable
+
+import psycopg
+
+from puddle_server.db_pool import SYNC_DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+INQUIRY_EVENTS_CHANNEL = "puddle_inquiry_events"
+CATALOG_EVENTS_CHANNEL = "puddle_catalog_events"
+# Stored embeddings changed (backfills), which the catalog trigger deliberately skips
+EMBEDDING_EVENTS_CHANNEL = "puddle_embedding_events"
+
+# Upper bound for a single long-poll, and the pause before re-opening a dropped listener
+EVENT_WAIT_MAX_SECONDS = int(os.environ.get("EVENT_WAIT_MAX_SECONDS", 300))
+EVENT_RECONNECT_DELAY = float(os.environ.get("EVENT_RECONNECT_DELAY", 1.0))
+EVENT_CONNECT_TIMEOUT = float(os.environ.get("EVENT_CONNECT_TIMEOUT", 10.0))
+
+
+def notify_returning(event: str) -> str:
+    """
+    SQL expression for an `inquiries` RETURNING clause that publishes `event`
+    for each affected row on INQUIRY_EVENTS_CHANNEL.
+    """
+    return (
+        f"pg_notify('{INQUIRY_EVENTS_CHANNEL}', json_build_object("
+        f"'event', '{event}', 'inquiry_id', id, 'vendor_id', vendor_id, "
+        f"'buyer_id', buyer_id, 'status', status)::text) AS notified"
+    )
+
+
+class EventHub:
+    """
+    One LISTEN connection, many waiters. Waiters register a future per vendor
+    and are all resolved with the payload of the next inquiry event for that vendor.
+    Listeners are callbacks run for every event on a channel.
+    After a reconnect every waiter is woken and every listener called with None,
+    since events may have been missed.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        channels: tuple = (INQUIRY_EVENTS_CHANNEL, CATALOG_EVENTS_CHANNEL, EMBEDDING_EVENTS_CHANNEL)
+    ):
+        self.dsn = dsn
+        self.channels = channels
+        self._waiters: Dict[str, Set[asyncio.Future]] = {}
+        self._listeners: Dict[str, List[Callable[[Optional[Dict[str, Any]]], None]]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._connected = asyncio.Event()
+        self._events = 0
+        self._reconnects = 0
+
+    async def start(self):
+        """Starts the listener task and waits until LISTEN is in place."""
+        self._task = asyncio.create_task(self._run(), name="puddle-event-hub")
+        await asyncio.wait_for(self._connected.wait(), EVENT_CONNECT_TIMEOUT)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._wake_all(None)
+
+    async def _run(self):
+        while True:
+            try:
+                conn = await psycopg.AsyncConnection.connect(self.dsn, autocommit=True)
+                async with conn:
+                    for channel in self.channels:
+                        await conn.execute(f"LISTEN {channel}")
+                    if self._connected.is_set():
+                        self._wake_all(None)
+                        self._notify_listeners(None, None)
+                    self._connected.set()
+                    async for notify in conn.notifies():
+                        self._dispatch(notify.channel, notify.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Event listener error: %s", e)
+            self._reconnects += 1
+            await asyncio.sleep(EVENT_RECONNECT_DELAY)
+
+    def _dispatch(self, channel: str, payload: str):
+        self._events += 1
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            return
+        self._notify_listeners(channel, event)
+        if channel != INQUIRY_EVENTS_CHANNEL:
+            return
+        vendor_id = str(event.get("vendor_id"))
+        for future in self._waiters.pop(vendor_id, ()):
+            if not future.done():
+                future.set_result(event)
+
+    def _notify_listeners(self, channel: Optional[str], event: Optional[Dict[str, Any]]):
+        """Runs listeners of `channel`, or of every channel when channel is None (after a reconnect)."""
+        channels = self._listeners if channel is None else (channel,)
+        for name in channels:
+            for callback in self._listeners.get(name, ()):
+                try:
+                    callback(event)
+                except Exception as e:
+                    logger.error("Event listener for %s failed: %s", name, e)
+
+    def add_listener(self, channel: str, callback: Callable[[Optional[Dict[str, Any]]], None]):
+        """Calls `callback(event)` for every event on `channel`, and `callback(None)` after a reconnect."""
+        self._listeners.setdefault(channel, []).append(callback)
+
+    def _wake_all(self, event: Optional[Dict[str, Any]]):
+        waiters, self._waiters = self._waiters, {}
+        for futures in waiters.values():
+            for future in futures:
+                if not future.done():
+                    future.set_result(event)
+
+    def subscribe(self, vendor_id: str) -> asyncio.Future:
+        """Future resolved with the next event for `vendor_id` (or None after a reconnect)."""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(str(vendor_id), set()).add(future)
+        return future
+
+    def unsubscribe(self, vendor_id: str, future: asyncio.Future):
+        futures = self._waiters.get(str(vendor_id))
+        if futures is not None:
+            futures.discard(future)
+            if not futures:
+                self._waiters.pop(str(vendor_id), None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connected": self._connected.is_set() and self._task is not None and not self._task.done(),
+            "events": self._events,
+            "reconnects": self._reconnects,
+            "waiting": sum(len(f) for f in self._waiters.values()),
+        }
+
+
+_event_hub: Optional[EventHub] = None
+_event_hub_lock: Optional[asyncio.Lock] = None
+_pending_listeners: List[tuple] = []
+
+
+def register_listener(channel: str, callback: Callable[[Optional[Dict[str, Any]]], None]):
+    """Registers an in-process listener on the process-wide hub, whether or not it has started yet."""
+    _pending_listeners.append((channel, callback))
+    if _event_hub is not None:
+        _event_hub.add_listener(channel, callback)
+
+
+async def get_event_hub() -> EventHub:
+    """
+    Returns the process-wide event hub, starting its listener on first use.
+    Listeners registered with register_listener are attached before it starts.
+    """
+    global _event_hub, _event_hub_lock
+    if _event_hub is not None:
+        return _event_hub
+
+    if _event_hub_lock is None:
+        _event_hub_lock = asyncio.Lock()
+
+    async with _event_hub_lock:
+        if _event_hub is None:
+            hub = EventHub(SYNC_DATABASE_URL)
+            for channel, callback in _pending_listeners:
+                hub.add_listener(channel, callback)
+            try:
+                await hub.start()
+            except BaseException:
+                await hub.close()
+                raise
+            _event_hub = hub
+    return _event_hub
+
+
+async def close_event_hub():
+    """Stops the listener (called on server shutdown)."""
+    global _event_hub
+    if _event_hub is not None:
+        hub, _event_hub = _event_hub, None
+        await hub.close()
+
+
+def get_event_hub_stats() -> Dict[str, Any]:
+    """Listener stats, or an empty dict if no tool has waited for events yet."""
+    hub = _event_hub
+    return hub.stats() if hub is not None else {}
@@ -0,0 +1,61 @@
+import math
+import hashlib
+import re
+from typing import List, Union
+
+from google.genai import types
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def fake_embedding(text: str, output_dim: int = 1536, model: str = "fake") -> List[float]:
+    """
+    Deterministic, unit-length stand-in for a Gemini embedding.
+
+    Uses signed feature hashing over lower-cased tokens, so texts sharing words land
+    close together in cosine space (enough for search and benchmark scenarios).
+    """
+    vector = [0.0] * output_dim
+    tokens = _TOKEN_RE.findall(text.lower()) or [text]
+    for token in tokens:
+        digest = hashlib.blake2b(f"{model}:{token}".encode(), digest_size=16).digest()
+        for i in range(0, 16, 4):
+            slot = int.from_bytes(digest[i:i + 3], "little") % output_dim
+            vector[slot] += 1.0 if digest[i + 3] & 1 else -1.0
+
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def _build_response(model: str, contents: Union[str, List[str]], config) -> types.EmbedContentResponse:
+    texts = [contents] if isinstance(contents, str) else list(contents)
+    output_dim = getattr(config, "output_dimensionality", None) or 1536
+    return types.EmbedContentResponse(
+        embeddings=[types.ContentEmbedding(values=fake_embedding(t, output_dim, model)) for t in texts]
+    )
+
+
+class _FakeModels:
+    def embed_content(self, *, model: str, contents, config=None) -> types.EmbedContentResponse:
+        return _build_response(model, contents, config)
+
+
+class _FakeAsyncModels:
+    async def embed_content(self, *, model: str, contents, config=None) -> types.EmbedContentResponse:
+        return _build_response(model, contents, config)
+
+
+class _FakeAio:
+    def __init__(self):
+        self.models = _FakeAsyncModels()
+
+
+class FakeEmbeddingClient:
+    """
+    Drop-in replacement for genai.Client covering the embed_content calls this server makes.
+    Select it with EMBEDDING_CLIENT=fake or utils.set_embedding_client(FakeEmbeddingClient()).
+    """
+
+    def __init__(self):
+        self.models = _FakeModels()
+        self.aio = _FakeAio()
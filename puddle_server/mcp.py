@@ -1,2 +1,21 @@
 from mcp.server.fastmcp import FastMCP
-mcp = FastMCP(name="puddle-mcp", stateless_http=True)
\ No newline at end of file
+from puddle_server.metrics import instrument_tool
+from puddle_server.trace_recorder import record_tool
+
+
+class InstrumentedFastMCP(FastMCP):
+    """
+    FastMCP that records metrics for every registered tool (see puddle_server.metrics)
+    and, when TOOL_TRACE_PATH is set, a replayable trace of its calls (see puddle_server.trace_recorder).
+    """
+
+    def add_tool(self, fn, name=None, **kwargs):
+        tool_name = name or fn.__name__
+        # Tools return text or an explicit structured result (see puddle_server.output_modes);
+        # the automatic {"result": str} schema would send every text result twice
+        if kwargs.get("structured_output") is None:
+            kwargs["structured_output"] = False
+        super().add_tool(instrument_tool(record_tool(fn, tool_name), tool_name), name=name, **kwargs)
+
+
+mcp = InstrumentedFastMCP(name="puddle-mcp", stateless_http=True)
@@ -0,0 +1,345 @@
+"""
+Per-tool instrumentation: call and error counts, latency, time spent in the
+database and in embedding calls, rows read and response size.
+
+Every tool registered on puddle_server.mcp.mcp is wrapped by instrument_tool.
+The DB and embedding helpers in puddle_server.utils report their timings with
+record_db / record_embedding, which are attributed to the tool call running in
+the current context. Metrics are rendered in the Prometheus text format for
+GET /metrics; set METRICS_SPANS_PATH to also write one JSON span per tool call
+(with child spans for its queries and embedding requests) to a local file.
+"""
+import os
+import json
+import time
+import logging
+import inspect
+import secrets
+import functools
+import threading
+import contextvars
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from puddle_server.output_modes import result_text
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# JSON-lines span file; empty disables span export
+METRICS_SPANS_PATH = os.environ.get("METRICS_SPANS_PATH", "")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus model."""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name: str, labels: str) -> List[str]:
+        out, total = [], 0
+        for bound, n in zip(self.buckets, self.counts):
+            total += n
+            out.append(f'{name}_bucket{{{labels},le="{bound:g}"}} {total}')
+        out.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        out.append(f"{name}_sum{{{labels}}} {self.sum:.6f}")
+        out.append(f"{name}_count{{{labels}}} {self.count}")
+        return out
+
+
+class ToolMetrics:
+    def __init__(self):
+        self.calls = 0
+        self.errors: Dict[str, int] = {"exception": 0, "response": 0}
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.response_bytes = Histogram(SIZE_BUCKETS)
+        self.db_seconds = 0.0
+        self.db_queries = 0
+        self.embedding_seconds = 0.0
+        self.embedding_requests = 0
+        self.other_seconds = 0.0
+        self.rows = 0
+
+
+class CallStats:
+    """Timings collected while one tool call runs (shared with worker threads it starts)."""
+
+    def __init__(self, tool: str, record_spans: bool):
+        self.tool = tool
+        self.db_seconds = 0.0
+        self.db_queries = 0
+        self.embedding_seconds = 0.0
+        self.embedding_requests = 0
+        self.rows = 0
+        self.spans: Optional[List[Dict[str, Any]]] = [] if record_spans else None
+        self.lock = threading.Lock()
+
+
+_current_call: contextvars.ContextVar[Optional[CallStats]] = contextvars.ContextVar("puddle_tool_call", default=None)
+
+_lock = threading.Lock()
+_tools: Dict[str, ToolMetrics] = {}
+# Process-wide counters, including work done outside tool calls (backfills, caches)
+_totals = {
+    "db_queries": 0,
+    "db_errors": 0,
+    "embedding_requests": 0,
+    "embedding_errors": 0,
+}
+_TOTALS_HELP = {
+    "db_queries": "Database round trips",
+    "db_errors": "Database round trips that raised",
+    "embedding_requests": "Embedding API requests",
+    "embedding_errors": "Embedding API requests that failed",
+}
+# Time spent waiting for a pooled connection, kept apart from database time
+_pool_wait = Histogram(LATENCY_BUCKETS)
+
+
+def _child_span(call: CallStats, name: str, start: float, seconds: float, attributes: Dict[str, Any]):
+    if call.spans is not None:
+        call.spans.append({
+            "name": name,
+            "start_time": start,
+            "duration_ms": round(seconds * 1000, 3),
+            "attributes": attributes,
+        })
+
+
+def record_db(seconds: float, rows: int = 0, error: bool = False, statement: str = ""):
+    """Reports one database round trip (called by run_pg_sql / run_pg_sql_async)."""
+    with _lock:
+        _totals["db_queries"] += 1
+        if error:
+            _totals["db_errors"] += 1
+    call = _current_call.get()
+    if call is None:
+        return
+    with call.lock:
+        call.db_seconds += seconds
+        call.db_queries += 1
+        call.rows += rows
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+        _child_span(call, "db.query", time.time() - seconds, seconds,
+                    {"db.operation": operation, "db.rows": rows, "error": error})
+
+
+def record_pool_wait(seconds: float):
+    """Reports the time a statement waited to check a connection out of the pool."""
+    with _lock:
+        _pool_wait.observe(seconds)
+
+
+def record_embedding(seconds: float, texts: int = 1, error: bool = False):
+    """Reports one embedding request to the embedding API (not cache hits)."""
+    with _lock:
+        _totals["embedding_requests"] += 1
+        if error:
+            _totals["embedding_errors"] += 1
+    call = _current_call.get()
+    if call is None:
+        return
+    with call.lock:
+        call.embedding_seconds += seconds
+        call.embedding_requests += 1
+        _child_span(call, "embedding", time.time() - seconds, seconds, {"embedding.texts": texts, "error": error})
+
+
+def row_count(result: Any) -> int:
+    """Rows in a run_pg_sql result (a list of rows, one row, or a status dict)."""
+    if isinstance(result, list):
+        return len(result)
+    if result is None or (isinstance(result, dict) and result.get("status") == "success"):
+        return 0
+    return 1
+
+
+# ==========================================
+# TOOL WRAPPER
+# ==========================================
+
+def instrument_tool(func: Callable, name: str) -> Callable:
+    """
+    Wraps an async tool so every call is counted and timed. Time not spent in the
+    database or embedding API is reported as `other` (validation and formatting).
+    """
+    if not inspect.iscoroutinefunction(func):
+        return func
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        call = CallStats(name, bool(METRICS_SPANS_PATH))
+        token = _current_call.set(call)
+        started_at = time.time()
+        t0 = time.perf_counter()
+        result, error = None, None
+        try:
+            result = await func(*args, **kwargs)
+            return result
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            elapsed = time.perf_counter() - t0
+            _current_call.reset(token)
+            _finish_call(call, started_at, elapsed, result, error)
+
+    return wrapper
+
+
+def _finish_call(call: CallStats, started_at: float, elapsed: float, result: Any, error: Optional[Exception]):
+    text = result_text(result)
+    size = len(text.encode())
+    with _lock:
+        m = _tools.setdefault(call.tool, ToolMetrics())
+        m.calls += 1
+        if error is not None:
+            m.errors["exception"] += 1
+        elif text.startswith("Error"):
+            m.errors["response"] += 1
+        m.latency.observe(elapsed)
+        m.response_bytes.observe(size)
+        m.db_seconds += call.db_seconds
+        m.db_queries += call.db_queries
+        m.embedding_seconds += call.embedding_seconds
+        m.embedding_requests += call.embedding_requests
+        m.other_seconds += max(0.0, elapsed - call.db_seconds - call.embedding_seconds)
+        m.rows += call.rows
+
+    if call.spans is not None:
+        trace_id = secrets.token_hex(16)
+        span_id = secrets.token_hex(8)
+        spans = [{
+            "trace_id": trace_id,
+            "span_id": span_id,
+            "parent_span_id": None,
+            "name": f"tool.{call.tool}",
+            "start_time": started_at,
+            "duration_ms": round(elapsed * 1000, 3),
+            "attributes": {
+                "tool.name": call.tool,
+                "db.seconds": round(call.db_seconds, 6),
+                "db.queries": call.db_queries,
+                "db.rows": call.rows,
+                "embedding.seconds": round(call.embedding_seconds, 6),
+                "response.bytes": size,
+                "error": None if error is None else repr(error),
+            },
+        }]
+        for child in call.spans:
+            spans.append({"trace_id": trace_id, "span_id": secrets.token_hex(8), "parent_span_id": span_id, **child})
+        export_spans(spans)
+
+
+_span_lock = threading.Lock()
+_span_file = None
+
+
+def export_spans(spans: List[Dict[str, Any]]):
+    """Appends spans as JSON lines to METRICS_SPANS_PATH."""
+    global _span_file
+    try:
+        with _span_lock:
+            if _span_file is None:
+                _span_file = open(METRICS_SPANS_PATH, "a", buffering=1)
+            for span in spans:
+                _span_file.write(json.dumps(span, default=str) + "\n")
+    except OSError as e:
+        logger.error("Span export error: %s", e)
+
+
+# ==========================================
+# EXPORT
+# ==========================================
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    """Per-tool counters and time totals (no histograms), e.g. for benchmarks to diff."""
+    with _lock:
+        return {
+            name: {
+                "calls": m.calls,
+                "errors": sum(m.errors.values()),
+                "latency_seconds": m.latency.sum,
+                "db_seconds": m.db_seconds,
+                "db_queries": m.db_queries,
+                "embedding_seconds": m.embedding_seconds,
+                "other_seconds": m.other_seconds,
+                "rows": m.rows,
+                "response_bytes": m.response_bytes.sum,
+            }
+            for name, m in _tools.items()
+        }
+
+
+_TOOL_METRICS = (
+    ("puddle_tool_db_seconds_total", "Seconds spent in database round trips", "db_seconds"),
+    ("puddle_tool_db_queries_total", "Database round trips", "db_queries"),
+    ("puddle_tool_embedding_seconds_total", "Seconds spent waiting on the embedding API", "embedding_seconds"),
+    ("puddle_tool_embedding_requests_total", "Embedding API requests", "embedding_requests"),
+    ("puddle_tool_other_seconds_total", "Seconds outside database and embedding calls (validation, formatting)", "other_seconds"),
+    ("puddle_tool_rows_total", "Database rows returned to the tool", "rows"),
+)
+
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        tools = sorted(_tools.items())
+        totals = dict(_totals)
+        pool_wait = _pool_wait.lines("puddle_db_pool_wait_seconds", 'pool="db"')
+        out = [
+            "# HELP puddle_tool_calls_total Tool calls",
+            "# TYPE puddle_tool_calls_total counter",
+            *(f'puddle_tool_calls_total{{tool="{name}"}} {m.calls}' for name, m in tools),
+            "# HELP puddle_tool_errors_total Tool calls that raised (kind=exception) or returned an error message (kind=response)",
+            "# TYPE puddle_tool_errors_total counter",
+            *(
+                f'puddle_tool_errors_total{{tool="{name}",kind="{kind}"}} {n}'
+                for name, m in tools for kind, n in m.errors.items()
+            ),
+            "# HELP puddle_tool_latency_seconds Tool call latency",
+            "# TYPE puddle_tool_latency_seconds histogram",
+        ]
+        for name, m in tools:
+            out.extend(m.latency.lines("puddle_tool_latency_seconds", f'tool="{name}"'))
+        out += [
+            "# HELP puddle_tool_response_bytes Size of the tool response",
+            "# TYPE puddle_tool_response_bytes histogram",
+        ]
+        for name, m in tools:
+            out.extend(m.response_bytes.lines("puddle_tool_response_bytes", f'tool="{name}"'))
+        for metric, help_text, attr in _TOOL_METRICS:
+            out.append(f"# HELP {metric} {help_text}")
+            out.append(f"# TYPE {metric} counter")
+            for name, m in tools:
+                value = getattr(m, attr)
+                out.append(f'{metric}{{tool="{name}"}} {value:.6f}' if isinstance(value, float) else f'{metric}{{tool="{name}"}} {value}')
+
+    for key, value in totals.items():
+        out.append(f"# HELP puddle_{key}_total {_TOTALS_HELP[key]} (all callers)")
+        out.append(f"# TYPE puddle_{key}_total counter")
+        out.append(f"puddle_{key}_total {value}")
+    out += [
+        "# HELP puddle_db_pool_wait_seconds Time spent waiting for a pooled database connection (all callers)",
+        "# TYPE puddle_db_pool_wait_seconds histogram",
+        *pool_wait,
+    ]
+    return "\n".join(out) + "\n"
@@ -0,0 +1,222 @@
+"""
+Output modes shared by the tools that return records: how much of each record is read and how it is sent.
+
+- "text" (default): the human-readable report each tool has always returned.
+- "compact": a header line naming the fields, then one line of values per record. Long
+  text fields (descriptions, summaries, JSON previews) are cut to COMPACT_TEXT_CHARS
+  inside the SQL, so they are never read in full.
+- "structured": the records as an MCP structured result (structuredContent), with a
+  compact JSON copy as text content for clients that ignore structured output.
+
+`fields` projects the records onto the named fields in every mode. Tools build their
+SELECT list from it (select_list), so unrequested columns, and joins only they need,
+are not read at all.
+"""
+import os
+import json
+import uuid
+import datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+from dotenv import load_dotenv
+from mcp.types import CallToolResult, TextContent
+
+load_dotenv()
+
+OUTPUT_MODES = ("text", "compact", "structured")
+
+# Characters kept of each long text field in compact mode
+COMPACT_TEXT_CHARS = int(os.environ.get("COMPACT_TEXT_CHARS", 120))
+
+# What a tool with output modes returns
+ToolResult = Union[str, CallToolResult]
+
+# Marks structured results in the response cache, which stores text
+_CACHED_STRUCTURED_PREFIX = "structured:"
+
+
+def check_output(output: str, fields: Optional[Sequence[str]], available: Iterable[str]) -> Optional[str]:
+    """Error message for an unknown output mode or field, None when the request is valid."""
+    if output not in OUTPUT_MODES:
+        return f"Unknown output mode '{output}'. Use one of: {', '.join(OUTPUT_MODES)}."
+    available = list(available)
+    unknown = [f for f in fields or () if f not in available]
+    if unknown:
+        return f"Unknown field(s) {', '.join(unknown)}. Available fields: {', '.join(available)}."
+    if fields is not None and not fields:
+        return "Request at least one field, or omit `fields` for all of them."
+    return None
+
+
+def requested_fields(
+    fields: Optional[Sequence[str]],
+    output: str,
+    compact_fields: Sequence[str]
+) -> Optional[List[str]]:
+    """The fields to read: those requested, else the tool's lean default set in compact mode, else None (all)."""
+    if fields:
+        return list(fields)
+    return list(compact_fields) if output == "compact" else None
+
+
+def selected_fields(fields: Optional[Sequence[str]], available: Sequence[str]) -> List[str]:
+    """The requested fields in the order given, or every available field."""
+    return list(dict.fromkeys(fields)) if fields else list(available)
+
+
+def truncate_sql(expr: str, chars: int = COMPACT_TEXT_CHARS) -> str:
+    """SQL that cuts a text expression to `chars` characters, marking the cut with '...'."""
+    chars = int(chars)
+    return f"CASE WHEN length({expr}) > {chars} THEN left({expr}, {chars}) || '...' ELSE {expr} END"
+
+
+def select_list(
+    columns: Dict[str, str],
+    fields: Optional[Sequence[str]],
+    compact: bool = False,
+    long_fields: Sequence[str] = (),
+    required: Sequence[str] = ()
+) -> str:
+    """
+    SELECT list for the requested fields: `columns` maps each field to its SQL expression.
+    `required` fields are always read (IDs and sort keys the tool itself needs); when
+    `compact`, `long_fields` are truncated in SQL.
+    """
+    parts = []
+    for name, expr in columns.items():
+        if fields and name not in fields and name not in required:
+            continue
+        if compact and name in long_fields:
+            expr = truncate_sql(expr)
+        parts.append(f"{expr} AS {name}")
+    return ", ".join(parts)
+
+
+def truncate_text(value: Any, chars: int = COMPACT_TEXT_CHARS) -> Any:
+    """Python counterpart of truncate_sql, for rows served from memory."""
+    if isinstance(value, str) and len(value) > chars:
+        return value[:chars] + "..."
+    return value
+
+
+def compact_rows(rows: List[Dict[str, Any]], long_fields: Sequence[str]) -> List[Dict[str, Any]]:
+    """Truncates long fields of in-memory rows (copies; snapshot rows are shared)."""
+    return [{k: truncate_text(v) if k in long_fields else v for k, v in row.items()} for row in rows]
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, (uuid.UUID, Decimal)):
+        return str(value) if isinstance(value, uuid.UUID) else float(value)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {k: _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    return value
+
+
+def project(row: Dict[str, Any], fields: Sequence[str]) -> Dict[str, Any]:
+    """The row reduced to `fields`, with JSON-safe values."""
+    return {f: _jsonable(row.get(f)) for f in fields}
+
+
+def _format_value(value: Any, compact: bool = False) -> str:
+    if value is None:
+        return "" if compact else "None"
+    if isinstance(value, float):
+        return f"{value:.2f}" if compact else f"{value:.4f}"
+    if compact and isinstance(value, list) and all(isinstance(v, (str, int, float)) for v in value):
+        return ", ".join(map(str, value))
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(",", ":"), default=str)
+    text = str(value)
+    # Keep one record per line
+    return " ".join(text.split()) if compact else text
+
+
+def format_record(row: Dict[str, Any], fields: Sequence[str], output: str) -> str:
+    """One record: a single 'field: value | ...' line in compact mode, one 'field: value' line per field in text mode."""
+    if output == "compact":
+        return " | ".join(f"{f}: {_format_value(row.get(f), True)}" for f in fields if row.get(f) is not None)
+    return "\n".join(f"{f}: {_format_value(row.get(f))}" for f in fields)
+
+
+def format_records(rows: List[Dict[str, Any]], fields: Sequence[str], output: str, header: str = "") -> str:
+    """
+    Renders projected or compact records as text: in compact mode a table (the field names,
+    then one ' | '-separated line per record), otherwise format_record blocks.
+    """
+    if output == "compact":
+        lines = [" | ".join(fields)]
+        lines.extend(" | ".join(_format_value(row.get(f), True) for f in fields) for row in rows)
+        body = "\n".join(lines)
+    else:
+        body = "\n---\n".join(format_record(row, fields, output) for row in rows)
+    return f"{header}\n{body}" if header else body
+
+
+def structured_result(payload: Dict[str, Any]) -> CallToolResult:
+    """An MCP result carrying `payload` as structuredContent plus a compact JSON text copy."""
+    data = _jsonable(payload)
+    text = json.dumps(data, separators=(",", ":"), default=str)
+    return CallToolResult(content=[TextContent(type="text", text=text)], structuredContent=data)
+
+
+def render_records(
+    rows: List[Dict[str, Any]],
+    fields: Sequence[str],
+    output: str,
+    header: str = "",
+    empty: str = "No results.",
+    next_cursor: Optional[str] = None,
+    footer: str = "",
+    extra: Optional[Dict[str, Any]] = None
+) -> ToolResult:
+    """
+    Renders the rows of a projected or non-text request: {"items": [...], "next_cursor": ...,
+    **extra} when structured, otherwise format_records with the header and (paging) footer.
+    """
+    items = [project(row, fields) for row in rows]
+    if output == "structured":
+        payload = {"items": items, **(extra or {})}
+        if next_cursor:
+            payload["next_cursor"] = next_cursor
+        return structured_result(payload)
+    if not items:
+        return empty
+    text = format_records(items, fields, output, header)
+    return f"{text}\n{footer}" if footer else text
+
+
+def render_record(row: Dict[str, Any], fields: Sequence[str], output: str) -> ToolResult:
+    """Single-record counterpart of render_records: the record itself is the structured content."""
+    item = project(row, fields)
+    if output == "structured":
+        return structured_result(item)
+    return format_record(item, fields, output)
+
+
+def result_text(result: Any) -> str:
+    """The text an agent receives for a tool result (metrics, traces and caching read it)."""
+    if isinstance(result, str):
+        return result
+    if isinstance(result, CallToolResult):
+        return "\n".join(getattr(c, "text", "") for c in result.content)
+    return "" if result is None else str(result)
+
+
+def to_cached(result: Any) -> Optional[str]:
+    """Text form of a result for the response cache, None if it cannot be cached."""
+    if isinstance(result, str):
+        return result
+    if isinstance(result, CallToolResult) and result.structuredContent is not None:
+        return _CACHED_STRUCTURED_PREFIX + json.dumps(result.structuredContent, separators=(",", ":"))
+    return None
+
+
+def from_cached(text: str) -> ToolResult:
+    if text.startswith(_CACHED_STRUCTURED_PREFIX):
+        return structured_result(json.loads(text[len(_CACHED_STRUCTURED_PREFIX):]))
+    return text
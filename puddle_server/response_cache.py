@@ -0,0 +1,447 @@
+"""
+Read-through cache for the formatted output of catalog tools.
+
+Entries are tagged with what they were built from (a vendor, a dataset, or a whole
+table for searches) and dropped when a catalog trigger reports a change to it
+(see schema migration 0010 and puddle_server.events). The TTL bounds staleness
+if the listener is down or a change bypassed the triggers.
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import hashlib
+import inspect
+import logging
+import functools
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Iterable, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+
+from puddle_server.utils import run_in_worker, submit_to_worker
+from puddle_server.events import CATALOG_EVENTS_CHANNEL, register_listener
+from puddle_server.output_modes import from_cached, to_cached
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Cache settings (all optional, see README)
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", 1024))
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", 300))
+# '' (memory only) or 'sqlite' (shared by every worker on the host)
+RESPONSE_CACHE_BACKEND = os.environ.get("RESPONSE_CACHE_BACKEND", "")
+RESPONSE_CACHE_PATH = os.environ.get("RESPONSE_CACHE_PATH", ".response_cache.sqlite3")
+# Entries kept in the shared tier; the oldest beyond this are evicted every RESPONSE_CACHE_EVICT_EVERY writes
+RESPONSE_CACHE_SHARED_SIZE = int(os.environ.get("RESPONSE_CACHE_SHARED_SIZE", 10000))
+RESPONSE_CACHE_EVICT_EVERY = int(os.environ.get("RESPONSE_CACHE_EVICT_EVERY", 100))
+
+# Tag for results that depend on every row of a table (searches and filters)
+VENDORS_TABLE = "table:vendors"
+DATASETS_TABLE = "table:datasets"
+
+
+def vendor_tag(vendor_id: Any) -> str:
+    return f"vendor:{_canonical_id(vendor_id)}"
+
+
+def dataset_tag(dataset_id: Any) -> str:
+    return f"dataset:{_canonical_id(dataset_id)}"
+
+
+def _canonical_id(value: Any) -> str:
+    """UUIDs in canonical form, so an upper-case ID in a tool call matches the trigger's tag."""
+    try:
+        return str(uuid.UUID(str(value).strip()))
+    except ValueError:
+        return str(value)
+
+
+def make_key(tool: str, args: Dict[str, Any]) -> str:
+    return f"{tool}:" + json.dumps(args, sort_keys=True, default=str)
+
+
+# ==========================================
+# SHARED TIER
+# ==========================================
+
+class SQLiteResponseStore:
+    """
+    Responses shared by every worker on the host through a local SQLite file. Expired
+    entries, and the oldest ones beyond `max_entries`, are evicted every `evict_every`
+    writes, so the file stays bounded even for keys that are never read again.
+    """
+
+    def __init__(self, path: str, ttl: float, max_entries: int = 0, evict_every: int = 100):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evict_every = max(1, evict_every)
+        self.evictions = 0
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                " cache_key TEXT PRIMARY KEY, response TEXT NOT NULL,"
+                " tags TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache_tags ("
+                " tag TEXT NOT NULL, cache_key TEXT NOT NULL, PRIMARY KEY (tag, cache_key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS response_cache_created_at ON response_cache (created_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _digest(key: str) -> str:
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[str, List[str]]]:
+        with self._conn() as conn:
+            row = conn.execute(
+                "SELECT response, tags FROM response_cache WHERE cache_key = ? AND (? = 0 OR created_at > ?)",
+                (self._digest(key), self.ttl, time.time() - self.ttl),
+            ).fetchone()
+        return (row[0], row[1].split()) if row else None
+
+    def put(self, key: str, response: str, tags: List[str]):
+        digest = self._digest(key)
+        with self._writes_lock:
+            self._writes += 1
+            evict = self._writes % self.evict_every == 0
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO response_cache (cache_key, response, tags, created_at) VALUES (?, ?, ?, ?)",
+                (digest, response, " ".join(tags), time.time()),
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO response_cache_tags (tag, cache_key) VALUES (?, ?)",
+                [(tag, digest) for tag in tags],
+            )
+            if evict:
+                self._evict(conn)
+
+    def invalidate(self, tags: Iterable[str]):
+        tags = list(tags)
+        marks = ", ".join("?" for _ in tags)
+        with self._conn() as conn:
+            conn.execute(
+                f"DELETE FROM response_cache WHERE cache_key IN"
+                f" (SELECT cache_key FROM response_cache_tags WHERE tag IN ({marks}))",
+                tags,
+            )
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Deletes expired entries and the oldest beyond max_entries, then their tag rows."""
+        evicted = 0
+        if self.ttl:
+            evicted += conn.execute("DELETE FROM response_cache WHERE created_at < ?", (time.time() - self.ttl,)).rowcount
+        if self.max_entries:
+            evicted += conn.execute(
+                "DELETE FROM response_cache WHERE cache_key IN"
+                " (SELECT cache_key FROM response_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+        conn.execute(
+            "DELETE FROM response_cache_tags WHERE cache_key NOT IN (SELECT cache_key FROM response_cache)"
+        )
+        self.evictions += evicted
+
+    def clear(self):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM response_cache")
+            conn.execute("DELETE FROM response_cache_tags")
+
+
+# ==========================================
+# RESPONSE CACHE
+# ==========================================
+
+class ResponseCache:
+    """
+    Tool responses keyed by (tool, arguments), with an in-process LRU and TTL in front
+    of an optional shared store. Each entry carries tags; invalidating a tag drops
+    every entry built from it in both tiers.
+    """
+
+    def __init__(self, max_size: int, ttl: float, shared=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.shared = shared
+        self._entries: "OrderedDict[str, Tuple[float, str, List[str]]]" = OrderedDict()
+        self._by_tag: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        # Bumped on every invalidation; a response computed across one is not stored
+        self.generation = 0
+        self._tools: Dict[str, Dict[str, int]] = {}
+        self._counters = {"invalidations": 0, "evictions": 0, "expirations": 0, "shared_errors": 0}
+
+    def _tool_counters(self, tool: str) -> Dict[str, int]:
+        return self._tools.setdefault(tool, {"hits": 0, "shared_hits": 0, "misses": 0})
+
+    def get_memory(self, tool: str, key: str) -> Optional[str]:
+        """Looks up the in-process tier only (never blocks on I/O)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, response, tags = entry
+            if self.ttl and time.monotonic() - stored_at > self.ttl:
+                self._drop(key)
+                self._counters["expirations"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._tool_counters(tool)["hits"] += 1
+            return response
+
+    def get_shared(self, tool: str, key: str) -> Optional[str]:
+        """Looks up the shared tier (blocking) and promotes hits into memory."""
+        if self.shared is None:
+            return None
+        generation = self.generation
+        try:
+            entry = self.shared.get(key)
+        except Exception as e:
+            self._counters["shared_errors"] += 1
+            logger.error("Response cache read error: %s", e)
+            return None
+        if entry is None:
+            return None
+        response, tags = entry
+        with self._lock:
+            self._tool_counters(tool)["shared_hits"] += 1
+        self.put_memory(key, response, tags, generation)
+        return response
+
+    def record_hit(self, tool: str):
+        with self._lock:
+            self._tool_counters(tool)["hits"] += 1
+
+    def record_miss(self, tool: str):
+        with self._lock:
+            self._tool_counters(tool)["misses"] += 1
+
+    def put_memory(self, key: str, response: str, tags: List[str], generation: int):
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._drop(key)
+            self._entries[key] = (time.monotonic(), response, tags)
+            for tag in tags:
+                self._by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+                self._counters["evictions"] += 1
+
+    def put_shared(self, key: str, response: str, tags: List[str], generation: int):
+        if self.shared is None or generation != self.generation:
+            return
+        try:
+            self.shared.put(key, response, tags)
+        except Exception as e:
+            self._counters["shared_errors"] += 1
+            logger.error("Response cache write error: %s", e)
+
+    def _drop(self, key: str):
+        """Removes one in-process entry and its tag index (caller holds the lock)."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+    def invalidate(self, tags: Iterable[str]):
+        """Drops every entry carrying any of `tags`, in memory and in the shared tier."""
+        tags = list(tags)
+        with self._lock:
+            self.generation += 1
+            for tag in tags:
+                for key in list(self._by_tag.get(tag, ())):
+                    self._drop(key)
+            self._counters["invalidations"] += 1
+        if self.shared is not None:
+            try:
+                self.shared.invalidate(tags)
+            except Exception as e:
+                self._counters["shared_errors"] += 1
+                logger.error("Response cache invalidation error: %s", e)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._by_tag.clear()
+        if self.shared is not None:
+            try:
+                self.shared.clear()
+            except Exception as e:
+                self._counters["shared_errors"] += 1
+                logger.error("Response cache clear error: %s", e)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            tools = {name: dict(c) for name, c in self._tools.items()}
+            size = len(self._entries)
+        for c in tools.values():
+            lookups = c["hits"] + c["shared_hits"] + c["misses"]
+            c["hit_rate"] = round((c["hits"] + c["shared_hits"]) / lookups, 4) if lookups else 0.0
+        return {
+            **counters,
+            "size": size,
+            "max_size": self.max_size,
+            "backend": RESPONSE_CACHE_BACKEND or "memory",
+            "shared_evictions": getattr(self.shared, "evictions", 0),
+            "tools": tools,
+        }
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Returns the process-wide response cache, creating it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                shared = None
+                if RESPONSE_CACHE_BACKEND == "sqlite":
+                    try:
+                        shared = SQLiteResponseStore(
+                            RESPONSE_CACHE_PATH, RESPONSE_CACHE_TTL,
+                            RESPONSE_CACHE_SHARED_SIZE, RESPONSE_CACHE_EVICT_EVERY,
+                        )
+                    except Exception as e:
+                        logger.warning("Response cache backend '%s' unavailable: %s", RESPONSE_CACHE_BACKEND, e)
+                _cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, shared)
+    return _cache
+
+
+# ==========================================
+# TOOL DECORATOR AND INVALIDATION
+# ==========================================
+
+# Concurrent misses for the same key share one computation
+_inflight: Dict[str, asyncio.Future] = {}
+
+# Result of a shared computation whose caller was cancelled: its waiters compute the response themselves
+_LEADER_CANCELLED = object()
+
+
+def cached_tool(tags: Callable[..., List[str]]):
+    """
+    Caches the string (or structured) result of an async tool. `tags` receives the tool's arguments
+    (by name, defaults applied) and returns the tags the result depends on.
+    Error responses are never cached. Apply below @mcp.tool so the tool's signature is kept.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        tool = func.__name__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = make_key(tool, bound.arguments)
+
+            cache = get_response_cache()
+            response = cache.get_memory(tool, key)
+            if response is None and cache.shared is not None:
+                response = await run_in_worker(cache.get_shared, tool, key)
+            if response is not None:
+                return from_cached(response)
+
+            # After a cancelled computation the first waiter to wake takes over, the rest join it
+            while (pending := _inflight.get(key)) is not None:
+                response = await asyncio.shield(pending)
+                if response is not _LEADER_CANCELLED:
+                    cache.record_hit(tool)
+                    return response
+
+            cache.record_miss(tool)
+            generation = cache.generation
+            future = asyncio.get_running_loop().create_future()
+            _inflight[key] = future
+            try:
+                response = await func(*args, **kwargs)
+            except asyncio.CancelledError:
+                # One caller disconnecting must not fail the others waiting on its result
+                future.set_result(_LEADER_CANCELLED)
+                raise
+            except Exception as e:
+                future.set_exception(e)
+                # Waiters see the error too; mark it retrieved so an unawaited future is not logged
+                future.exception()
+                raise
+            else:
+                future.set_result(response)
+            finally:
+                _inflight.pop(key, None)
+
+            cached = to_cached(response)
+            if cached is not None and not cached.startswith("Error"):
+                entry_tags = tags(**bound.arguments)
+                cache.put_memory(key, cached, entry_tags, generation)
+                if cache.shared is not None:
+                    submit_to_worker(cache.put_shared, key, cached, entry_tags, generation)
+            return response
+
+        return wrapper
+    return decorator
+
+
+def invalidate(tags: Iterable[str]):
+    get_response_cache().invalidate(tags)
+
+
+def invalidate_vendor(vendor_id: str):
+    invalidate([vendor_tag(vendor_id), VENDORS_TABLE])
+
+
+def invalidate_dataset(dataset_id: str):
+    invalidate([dataset_tag(dataset_id), DATASETS_TABLE])
+
+
+def tags_for_catalog_event(event: Dict[str, Any]) -> List[str]:
+    """Maps a catalog trigger payload ({table, op, vendor_id, dataset_id}) to cache tags."""
+    table = event.get("table")
+    if table == "vendors":
+        return [vendor_tag(event.get("vendor_id")), VENDORS_TABLE]
+    if table == "datasets":
+        return [dataset_tag(event.get("dataset_id")), DATASETS_TABLE]
+    if table == "dataset_columns":
+        return [dataset_tag(event.get("dataset_id"))]
+    return []
+
+
+def on_catalog_event(event: Optional[Dict[str, Any]]):
+    """Event hub listener: drops entries for the changed row, or everything after a reconnect."""
+    if event is None:
+        get_response_cache().clear()
+        return
+    tags = tags_for_catalog_event(event)
+    if tags:
+        invalidate(tags)
+
+
+register_listener(CATALOG_EVENTS_CHANNEL, on_catalog_event)
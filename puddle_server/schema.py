@@ -0,0 +1,528 @@
+"""
+Schema migrations owned by the MCP server (columns, indexes and functions the tools rely on).
+
+The base tables (vendors, datasets, dataset_columns, inquiries) are owned by the main
+Puddle application; this module only adds to them, idempotently.
+
+    python -m puddle_server.schema                        # apply pending migrations
+    python -m puddle_server.schema --status               # list applied / pending migrations
+    python -m puddle_server.schema --vector-index hnsw    # create/replace the ANN index
+    python -m puddle_server.schema --check-vector-index   # validate the ANN index
+"""
+import re
+import argparse
+import math
+import time
+from typing import List, Dict, Any, Optional, Sequence
+
+from psycopg2.extras import RealDictCursor
+
+from puddle_server.utils import get_db_connection
+from puddle_server.embedding_profiles import active_profile, binary_expression, cosine_opclass
+from puddle_server.vector_search import (
+    VECTOR_INDEX_TYPE, HNSW_M, HNSW_EF_CONSTRUCTION, IVFFLAT_LISTS, SEARCHABLE_DATASETS_PREDICATE,
+)
+
+def catalog_notify_trigger(table: str, ignored_columns: Sequence[str]) -> str:
+    """
+    SQL (re)creating the catalog change trigger of `table`. Updates that only touch
+    `ignored_columns` are not published; a migration that adds such a column re-runs this.
+    """
+    args = ", ".join(f"'{column}'" for column in ignored_columns)
+    return f"""
+        DROP TRIGGER IF EXISTS {table}_notify_change ON {table};
+        CREATE TRIGGER {table}_notify_change AFTER INSERT OR UPDATE OR DELETE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION puddle_notify_catalog_change({args});
+    """
+
+
+# Each migration runs once, in order. Set "transactional": False for statements
+# that cannot run inside a transaction block (e.g. CREATE INDEX CONCURRENTLY);
+# such migrations list their statements separately, since a multi-statement
+# string is itself run as one transaction.
+MIGRATIONS: List[Dict[str, Any]] = [
+    {
+        "name": "0001_dataset_embedding_hash",
+        "sql": """
+            -- Content hash of the text the stored embedding was built from (see backfill.py)
+            ALTER TABLE datasets ADD COLUMN IF NOT EXISTS embedding_hash TEXT;
+        """,
+    },
+    {
+        "name": "0002_full_text_search",
+        "sql": """
+            -- Lexical side of hybrid search (see vector_search.hybrid_search_rows)
+            ALTER TABLE datasets ADD COLUMN IF NOT EXISTS search_tsv tsvector
+                GENERATED ALWAYS AS (
+                    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+                    setweight(to_tsvector('english', coalesce(domain, '')), 'B') ||
+                    setweight(to_tsvector('english', coalesce(description, '')), 'C')
+                ) STORED;
+            ALTER TABLE vendors ADD COLUMN IF NOT EXISTS search_tsv tsvector
+                GENERATED ALWAYS AS (
+                    setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+                    setweight(to_tsvector('english', coalesce(industry_focus, '')), 'B')
+                ) STORED;
+        """,
+    },
+    {
+        "name": "0003_full_text_search_indexes",
+        "transactional": False,
+        "sql": [
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS datasets_search_tsv_idx ON datasets USING gin (search_tsv)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS vendors_search_tsv_idx ON vendors USING gin (search_tsv)",
+        ],
+    },
+    {
+        "name": "0004_pg_trgm",
+        "sql": "CREATE EXTENSION IF NOT EXISTS pg_trgm;",
+    },
+    {
+        "name": "0005_trigram_indexes",
+        "transactional": False,
+        # Serve ILIKE '%...%' and the word-similarity (<%) lookups of search_vendors / filter_datasets
+        "sql": [
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS vendors_name_trgm_idx ON vendors USING gin (name gin_trgm_ops)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS vendors_industry_focus_trgm_idx ON vendors USING gin (industry_focus gin_trgm_ops)",
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS datasets_domain_trgm_idx ON datasets USING gin (domain gin_trgm_ops) WHERE {SEARCHABLE_DATASETS_PREDICATE}",
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS datasets_pricing_model_trgm_idx ON datasets USING gin (pricing_model gin_trgm_ops) WHERE {SEARCHABLE_DATASETS_PREDICATE}",
+        ],
+    },
+    {
+        "name": "0006_inquiry_leases",
+        "sql": """
+            -- Work leases taken by claim_vendor_work; an expired lease puts the inquiry back in the queue
+            ALTER TABLE inquiries ADD COLUMN IF NOT EXISTS lease_owner TEXT;
+            ALTER TABLE inquiries ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMPTZ;
+        """,
+    },
+    {
+        "name": "0007_inquiry_work_queue_index",
+        "transactional": False,
+        # Serves the vendor work queue: submitted inquiries of one vendor, oldest first
+        "sql": [
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS inquiries_vendor_status_updated_idx ON inquiries (vendor_id, status, updated_at)",
+        ],
+    },
+    {
+        "name": "0008_inquiry_version",
+        "sql": """
+            -- Row version for optimistic concurrency: bumped by every inquiry state change
+            ALTER TABLE inquiries ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+        """,
+    },
+    {
+        "name": "0009_jsonb_merge_patch",
+        "sql": """
+            -- RFC 7396 JSON merge patch: objects merge recursively, null removes a key,
+            -- anything else (including arrays) replaces the target value
+            CREATE OR REPLACE FUNCTION puddle_jsonb_merge_patch(target jsonb, patch jsonb)
+            RETURNS jsonb
+            LANGUAGE plpgsql IMMUTABLE AS $$
+            DECLARE
+                result jsonb;
+                item record;
+            BEGIN
+                IF patch IS NULL THEN
+                    RETURN target;
+                END IF;
+                IF jsonb_typeof(patch) <> 'object' THEN
+                    RETURN patch;
+                END IF;
+                IF target IS NULL OR jsonb_typeof(target) <> 'object' THEN
+                    result := '{}'::jsonb;
+                ELSE
+                    result := target;
+                END IF;
+                FOR item IN SELECT key, value FROM jsonb_each(patch) LOOP
+                    IF jsonb_typeof(item.value) = 'null' THEN
+                        result := result - item.key;
+                    ELSE
+                        result := jsonb_set(
+                            result, ARRAY[item.key],
+                            puddle_jsonb_merge_patch(result -> item.key, item.value)
+                        );
+                    END IF;
+                END LOOP;
+                RETURN result;
+            END
+            $$;
+        """,
+    },
+    {
+        "name": "0010_catalog_change_notify",
+        "sql": """
+            -- Publishes catalog changes on puddle_catalog_events so servers can drop cached
+            -- tool responses. Each trigger passes the columns whose updates are not catalog
+            -- changes (e.g. embedding backfills) as its arguments; see catalog_notify_trigger.
+            CREATE OR REPLACE FUNCTION puddle_notify_catalog_change()
+            RETURNS trigger
+            LANGUAGE plpgsql AS $$
+            DECLARE
+                row_data jsonb;
+                ignored text[] := TG_ARGV;
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    row_data := to_jsonb(OLD);
+                ELSE
+                    row_data := to_jsonb(NEW);
+                END IF;
+                IF TG_OP = 'UPDATE' AND row_data - ignored = to_jsonb(OLD) - ignored THEN
+                    RETURN NULL;
+                END IF;
+                PERFORM pg_notify('puddle_catalog_events', json_build_object(
+                    'table', TG_TABLE_NAME,
+                    'op', lower(TG_OP),
+                    'vendor_id', CASE TG_TABLE_NAME
+                        WHEN 'vendors' THEN row_data ->> 'id'
+                        WHEN 'datasets' THEN row_data ->> 'vendor_id'
+                    END,
+                    'dataset_id', CASE TG_TABLE_NAME
+                        WHEN 'datasets' THEN row_data ->> 'id'
+                        WHEN 'dataset_columns' THEN row_data ->> 'dataset_id'
+                    END
+                )::text);
+                RETURN NULL;
+            END
+            $$;
+        """ + catalog_notify_trigger("vendors", ("search_tsv", "updated_at"))
+            + catalog_notify_trigger("datasets", ("embedding", "embedding_hash", "search_tsv", "updated_at"))
+            + catalog_notify_trigger("dataset_columns", ("updated_at",)),
+    },
+    {
+        "name": "0011_embedding_profile",
+        "sql": """
+            -- Embedding profile the stored vectors were built with (see embedding_profiles.py);
+            -- a single row, read by every server so queries are embedded the same way.
+            CREATE TABLE IF NOT EXISTS embedding_profile (
+                singleton BOOLEAN PRIMARY KEY DEFAULT true CHECK (singleton),
+                name TEXT NOT NULL,
+                dims INTEGER NOT NULL,
+                storage TEXT NOT NULL,
+                binary_rerank BOOLEAN NOT NULL DEFAULT false,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            );
+            INSERT INTO embedding_profile (name, dims, storage)
+            VALUES ('full', 1536, 'vector')
+            ON CONFLICT (singleton) DO NOTHING;
+
+            -- Re-embedding into the shadow columns of a profile switch is not a catalog change
+        """ + catalog_notify_trigger("datasets", (
+            "embedding", "embedding_hash", "embedding_next", "embedding_next_hash",
+            "embedding_prev", "embedding_prev_hash", "search_tsv", "updated_at",
+        )),
+    },
+    {
+        "name": "0012_embedding_change_notify",
+        "sql": """
+            -- Publishes on puddle_embedding_events when stored embeddings change, which the
+            -- catalog trigger skips, so servers stop serving a vector snapshot built before a
+            -- backfill. One event per statement; Postgres folds the identical notifications of
+            -- a transaction into one, so a backfill batch sends a single event.
+            CREATE OR REPLACE FUNCTION puddle_notify_embedding_change()
+            RETURNS trigger
+            LANGUAGE plpgsql AS $$
+            BEGIN
+                PERFORM pg_notify('puddle_embedding_events', json_build_object('table', TG_TABLE_NAME)::text);
+                RETURN NULL;
+            END
+            $$;
+
+            DROP TRIGGER IF EXISTS datasets_notify_embedding_change ON datasets;
+            CREATE TRIGGER datasets_notify_embedding_change AFTER UPDATE OF embedding, embedding_hash ON datasets
+                FOR EACH STATEMENT EXECUTE FUNCTION puddle_notify_embedding_change();
+        """,
+    },
+]
+
+
+def _ensure_migrations_table(conn):
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS puddle_schema_migrations (
+                name TEXT PRIMARY KEY,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            );
+            """
+        )
+    conn.commit()
+
+
+def get_applied_migrations(conn) -> List[str]:
+    _ensure_migrations_table(conn)
+    with conn.cursor() as cur:
+        cur.execute("SELECT name FROM puddle_schema_migrations ORDER BY name")
+        names = [row[0] for row in cur.fetchall()]
+    conn.commit()
+    return names
+
+
+_CONCURRENT_INDEX = re.compile(r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)", re.I)
+
+
+def _drop_invalid_index(cur, statement: str, verbose: bool):
+    """
+    An interrupted CREATE INDEX CONCURRENTLY leaves an INVALID index behind, which
+    IF NOT EXISTS would then keep; drop it so the statement builds the index again.
+    """
+    match = _CONCURRENT_INDEX.search(statement)
+    if not match:
+        return
+    name = match.group(1)
+    cur.execute(
+        """
+        SELECT i.indisvalid
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = %s AND pg_table_is_visible(c.oid)
+        """,
+        (name,),
+    )
+    row = cur.fetchone()
+    if row and not row[0]:
+        if verbose:
+            print(f"Dropping invalid index {name} ...")
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def apply_migrations(verbose: bool = True) -> List[str]:
+    """
+    Applies every pending migration in order and returns the names of those applied.
+    """
+    conn = get_db_connection()
+    applied_now = []
+    try:
+        applied = set(get_applied_migrations(conn))
+        for migration in MIGRATIONS:
+            name = migration["name"]
+            if name in applied:
+                continue
+            if verbose:
+                print(f"Applying {name} ...")
+
+            transactional = migration.get("transactional", True)
+            conn.autocommit = not transactional
+            try:
+                statements = migration["sql"]
+                if isinstance(statements, str):
+                    statements = [statements]
+                with conn.cursor() as cur:
+                    for statement in statements:
+                        if not transactional:
+                            _drop_invalid_index(cur, statement, verbose)
+                        cur.execute(statement)
+                    cur.execute("INSERT INTO puddle_schema_migrations (name) VALUES (%s)", (name,))
+                if transactional:
+                    conn.commit()
+            except Exception:
+                if transactional:
+                    conn.rollback()
+                raise
+            finally:
+                conn.autocommit = False
+            applied_now.append(name)
+    finally:
+        conn.close()
+
+    if verbose and not applied_now:
+        print("Schema is up to date.")
+    return applied_now
+
+
+# ==========================================
+# VECTOR (ANN) INDEX MANAGEMENT
+# ==========================================
+
+VECTOR_INDEX_TYPES = ("hnsw", "ivfflat")
+
+
+def vector_index_name(kind: str, profile: Dict[str, Any], column: str = "embedding") -> str:
+    """e.g. datasets_embedding_hnsw_idx, or datasets_embedding_bit_hnsw_idx for binary profiles."""
+    return f"datasets_{column}{'_bit' if profile['binary'] else ''}_{kind}_idx"
+
+
+def vector_index_opclass(profile: Dict[str, Any]) -> str:
+    return "bit_hamming_ops" if profile["binary"] else cosine_opclass(profile)
+
+
+def vector_index_key(profile: Dict[str, Any], column: str) -> str:
+    """Indexed column or expression; binary profiles index the Hamming code of the vector."""
+    if profile["binary"]:
+        return f"({binary_expression(profile, column)}) bit_hamming_ops"
+    return f"{column} {cosine_opclass(profile)}"
+
+
+_VECTOR_INDEX_SQL = """
+    SELECT
+        c.relname AS index_name,
+        am.amname AS method,
+        opc.opcname AS opclass,
+        i.indisvalid AS is_valid,
+        i.indisready AS is_ready,
+        pg_relation_size(i.indexrelid) AS size_bytes,
+        i.indpred IS NOT NULL AS is_partial,
+        pg_get_indexdef(i.indexrelid) AS definition
+    FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indexrelid
+    JOIN pg_am am ON am.oid = c.relam
+    JOIN pg_opclass opc ON opc.oid = i.indclass[0]
+    WHERE i.indrelid = 'datasets'::regclass
+      AND am.amname IN ('hnsw', 'ivfflat')
+    ORDER BY c.relname;
+"""
+
+
+def validate_vector_index(kind: str = VECTOR_INDEX_TYPE, profile: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Inspects the ANN indexes on datasets.embedding.
+
+    Returns {"ok": bool, "indexes": [...], "problems": [...]}. The index is OK when a
+    valid index of the configured kind uses the operator class the embedding profile
+    searches with (vector_cosine_ops for the default profile, what `<=>` needs).
+    A full (non-partial) index still works but also indexes private/inactive rows.
+    """
+    profile = profile or active_profile()
+    opclass = vector_index_opclass(profile)
+    conn = get_db_connection()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(_VECTOR_INDEX_SQL)
+            indexes = [dict(r) for r in cur.fetchall()]
+    finally:
+        conn.close()
+
+    problems = []
+    usable = [
+        ix for ix in indexes
+        if ix["method"] == kind and ix["opclass"] == opclass and ix["is_valid"]
+    ]
+    for ix in indexes:
+        if not ix["is_valid"]:
+            problems.append(f"{ix['index_name']} is INVALID (interrupted concurrent build); drop and rebuild it.")
+        if ix["opclass"] != opclass:
+            problems.append(
+                f"{ix['index_name']} uses {ix['opclass']}; the '{profile['name']}' profile searches with {opclass}."
+            )
+        elif ix["method"] != kind:
+            problems.append(f"{ix['index_name']} is {ix['method']}, not the configured {kind}; drop it if unused.")
+        elif not ix["is_partial"]:
+            problems.append(f"{ix['index_name']} is not partial; rebuild it to cover only public/active datasets.")
+    if not usable:
+        problems.append(f"No valid {kind} index with {opclass} on datasets.embedding; searches do a full scan.")
+
+    return {"ok": bool(usable), "indexes": indexes, "problems": problems}
+
+
+def _default_ivfflat_lists(conn, column: str = "embedding") -> int:
+    """pgvector guidance: rows / 1000 up to 1M rows, sqrt(rows) beyond."""
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT count(*) FROM datasets WHERE {column} IS NOT NULL AND {SEARCHABLE_DATASETS_PREDICATE}")
+        rows = cur.fetchone()[0]
+    conn.commit()
+    if rows > 1_000_000:
+        return int(math.sqrt(rows))
+    return max(1, rows // 1000)
+
+
+def ensure_vector_index(
+    kind: str = VECTOR_INDEX_TYPE,
+    rebuild: bool = False,
+    m: int = HNSW_M,
+    ef_construction: int = HNSW_EF_CONSTRUCTION,
+    lists: Optional[int] = None,
+    verbose: bool = True,
+    profile: Optional[Dict[str, Any]] = None,
+    column: str = "embedding",
+) -> Dict[str, Any]:
+    """
+    Creates the ANN index on datasets.embedding (CONCURRENTLY, so reads and writes continue):
+    cosine distance on the stored vectors, or Hamming distance on their binary quantization
+    for binary embedding profiles. `column` builds it on a profile switch's shadow column.
+    The index is partial on public/active datasets, the only rows search ever returns, so
+    the ANN scan never wastes candidates on rows the visibility/status filter would drop.
+
+    Invalid leftovers from interrupted builds are dropped. With rebuild=True the existing
+    index of this kind is replaced, e.g. after changing m / ef_construction / lists.
+    Returns the validation report after the build.
+    """
+    if kind not in VECTOR_INDEX_TYPES:
+        raise ValueError(f"Unknown vector index type '{kind}'. Use one of: {', '.join(VECTOR_INDEX_TYPES)}")
+
+    profile = profile or active_profile()
+    name = vector_index_name(kind, profile, column)
+    report = validate_vector_index(kind, profile)
+    existing = {ix["index_name"]: ix for ix in report["indexes"]}
+
+    if name in existing and existing[name]["is_valid"] and not rebuild:
+        if verbose:
+            print(f"{name} already exists and is valid.")
+        return report
+
+    conn = get_db_connection()
+    try:
+        if kind == "ivfflat":
+            lists = lists or IVFFLAT_LISTS or _default_ivfflat_lists(conn, column)
+            with_clause = f"(lists = {int(lists)})"
+        else:
+            with_clause = f"(m = {int(m)}, ef_construction = {int(ef_construction)})"
+
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            if name in existing:
+                if verbose:
+                    print(f"Dropping {name} ...")
+                cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+            if verbose:
+                print(f"Building {name} {with_clause} ...")
+            started = time.monotonic()
+            cur.execute(
+                f"CREATE INDEX CONCURRENTLY {name} ON datasets "
+                f"USING {kind} ({vector_index_key(profile, column)}) WITH {with_clause} "
+                f"WHERE {SEARCHABLE_DATASETS_PREDICATE}"
+            )
+            cur.execute("ANALYZE datasets")
+            if verbose:
+                print(f"Built {name} in {time.monotonic() - started:.1f}s")
+    finally:
+        conn.close()
+
+    return validate_vector_index(kind, profile)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", action="store_true", help="List applied and pending migrations")
+    parser.add_argument("--vector-index", choices=sorted(VECTOR_INDEX_TYPES), help="Create the ANN index of this type")
+    parser.add_argument("--rebuild", action="store_true", help="Replace an existing ANN index (with --vector-index)")
+    parser.add_argument("--check-vector-index", action="store_true", help="Validate the ANN index")
+    opts = parser.parse_args()
+
+    if opts.vector_index or opts.check_vector_index:
+        if opts.vector_index:
+            report = ensure_vector_index(opts.vector_index, rebuild=opts.rebuild)
+        else:
+            report = validate_vector_index()
+        for ix in report["indexes"]:
+            print(f"{ix['index_name']}: {ix['method']} {ix['opclass']} valid={ix['is_valid']} size={ix['size_bytes']} bytes")
+        for problem in report["problems"]:
+            print(f"PROBLEM: {problem}")
+        return
+
+    if opts.status:
+        conn = get_db_connection()
+        try:
+            applied = set(get_applied_migrations(conn))
+        finally:
+            conn.close()
+        for migration in MIGRATIONS:
+            state = "applied" if migration["name"] in applied else "pending"
+            print(f"{state:8} {migration['name']}")
+        return
+
+    apply_migrations()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Opt-in slow-query log for run_pg_sql / run_pg_sql_async.
+
+Statements slower than SLOW_QUERY_MS are logged (WARNING) with their normalized SQL,
+parameter shapes (never values), duration and row count. The duration starts at
+connection checkout, so time spent waiting on the pool is not included. They are
+kept in a ring buffer of recent entries and aggregated per normalized statement.
+A sampled fraction of slow read-only statements is re-run under EXPLAIN (ANALYZE,
+BUFFERS) on a background thread and the plan is stored with the statement's stats.
+Read it through GET /admin/slow-queries.
+"""
+import os
+import re
+import time
+import random
+import hashlib
+import logging
+import threading
+import functools
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+from puddle_server.db_pool import get_pool
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# 0 disables the slow-query log
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", 0))
+# Fraction of slow read-only statements re-run with EXPLAIN (ANALYZE, BUFFERS)
+SLOW_QUERY_EXPLAIN_SAMPLE = float(os.environ.get("SLOW_QUERY_EXPLAIN_SAMPLE", 0))
+SLOW_QUERY_LOG_SIZE = int(os.environ.get("SLOW_QUERY_LOG_SIZE", 200))
+SLOW_QUERY_MAX_STATEMENTS = int(os.environ.get("SLOW_QUERY_MAX_STATEMENTS", 500))
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_WRITE_KEYWORD = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE|TRUNCATE|CREATE|ALTER|DROP|GRANT|REVOKE|COPY|CALL|DO)\b", re.I)
+# Functions with side effects that a read-only statement may still call
+_SIDE_EFFECT_CALL = re.compile(r"\b(pg_notify|nextval|setval|set_config|pg_advisory\w*|dblink\w*)\s*\(", re.I)
+
+
+@functools.lru_cache(maxsize=1024)
+def normalize_sql(query: str) -> str:
+    """Collapses whitespace and replaces literals and placeholders with `?`."""
+    sql = _STRING_LITERAL.sub("?", query)
+    sql = sql.replace("%%", "%").replace("%s", "?")
+    sql = _NUMBER.sub("?", sql)
+    return " ".join(sql.split())
+
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+def param_shape(value: Any) -> str:
+    """Type (and length for containers) of one parameter, without its value."""
+    if value is None:
+        return "null"
+    if isinstance(value, (list, tuple)):
+        return f"{type(value).__name__}[{len(value)}]"
+    if isinstance(value, str):
+        # Vectors are passed as '[x,y,...]' text
+        if value.startswith("[") and value.endswith("]"):
+            return f"vector[{value.count(',') + 1}]"
+        return "str"
+    return type(value).__name__
+
+
+def is_read_only(query: str) -> bool:
+    """Conservative check that re-running `query` under EXPLAIN ANALYZE changes nothing."""
+    head = query.lstrip().split(None, 1)[0].upper() if query.strip() else ""
+    if head not in ("SELECT", "WITH"):
+        return False
+    return not (_WRITE_KEYWORD.search(query) or _SIDE_EFFECT_CALL.search(query) or "FOR UPDATE" in query.upper())
+
+
+class SlowQueryLog:
+    """Ring buffer of recent slow statements plus bounded per-statement aggregates."""
+
+    def __init__(self, log_size: int, max_statements: int):
+        self.max_statements = max_statements
+        self._recent: deque = deque(maxlen=log_size)
+        self._statements: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._explain_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="puddle-explain")
+        self._explains_pending = 0
+
+    def record(self, query: str, params, seconds: float, rows: int, settings: Optional[Dict[str, Any]], error: bool):
+        normalized = normalize_sql(query)
+        fp = fingerprint(normalized)
+        shapes = [param_shape(p) for p in params] if isinstance(params, (list, tuple)) else []
+        duration_ms = round(seconds * 1000, 3)
+        entry = {
+            "fingerprint": fp,
+            "at": time.time(),
+            "duration_ms": duration_ms,
+            "rows": rows,
+            "params": shapes,
+            "error": error,
+        }
+        with self._lock:
+            self._recent.append(entry)
+            stats = self._statements.get(fp)
+            if stats is None:
+                stats = {
+                    "fingerprint": fp,
+                    "sql": normalized,
+                    "calls": 0,
+                    "errors": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "rows": 0,
+                    "explain": None,
+                }
+                self._statements[fp] = stats
+                while len(self._statements) > self.max_statements:
+                    self._statements.popitem(last=False)
+            self._statements.move_to_end(fp)
+            stats["calls"] += 1
+            stats["errors"] += int(error)
+            stats["total_ms"] += duration_ms
+            stats["max_ms"] = max(stats["max_ms"], duration_ms)
+            stats["rows"] += rows
+            stats["last_params"] = shapes
+            explain = (
+                not error
+                and SLOW_QUERY_EXPLAIN_SAMPLE > 0
+                and self._explains_pending < 2
+                and random.random() < SLOW_QUERY_EXPLAIN_SAMPLE
+                and is_read_only(query)
+            )
+            if explain:
+                self._explains_pending += 1
+
+        logger.warning("Slow query (%s ms, %s rows) [%s] params=%s: %s", duration_ms, rows, fp, shapes, normalized[:500])
+        if explain:
+            self._explain_executor.submit(self._explain, fp, query, params, settings)
+
+    def _explain(self, fp: str, query: str, params, settings: Optional[Dict[str, Any]]):
+        """Re-runs the statement under EXPLAIN ANALYZE in a rolled-back transaction."""
+        from puddle_server.utils import _settings_statement
+
+        try:
+            with get_pool().connection() as conn:
+                try:
+                    with conn.cursor() as cur:
+                        if settings:
+                            cur.execute(*_settings_statement(settings))
+                        cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + query, params)
+                        plan = "\n".join(row[0] for row in cur.fetchall())
+                finally:
+                    conn.rollback()
+            with self._lock:
+                stats = self._statements.get(fp)
+                if stats is not None:
+                    stats["explain"] = {"at": time.time(), "plan": plan}
+        except Exception as e:
+            logger.error("Slow query EXPLAIN failed [%s]: %s", fp, e)
+        finally:
+            with self._lock:
+                self._explains_pending -= 1
+
+    def snapshot(self, limit: int = 50) -> Dict[str, Any]:
+        """Slowest statements by total time, and the most recent slow executions."""
+        with self._lock:
+            statements = [dict(s) for s in self._statements.values()]
+            recent = list(self._recent)[-limit:]
+        for s in statements:
+            s["mean_ms"] = round(s["total_ms"] / s["calls"], 3)
+            s["total_ms"] = round(s["total_ms"], 3)
+        statements.sort(key=lambda s: s["total_ms"], reverse=True)
+        return {
+            "threshold_ms": SLOW_QUERY_MS,
+            "explain_sample": SLOW_QUERY_EXPLAIN_SAMPLE,
+            "statements": statements[:limit],
+            "recent": recent[::-1],
+        }
+
+    def reset(self):
+        with self._lock:
+            self._recent.clear()
+            self._statements.clear()
+
+
+_slow_query_log = SlowQueryLog(SLOW_QUERY_LOG_SIZE, SLOW_QUERY_MAX_STATEMENTS)
+
+
+def observe_query(query: str, params, seconds: float, rows: int, settings: Optional[Dict[str, Any]] = None, error: bool = False):
+    """Called after every run_pg_sql statement; only statements over the threshold are recorded."""
+    if SLOW_QUERY_MS <= 0 or seconds * 1000 < SLOW_QUERY_MS:
+        return
+    _slow_query_log.record(query, params, seconds, rows, settings, error)
+
+
+def get_slow_query_log() -> SlowQueryLog:
+    return _slow_query_log
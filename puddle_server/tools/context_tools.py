@@ -1,6 +1,22 @@
 from puddle_server.mcp import mcp
-from puddle_server.utils import run_pg_sql, get_embedding
+from puddle_server.utils import run_pg_sql_async, run_in_worker, get_embedding_async, get_embeddings_async
+from puddle_server.vector_search import (
+    build_dataset_filters, semantic_search_rows, hybrid_search_rows, batch_semantic_search_rows, cursor_position,
+    trigram_settings, vendor_join, HYBRID_RRF_K, DATASET_RESULT_COLUMNS,
+)
+from puddle_server.cursors import encode_cursor, decode_cursor, InvalidCursor
+from puddle_server.response_cache import (
+    cached_tool, vendor_tag, dataset_tag, VENDORS_TABLE, DATASETS_TABLE,
+)
+from puddle_server.catalog_snapshot import current_snapshot
+from puddle_server.embedding_profiles import active_profile
+from puddle_server.output_modes import (
+    COMPACT_TEXT_CHARS, ToolResult, check_output, requested_fields, selected_fields, select_list, compact_rows,
+    render_records, render_record,
+)
 from typing import Optional, List
+import os
+import uuid
 
 # ==========================================
 # HELPER FORMATTERS
@@ -31,73 +47,209 @@ def format_dataset_str(d: dict, score: float = None) -> str:
         f" - Description: {d.get('description', 'No description.')}"
     )
 
+def format_next_page(cursor: str) -> str:
+    """Helper to tell the agent how to fetch the next page."""
+    return f"More results available. For the next page, call again with the same arguments and cursor=\"{cursor}\""
+
 # ==========================================
 # VENDOR TOOLS
 # ==========================================
 
+# Fields search_vendors can return, and their SQL (see its `fields` argument)
+VENDOR_SEARCH_COLUMNS = {
+    "id": "id",
+    "name": "name",
+    "industry_focus": "industry_focus",
+    "description": "description",
+    "country": "country",
+    "region": "region",
+    "city": "city",
+    "organization_type": "organization_type",
+    "founded_year": "founded_year",
+}
+VENDOR_SEARCH_FIELDS = (*VENDOR_SEARCH_COLUMNS, "match_score")
+VENDOR_SEARCH_COMPACT_FIELDS = ("id", "name", "industry_focus", "country", "description")
+
+async def _search_vendors_sql(
+    query: str,
+    limit: int,
+    after: Optional[dict],
+    fields: Optional[List[str]] = None,
+    compact: bool = False
+):
+    """search_vendors rows from Postgres (limit + 1 of them, to detect a next page)."""
+    keyset_sql, keyset_params = "", []
+    if after:
+        # Resume strictly after the last row of the previous page (ORDER BY score DESC, name, id).
+        # Names compare by codepoint (COLLATE "C"), as in the catalog snapshot, so a cursor
+        # issued by either backend resumes at the same row on the other.
+        keyset_sql = 'WHERE match_score < %s OR (match_score = %s AND (name COLLATE "C", id) > (%s, %s))'
+        keyset_params = [after["score"], after["score"], after["name"], after["id"]]
+
+    sql = f"""
+        SELECT * FROM (
+            SELECT 
+                {select_list(VENDOR_SEARCH_COLUMNS, fields, compact, ("description",), required=("id", "name"))},
+                GREATEST(
+                    word_similarity(%s, name),
+                    word_similarity(%s, coalesce(industry_focus, ''))
+                ) as match_score
+            FROM vendors
+            WHERE 
+                name ILIKE %s OR 
+                industry_focus ILIKE %s OR
+                %s <%% name OR
+                %s <%% industry_focus
+        ) matches
+        {keyset_sql}
+        ORDER BY match_score DESC, name COLLATE "C", id
+        LIMIT %s;
+    """
+    search_term = f"%{query}%"
+    return await run_pg_sql_async(
+        sql,
+        (query, query, search_term, search_term, query, query, *keyset_params, limit + 1),
+        settings=trigram_settings(),
+    )
+
+
 @mcp.tool(
     description="Search for data vendors (companies) by name or industry. Use this to find who is selling data."
 )
-def search_vendors(query: str, limit: int = 5) -> str:
+@cached_tool(lambda **args: [VENDORS_TABLE])
+async def search_vendors(
+    query: str,
+    limit: int = 5,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    output: str = "text"
+) -> ToolResult:
     """
-    Search for vendors by name or industry focus using a partial match.
+    Search for vendors by name or industry focus. Matches substrings and, to tolerate typos,
+    similar words (pg_trgm); the best matches come first.
     
     Args:
         query: The search term (e.g., "Healthcare", "Global Analytics", "Finance").
         limit: The maximum number of vendors to return (default: 5).
+        cursor: Optional continuation cursor from a previous call with the same query, to get the next page.
+        fields: Optional subset of fields to return (default: all): id, name, industry_focus, description,
+                country, region, city, organization_type, founded_year, match_score.
+        output: "text" (default), "compact" (one line per vendor with its key fields, descriptions shortened) or
+                "structured" (JSON items in the structured result).
 
     Returns:
         A formatted string list of vendors matching the criteria.
     """
-    sql = """
-        SELECT 
-            id, name, industry_focus, description, 
-            country, region, city, organization_type, founded_year
-        FROM vendors
-        WHERE 
-            name ILIKE %s OR 
-            industry_focus ILIKE %s
-        LIMIT %s;
-    """
-    search_term = f"%{query}%"
-    results = run_pg_sql(sql, (search_term, search_term, limit))
+    error = check_output(output, fields, VENDOR_SEARCH_FIELDS)
+    if error:
+        return f"Error: {error}"
+    if limit < 1:
+        return "Error: limit must be at least 1."
+    fields = requested_fields(fields, output, VENDOR_SEARCH_COMPACT_FIELDS)
+
+    cursor_args = {"query": query}
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor, "search_vendors", cursor_args)
+        except InvalidCursor as e:
+            return f"Error: {e}"
+
+    snapshot = current_snapshot()
+    if snapshot is not None:
+        # One extra row tells us whether another page exists. Broad queries score thousands
+        # of names, so the search runs off the event loop
+        results = await run_in_worker(snapshot.search_vendors, query, limit + 1, after)
+        if output == "compact":
+            results = compact_rows(results, ("description",))
+    else:
+        results = await _search_vendors_sql(query, limit, after, fields, output == "compact")
     
-    if not results:
-        return "No vendors found matching your criteria."
+    empty = "No more vendors matching your criteria." if cursor else "No vendors found matching your criteria."
+    if not results and output != "structured":
+        return empty
+
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        last = results[-1]
+        next_cursor = encode_cursor(
+            "search_vendors", cursor_args,
+            {"score": last["match_score"], "name": last["name"], "id": str(last["id"])},
+        )
+
+    if fields or output != "text":
+        return render_records(
+            results, selected_fields(fields, VENDOR_SEARCH_FIELDS), output,
+            header=f"Found {len(results)} vendors matching '{query}':", empty=empty,
+            next_cursor=next_cursor, footer=format_next_page(next_cursor) if next_cursor else "",
+        )
         
     # Stitch results into a readable list
     output = [f"Found {len(results)} vendors matching '{query}':\n"]
     for v in results:
         output.append(format_vendor_str(v))
         output.append("---")
+    if next_cursor:
+        output.append(format_next_page(next_cursor))
         
     return "\n".join(output)
 
+# Fields get_vendor_details can return, and their SQL (see its `fields` argument)
+VENDOR_DETAIL_COLUMNS = {
+    "name": "name",
+    "industry_focus": "industry_focus",
+    "description": "description",
+    "website_url": "website_url",
+    "country": "country",
+    "region": "region",
+    "city": "city",
+    "organization_type": "organization_type",
+    "founded_year": "founded_year",
+}
+
 @mcp.tool(
     description="Get detailed profile information for a specific vendor using their ID."
 )
-def get_vendor_details(vendor_id: str) -> str:
+@cached_tool(lambda vendor_id, **args: [vendor_tag(vendor_id)])
+async def get_vendor_details(
+    vendor_id: str,
+    fields: Optional[List[str]] = None,
+    output: str = "text"
+) -> ToolResult:
     """
     Retrieve public detailed information about a specific vendor, including website, location, and full description.
 
     Args:
         vendor_id: The UUID of the vendor (usually obtained from search_vendors).
+        fields: Optional subset of fields to return (default: all): name, industry_focus, description,
+                website_url, country, region, city, organization_type, founded_year.
+        output: "text" (default), "compact" (one line, description shortened) or "structured" (JSON object).
 
     Returns:
         A detailed text profile of the vendor.
     """
-    sql = """
-        SELECT 
-            name, industry_focus, description, 
-            website_url, country, region, city, 
-            organization_type, founded_year
+    error = check_output(output, fields, VENDOR_DETAIL_COLUMNS)
+    if error:
+        return f"Error: {error}"
+
+    sql = f"""
+        SELECT {select_list(VENDOR_DETAIL_COLUMNS, fields, output == "compact", ("description",))}
         FROM vendors
         WHERE id = %s;
     """
-    v = run_pg_sql(sql, (vendor_id,), fetch_one=True)
+    snapshot = current_snapshot()
+    if snapshot is not None:
+        v = snapshot.vendor(vendor_id)
+        if v and output == "compact":
+            v = compact_rows([v], ("description",))[0]
+    else:
+        v = await run_pg_sql_async(sql, (vendor_id,), fetch_one=True)
     
     if not v:
         return "Vendor not found."
+    if fields or output != "text":
+        return render_record(v, selected_fields(fields, VENDOR_DETAIL_COLUMNS), output)
     
     loc = [v.get('city'), v.get('region'), v.get('country')]
     location_str = ", ".join(filter(None, loc))
@@ -116,139 +268,489 @@ def get_vendor_details(vendor_id: str) -> str:
 # DATASET TOOLS
 # ==========================================
 
+# Fields the dataset search tools can return (see their `fields` argument)
+SEMANTIC_SEARCH_FIELDS = (*DATASET_RESULT_COLUMNS, "similarity_score")
+HYBRID_SEARCH_FIELDS = (*SEMANTIC_SEARCH_FIELDS, "hybrid_score", "vector_rank", "text_rank")
+# Default fields of compact output: what an agent needs to pick a dataset
+DATASET_COMPACT_FIELDS = ("id", "title", "vendor_name", "domain", "pricing_model")
+
 @mcp.tool(
-    description="Search for datasets using natural language (semantic search). This is the primary tool for finding data."
+    description="Search for datasets using natural language (semantic search), optionally restricted by domain, pricing model, vendor, geography or time coverage. This is the primary tool for finding data."
 )
-def search_datasets_semantic(query: str, limit: int = 5) -> str:
+async def search_datasets_semantic(
+    query: str,
+    limit: int = 5,
+    domain: Optional[str] = None,
+    price_model: Optional[str] = None,
+    vendor: Optional[str] = None,
+    geography: Optional[str] = None,
+    time_range: Optional[str] = None,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    output: str = "text"
+) -> ToolResult:
     """
     Performs a semantic search to find relevant datasets based on meaning rather than just keywords.
-    It uses vector embeddings to calculate similarity.
+    It uses vector embeddings to calculate similarity. Optional filters are applied inside the same
+    vector scan, so there is no need to call filter_datasets and merge the results.
 
     Args:
         query: The user's natural language request (e.g., "I need data about patient outcomes" or "Stock market history").
         limit: The maximum number of datasets to return (default: 5).
+        domain: Optional domain filter (e.g., "Finance", "Healthcare").
+        price_model: Optional pricing model filter (e.g., "Free", "Subscription").
+        vendor: Optional vendor name filter (partial match).
+        geography: Optional geographic coverage filter (e.g., "Europe", "US").
+        time_range: Optional temporal coverage filter (e.g., "2020").
+        ef_search: Optional HNSW search breadth; higher improves recall at some latency cost (server default if omitted).
+        probes: Optional IVFFlat lists to probe; higher improves recall at some latency cost (server default if omitted).
+        cursor: Optional continuation cursor from a previous call with the same query and filters, to get the next page.
+        fields: Optional subset of fields to return (default: all): id, title, description, vendor_name,
+                domain, pricing_model, similarity_score.
+        output: "text" (default), "compact" (one line per dataset with its key fields, descriptions shortened) or
+                "structured" (JSON items in the structured result).
 
     Returns:
         A ranked list of datasets with titles, descriptions, IDs, and relevance scores.
     """
-    query_embedding = get_embedding(query)
-    
-    sql = """
-        SELECT 
-            d.id, d.title, d.description,
-            v.name as vendor_name,
-            d.domain, d.pricing_model,
-            1 - (d.embedding <=> %s::vector) as similarity_score
-        FROM datasets d
-        JOIN vendors v ON d.vendor_id = v.id
-        WHERE d.visibility = 'public' 
-          AND d.status = 'active'
-        ORDER BY d.embedding <=> %s::vector
-        LIMIT %s;
-    """
-    
-    results = run_pg_sql(sql, (str(query_embedding), str(query_embedding), limit))
+    error = check_output(output, fields, SEMANTIC_SEARCH_FIELDS)
+    if error:
+        return f"Error: {error}"
+    if limit < 1:
+        return "Error: limit must be at least 1."
+    fields = requested_fields(fields, output, (*DATASET_COMPACT_FIELDS, "similarity_score", "description"))
+
+    cursor_args = {
+        "query": query, "domain": domain, "price_model": price_model,
+        "vendor": vendor, "geography": geography, "time_range": time_range,
+    }
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor, "search_datasets_semantic", cursor_args)
+        except InvalidCursor as e:
+            return f"Error: {e}"
+
+    query_embedding = await get_embedding_async(query, output_dim=active_profile()["dims"])
+    # One extra row tells us whether another page exists
+    results = await semantic_search_rows(
+        query_embedding, limit + 1,
+        domain=domain, price_model=price_model, vendor=vendor, geography=geography, time_range=time_range,
+        ef_search=ef_search, probes=probes, after=after, fields=fields, compact=output == "compact",
+    )
     
-    if not results:
-        return "No relevant datasets found."
+    empty = "No more relevant datasets." if cursor else "No relevant datasets found."
+    if not results and output != "structured":
+        return empty
+
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        next_cursor = encode_cursor("search_datasets_semantic", cursor_args, cursor_position(results, after))
+
+    if fields or output != "text":
+        return render_records(
+            results, selected_fields(fields, SEMANTIC_SEARCH_FIELDS), output,
+            header=f"Found {len(results)} datasets relevant to: '{query}':", empty=empty,
+            next_cursor=next_cursor, footer=format_next_page(next_cursor) if next_cursor else "",
+        )
         
     output = [f"Found {len(results)} datasets relevant to: '{query}':\n"]
     
     for d in results:
         output.append(format_dataset_str(d, score=d['similarity_score']))
         output.append("---")
+    if next_cursor:
+        output.append(format_next_page(next_cursor))
         
     return "\n".join(output)
 
 @mcp.tool(
-    description="Filter datasets by specific attributes like Domain or Pricing Model. Use this for narrowing down results."
+    description="Hybrid dataset search combining keyword (full-text) and semantic matching. Use this when the query contains exact terms such as product codes, vendor names or ticker symbols."
 )
-def filter_datasets(
-    domain: Optional[str] = None, 
+async def search_datasets_hybrid(
+    query: str,
+    limit: int = 5,
+    vector_weight: float = 1.0,
+    text_weight: float = 1.0,
+    domain: Optional[str] = None,
     price_model: Optional[str] = None,
-    limit: int = 10
-) -> str:
+    vendor: Optional[str] = None,
+    geography: Optional[str] = None,
+    time_range: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    output: str = "text"
+) -> ToolResult:
     """
-    Filter datasets by structured attributes. Useful when the user has specific hard constraints.
+    Ranks datasets by reciprocal rank fusion of a full-text match and a vector similarity search,
+    so exact-term queries find their datasets while paraphrases still work.
 
     Args:
-        domain: The domain of the dataset (e.g., "Finance", "Healthcare", "Retail").
-        price_model: The pricing model (e.g., "Free", "Subscription", "Usage-based").
-        limit: Maximum results to return (default: 10).
+        query: Search text; exact terms (codes, names, tickers) are matched lexically, the meaning semantically.
+        limit: The maximum number of datasets to return (default: 5).
+        vector_weight: Weight of the semantic ranking in the fused score (default: 1.0).
+        text_weight: Weight of the keyword ranking in the fused score (default: 1.0).
+        domain: Optional domain filter (e.g., "Finance", "Healthcare").
+        price_model: Optional pricing model filter (e.g., "Free", "Subscription").
+        vendor: Optional vendor name filter (partial match).
+        geography: Optional geographic coverage filter (e.g., "Europe", "US").
+        time_range: Optional temporal coverage filter (e.g., "2020").
+        fields: Optional subset of fields to return (default: all): id, title, description, vendor_name,
+                domain, pricing_model, similarity_score, hybrid_score, vector_rank, text_rank.
+        output: "text" (default), "compact" (one line per dataset with its key fields, descriptions shortened) or
+                "structured" (JSON items in the structured result).
 
     Returns:
-        A list of datasets matching the specific filters.
-    """
-    sql = """
-        SELECT d.id, d.title, d.domain, d.pricing_model, d.description, v.name as vendor_name
-        FROM datasets d
-        JOIN vendors v ON d.vendor_id = v.id
-        WHERE d.visibility = 'public' AND d.status = 'active'
+        A ranked list of datasets with titles, descriptions, IDs, and how each was matched.
     """
-    params = []
-    
-    if domain:
-        sql += " AND d.domain ILIKE %s"
-        params.append(f"%{domain}%")
-    
-    if price_model:
-        sql += " AND d.pricing_model ILIKE %s"
-        params.append(f"%{price_model}%")
-        
-    sql += " LIMIT %s"
-    params.append(limit)
-    
-    results = run_pg_sql(sql, tuple(params))
-    
+    error = check_output(output, fields, HYBRID_SEARCH_FIELDS)
+    if error:
+        return f"Error: {error}"
+    fields = requested_fields(fields, output, (*DATASET_COMPACT_FIELDS, "hybrid_score", "description"))
+
+    query_embedding = await get_embedding_async(query, output_dim=active_profile()["dims"])
+    results = await hybrid_search_rows(
+        query, query_embedding, limit,
+        vector_weight=vector_weight, text_weight=text_weight,
+        domain=domain, price_model=price_model, vendor=vendor, geography=geography, time_range=time_range,
+        fields=fields, compact=output == "compact",
+    )
+
+    if fields or output != "text":
+        return render_records(
+            results or [], selected_fields(fields, HYBRID_SEARCH_FIELDS), output,
+            header=f"Found {len(results or [])} datasets relevant to: '{query}':", empty="No relevant datasets found.",
+        )
     if not results:
-        return "No datasets found matching the applied filters."
+        return "No relevant datasets found."
 
-    output = [f"Filtered Search Results ({len(results)} found):\n"]
+    output = [f"Found {len(results)} datasets relevant to: '{query}':\n"]
     for d in results:
-        output.append(format_dataset_str(d))
+        matched = [
+            label for label, rank in (("semantic", d['vector_rank']), ("keyword", d['text_rank']))
+            if rank is not None
+        ]
+        output.append(format_dataset_str(d, score=d['similarity_score']))
+        output.append(f" - Matched by: {' + '.join(matched)} (Hybrid Score: {d['hybrid_score']:.4f})")
         output.append("---")
-        
+
     return "\n".join(output)
 
+# Queries per batch_search call, and description characters kept per merged result
+BATCH_SEARCH_MAX_QUERIES = int(os.environ.get("BATCH_SEARCH_MAX_QUERIES", 10))
+BATCH_SEARCH_DESCRIPTION_CHARS = int(os.environ.get("BATCH_SEARCH_DESCRIPTION_CHARS", 160))
+BATCH_SEARCH_FIELDS = (*SEMANTIC_SEARCH_FIELDS, "queries")
+BATCH_SEARCH_COMPACT_FIELDS = ("id", "title", "vendor_name", "domain", "similarity_score", "queries", "description")
+
 @mcp.tool(
-    description="Get a complete report of a dataset, including its Column Schema (structure) and full metadata."
+    description="Run several semantic dataset searches in one call (e.g. rephrasings of the same need) with shared optional filters. Results are merged and de-duplicated across queries, ranked by how consistently each dataset matches, in a compact format."
 )
-def get_dataset_details_complete(dataset_id: str) -> str:
+async def batch_search(
+    queries: List[str],
+    limit: int = 5,
+    domain: Optional[str] = None,
+    price_model: Optional[str] = None,
+    vendor: Optional[str] = None,
+    geography: Optional[str] = None,
+    time_range: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    output: str = "text"
+) -> ToolResult:
     """
-    Retrieves COMPLETE details about a dataset. Use this when the user asks for "details", "schema", "columns",
-    or "what is inside" a specific dataset.
+    Fans out several semantic searches in a single request: the queries are embedded together
+    and searched in one database statement, then merged by reciprocal rank fusion, so a dataset
+    found by several phrasings ranks above one found by a single phrasing.
 
     Args:
-        dataset_id: The UUID of the dataset (usually obtained from search_datasets_semantic).
+        queries: Natural language queries, e.g. rephrasings of the buyer's need (at most 10 by default).
+        limit: The maximum number of datasets per query before merging (default: 5).
+        domain: Optional domain filter applied to every query (e.g., "Finance", "Healthcare").
+        price_model: Optional pricing model filter (e.g., "Free", "Subscription").
+        vendor: Optional vendor name filter (partial match).
+        geography: Optional geographic coverage filter (e.g., "Europe", "US").
+        time_range: Optional temporal coverage filter (e.g., "2020").
+        fields: Optional subset of fields to return (default: all): id, title, description, vendor_name,
+                domain, pricing_model, similarity_score (the best match), queries.
+        output: "text" (default), "compact" (one line per dataset) or "structured" (JSON items, and
+                the numbered queries, in the structured result).
 
     Returns:
-        A formatted text report containing metadata, vendor info, and a list of columns with their data types.
+        One compact line per distinct dataset with its ID, best match score and the queries that found it.
     """
-    # 1. Get Metadata
-    meta_sql = """
-        SELECT 
-            d.title, d.description, d.domain, d.granularity, 
-            d.pricing_model, d.license, 
-            d.temporal_coverage, d.geographic_coverage,
-            v.name as vendor_name, v.contact_email as vendor_contact
+    error = check_output(output, fields, BATCH_SEARCH_FIELDS)
+    if error:
+        return f"Error: {error}"
+    if limit < 1:
+        return "Error: limit must be at least 1."
+    fields = requested_fields(fields, output, BATCH_SEARCH_COMPACT_FIELDS)
+
+    queries = list(dict.fromkeys(q.strip() for q in queries if q and q.strip()))
+    if not queries:
+        return "Error: Provide at least one query."
+    if len(queries) > BATCH_SEARCH_MAX_QUERIES:
+        return f"Error: At most {BATCH_SEARCH_MAX_QUERIES} queries per call."
+
+    embeddings = await get_embeddings_async(queries, output_dim=active_profile()["dims"])
+    searched = [(n, e) for n, e in enumerate(embeddings, 1) if e]
+    if not searched:
+        return "Error: Could not embed the queries. Please try again."
+
+    description_chars = COMPACT_TEXT_CHARS if output == "compact" else BATCH_SEARCH_DESCRIPTION_CHARS
+    per_query = await batch_semantic_search_rows(
+        [e for _, e in searched], limit,
+        domain=domain, price_model=price_model, vendor=vendor, geography=geography, time_range=time_range,
+        description_chars=description_chars, fields=fields,
+    )
+
+    merged = {}
+    for (n, _), rows in zip(searched, per_query):
+        for rank, d in enumerate(rows, 1):
+            entry = merged.setdefault(d["id"], {"dataset": d, "fused": 0.0, "best": 0.0, "queries": []})
+            entry["fused"] += 1 / (HYBRID_RRF_K + rank)
+            entry["best"] = max(entry["best"], d["similarity_score"])
+            entry["queries"].append(n)
+    ranked = sorted(merged.values(), key=lambda e: (-e["fused"], -e["best"], str(e["dataset"]["id"])))
+
+    if fields or output != "text":
+        rows = []
+        for e in ranked:
+            rows.append({**e["dataset"], "similarity_score": e["best"], "queries": [f"Q{n}" for n in e["queries"]]})
+        numbered = {f"Q{n}": q for n, q in enumerate(queries, 1)}
+        return render_records(
+            rows, selected_fields(fields, BATCH_SEARCH_FIELDS), output,
+            header=f"{len(rows)} distinct datasets for " + " ".join(f"{n}: {q}" for n, q in numbered.items()),
+            empty="No relevant datasets found.", extra={"queries": numbered},
+        )
+
+    output = [f"Found {len(ranked)} distinct datasets for {len(queries)} queries:"]
+    output.extend(f"Q{n}: {q}" for n, q in enumerate(queries, 1))
+    failed = [f"Q{n}" for n, e in enumerate(embeddings, 1) if not e]
+    if failed:
+        output.append(f"(Not searched, embedding failed: {', '.join(failed)})")
+    output.append("")
+    for e in ranked:
+        d = e["dataset"]
+        description = d.get("description") or ""
+        output.append(
+            f"- {d['title']} | {d.get('vendor_name', 'Unknown')} | {d.get('domain', 'N/A')} | {d.get('pricing_model', 'N/A')}"
+            f" | ID: {d['id']} | Match: {e['best']:.2f} | Queries: {', '.join(f'Q{n}' for n in e['queries'])}"
+        )
+        if description:
+            output.append(f"  {description}")
+    if not ranked:
+        output.append("No relevant datasets found.")
+
+    return "\n".join(output)
+
+# Fields filter_datasets can return (see its `fields` argument)
+FILTER_DATASETS_FIELDS = (*DATASET_RESULT_COLUMNS, "match_score")
+
+async def _filter_datasets_sql(
+    domain: Optional[str],
+    price_model: Optional[str],
+    limit: int,
+    after: Optional[dict],
+    fields: Optional[List[str]] = None,
+    compact: bool = False
+):
+    """filter_datasets rows from Postgres (limit + 1 of them, to detect a next page)."""
+    # Rank by how closely the filters match (exact terms first, then typo-tolerant matches)
+    score_terms, score_params = [], []
+    for column, value in (("d.domain", domain), ("d.pricing_model", price_model)):
+        if value:
+            score_terms.append(f"word_similarity(%s, coalesce({column}, ''))")
+            score_params.append(value)
+    score_sql = " + ".join(score_terms) or "0"
+
+    sql = f"""
+        SELECT {select_list(DATASET_RESULT_COLUMNS, fields, compact, ("description",), required=("id", "title"))},
+               {score_sql} as match_score
         FROM datasets d
-        JOIN vendors v ON d.vendor_id = v.id
-        WHERE d.id = %s AND d.visibility = 'public';
+        {vendor_join(fields, None)}
+        WHERE d.visibility = 'public' AND d.status = 'active'
     """
-    meta = run_pg_sql(meta_sql, (dataset_id,), fetch_one=True)
-    
-    if not meta:
-        return "Dataset not found or is private."
+    filter_sql, filter_params = build_dataset_filters(domain, price_model)
+    sql = f"SELECT * FROM ({sql}{filter_sql}) matches"
+    keyset_params = []
+    if after:
+        # Resume strictly after the last row of the previous page (ORDER BY score DESC, title, id),
+        # titles by codepoint as in the catalog snapshot
+        sql += ' WHERE match_score < %s OR (match_score = %s AND (title COLLATE "C", id) > (%s, %s))'
+        keyset_params = [after["score"], after["score"], after["title"], after["id"]]
+        
+    sql += ' ORDER BY match_score DESC, title COLLATE "C", id LIMIT %s'
+    params = [*score_params, *filter_params, *keyset_params, limit + 1]
+    return await run_pg_sql_async(sql, tuple(params), settings=trigram_settings())
+
+
+@mcp.tool(
+    description="Filter datasets by specific attributes like Domain or Pricing Model. Use this for narrowing down results."
+)
+@cached_tool(lambda **args: [DATASETS_TABLE, VENDORS_TABLE])
+async def filter_datasets(
+    domain: Optional[str] = None, 
+    price_model: Optional[str] = None,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    output: str = "text"
+) -> ToolResult:
+    """
+    Filter datasets by structured attributes. Useful when the user has specific hard constraints.
+    Values match by substring or, to tolerate typos, by similar words; closest matches come first.
+
+    Args:
+        domain: The domain of the dataset (e.g., "Finance", "Healthcare", "Retail").
+        price_model: The pricing model (e.g., "Free", "Subscription", "Usage-based").
+        limit: Maximum results to return (default: 10).
+        cursor: Optional continuation cursor from a previous call with the same filters, to get the next page.
+        fields: Optional subset of fields to return (default: all): id, title, description, vendor_name,
+                domain, pricing_model, match_score.
+        output: "text" (default), "compact" (one line per dataset with its key fields, descriptions shortened) or
+                "structured" (JSON items in the structured result).
 
-    # 2. Get Columns
-    col_sql = """
-        SELECT name, description, data_type, sample_values
-        FROM dataset_columns
-        WHERE dataset_id = %s;
+    Returns:
+        A list of datasets matching the specific filters.
     """
-    columns = run_pg_sql(col_sql, (dataset_id,))
+    error = check_output(output, fields, FILTER_DATASETS_FIELDS)
+    if error:
+        return f"Error: {error}"
+    if limit < 1:
+        return "Error: limit must be at least 1."
+    fields = requested_fields(fields, output, (*DATASET_COMPACT_FIELDS, "description"))
+
+    cursor_args = {"domain": domain, "price_model": price_model}
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor, "filter_datasets", cursor_args)
+        except InvalidCursor as e:
+            return f"Error: {e}"
+
+    snapshot = current_snapshot()
+    if snapshot is not None:
+        # One extra row tells us whether another page exists
+        results = snapshot.filter_datasets(domain, price_model, limit + 1, after)
+        if output == "compact":
+            results = compact_rows(results, ("description",))
+    else:
+        results = await _filter_datasets_sql(domain, price_model, limit, after, fields, output == "compact")
     
-    # 3. Build the Report
+    empty = "No more datasets matching the applied filters." if cursor else "No datasets found matching the applied filters."
+    if not results and output != "structured":
+        return empty
+
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        last = results[-1]
+        next_cursor = encode_cursor(
+            "filter_datasets", cursor_args,
+            {"score": last["match_score"], "title": last["title"], "id": str(last["id"])},
+        )
+
+    if fields or output != "text":
+        return render_records(
+            results, selected_fields(fields, FILTER_DATASETS_FIELDS), output,
+            header=f"Filtered Search Results ({len(results)} found):", empty=empty,
+            next_cursor=next_cursor, footer=format_next_page(next_cursor) if next_cursor else "",
+        )
+
+    output = [f"Filtered Search Results ({len(results)} found):\n"]
+    for d in results:
+        output.append(format_dataset_str(d))
+        output.append("---")
+    if next_cursor:
+        output.append(format_next_page(next_cursor))
+        
+    return "\n".join(output)
+
+# Server-side caps that keep reports of very wide schemas within the agent's context
+REPORT_MAX_COLUMNS = int(os.environ.get("DATASET_REPORT_MAX_COLUMNS", 60))
+REPORT_SAMPLE_MAX_CHARS = int(os.environ.get("DATASET_REPORT_SAMPLE_MAX_CHARS", 120))
+REPORT_MAX_DATASETS = int(os.environ.get("DATASET_REPORT_MAX_DATASETS", 20))
+
+# Fields of a dataset report and their SQL (see the `fields` argument of the report tools)
+DATASET_REPORT_COLUMNS = {
+    "id": "d.id",
+    "title": "d.title",
+    "description": "d.description",
+    "domain": "d.domain",
+    "granularity": "d.granularity",
+    "pricing_model": "d.pricing_model",
+    "license": "d.license",
+    "temporal_coverage": "d.temporal_coverage",
+    "geographic_coverage": "d.geographic_coverage",
+    "vendor_name": "v.name",
+    "vendor_contact": "v.contact_email",
+    "column_count": "coalesce(cols.column_count, 0)",
+    "columns": "coalesce(cols.columns, '[]'::json)",
+}
+
+# Per-column entry of a report; compact reports only list "name (data_type)"
+REPORT_COLUMN_SQL = """json_build_object(
+                'name', c.name,
+                'description', c.description,
+                'data_type', c.data_type,
+                'sample_values', CASE
+                    WHEN length(c.sample_values::text) > %s
+                    THEN left(c.sample_values::text, %s) || '...'
+                    ELSE c.sample_values::text
+                END
+            )"""
+REPORT_COLUMN_COMPACT_SQL = "c.name || ' (' || c.data_type || ')'"
+
+# One round trip for any number of datasets: metadata plus the (capped) column list,
+# aggregated per dataset in a LATERAL subquery. The vendor join and the LATERAL are
+# left out when no requested field needs them.
+DATASET_REPORT_SQL = """
+    SELECT {columns}
+    FROM datasets d
+    {vendor_join}
+    {schema_join}
+    WHERE d.id = ANY(%s::uuid[]) AND d.visibility = 'public';
+"""
+REPORT_SCHEMA_JOIN_SQL = """LEFT JOIN LATERAL (
+        SELECT
+            count(*) as column_count,
+            json_agg({column} ORDER BY c.name) FILTER (WHERE c.rn <= %s) as columns
+        FROM (
+            SELECT *, row_number() OVER (ORDER BY name, id) as rn
+            FROM dataset_columns
+            WHERE dataset_id = d.id
+        ) c
+    ) cols ON true"""
+
+
+# Reports show the vendor's name and contact, so cached reports are also tagged with the vendors table.
+async def fetch_dataset_reports(
+    dataset_ids: List[str],
+    fields: Optional[List[str]] = None,
+    compact: bool = False
+) -> dict:
+    """Loads report rows for several datasets in one query, keyed by dataset ID."""
+    wanted = selected_fields(fields, DATASET_REPORT_COLUMNS)
+    vendor_sql, schema_sql, params = "", "", []
+    if {"vendor_name", "vendor_contact"} & set(wanted):
+        vendor_sql = "JOIN vendors v ON d.vendor_id = v.id"
+    if {"column_count", "columns"} & set(wanted):
+        column_sql = REPORT_COLUMN_COMPACT_SQL if compact else REPORT_COLUMN_SQL
+        schema_sql = REPORT_SCHEMA_JOIN_SQL.format(column=column_sql)
+        params = [] if compact else [REPORT_SAMPLE_MAX_CHARS, REPORT_SAMPLE_MAX_CHARS]
+        params.append(REPORT_MAX_COLUMNS)
+    sql = DATASET_REPORT_SQL.format(
+        columns=select_list(DATASET_REPORT_COLUMNS, fields, compact, ("description",), required=("id",)),
+        vendor_join=vendor_sql,
+        schema_join=schema_sql,
+    )
+    rows = await run_pg_sql_async(sql, (*params, list(dataset_ids)))
+    return {str(r['id']): r for r in rows or []}
+
+
+def format_dataset_report(meta: dict) -> str:
+    """Helper to format the full report of one dataset row from DATASET_REPORT_SQL."""
     report = []
     
     # --- Header ---
@@ -266,7 +768,8 @@ def get_dataset_details_complete(dataset_id: str) -> str:
     report.append(f"\nCOVERAGE:\n- Geography: {geo}\n- Time Range: {temp}")
     
     # --- Schema ---
-    report.append(f"\n=== SCHEMA ({len(columns)} Columns) ===")
+    columns = meta['columns']
+    report.append(f"\n=== SCHEMA ({meta['column_count']} Columns) ===")
     if columns:
         for col in columns:
             # Handle sample values safely
@@ -276,7 +779,117 @@ def get_dataset_details_complete(dataset_id: str) -> str:
             report.append(
                 f"- {col['name']} ({col['data_type']}): {col.get('description', 'No desc')} {sample_str}"
             )
+        hidden = meta['column_count'] - len(columns)
+        if hidden > 0:
+            report.append(f"... {hidden} more columns not shown.")
     else:
         report.append("No column metadata available.")
         
-    return "\n".join(report)
\ No newline at end of file
+    return "\n".join(report)
+
+@mcp.tool(
+    description="Get a complete report of a dataset, including its Column Schema (structure) and full metadata."
+)
+@cached_tool(lambda dataset_id, **args: [dataset_tag(dataset_id), VENDORS_TABLE])
+async def get_dataset_details_complete(
+    dataset_id: str,
+    fields: Optional[List[str]] = None,
+    output: str = "text"
+) -> ToolResult:
+    """
+    Retrieves COMPLETE details about a dataset. Use this when the user asks for "details", "schema", "columns",
+    or "what is inside" a specific dataset.
+
+    Args:
+        dataset_id: The UUID of the dataset (usually obtained from search_datasets_semantic).
+        fields: Optional subset of fields to return (default: all): id, title, description, domain,
+                granularity, pricing_model, license, temporal_coverage, geographic_coverage,
+                vendor_name, vendor_contact, column_count, columns. Leaving out column_count and
+                columns skips reading the schema.
+        output: "text" (default), "compact" (description shortened, columns as "name (type)") or
+                "structured" (the report as a JSON object).
+
+    Returns:
+        A formatted text report containing metadata, vendor info, and a list of columns with their data types.
+    """
+    error = check_output(output, fields, DATASET_REPORT_COLUMNS)
+    if error:
+        return f"Error: {error}"
+
+    reports = await fetch_dataset_reports([dataset_id], fields, output == "compact")
+    meta = next(iter(reports.values()), None)
+    
+    if not meta:
+        return "Dataset not found or is private."
+    if fields or output != "text":
+        return render_record(meta, selected_fields(fields, DATASET_REPORT_COLUMNS), output)
+
+    return format_dataset_report(meta)
+
+@mcp.tool(
+    description="Get complete reports (metadata and Column Schema) for several datasets at once. Prefer this over repeated get_dataset_details_complete calls when comparing datasets."
+)
+@cached_tool(lambda dataset_ids, **args: [*map(dataset_tag, dataset_ids), VENDORS_TABLE])
+async def get_dataset_details_bulk(
+    dataset_ids: List[str],
+    fields: Optional[List[str]] = None,
+    output: str = "text"
+) -> ToolResult:
+    """
+    Retrieves the same report as get_dataset_details_complete for several datasets in a single query.
+    Very wide schemas are capped and long sample values truncated.
+
+    Args:
+        dataset_ids: The UUIDs of the datasets (usually obtained from search_datasets_semantic).
+        fields: Optional subset of fields to return (default: all): id, title, description, domain,
+                granularity, pricing_model, license, temporal_coverage, geographic_coverage,
+                vendor_name, vendor_contact, column_count, columns. Leaving out column_count and
+                columns skips reading the schema.
+        output: "text" (default), "compact" (description shortened, columns as "name (type)") or
+                "structured" (JSON items, plus the IDs not reported).
+
+    Returns:
+        One formatted report per dataset, in the order requested.
+    """
+    error = check_output(output, fields, DATASET_REPORT_COLUMNS)
+    if error:
+        return f"Error: {error}"
+
+    requested, invalid = [], []
+    for raw in dataset_ids:
+        try:
+            dataset_id = str(uuid.UUID(raw.strip()))
+        except (ValueError, AttributeError):
+            invalid.append(str(raw))
+            continue
+        if dataset_id not in requested:
+            requested.append(dataset_id)
+    if not requested:
+        return "Error: No valid dataset IDs given."
+
+    skipped = requested[REPORT_MAX_DATASETS:]
+    requested = requested[:REPORT_MAX_DATASETS]
+    reports = await fetch_dataset_reports(requested, fields, output == "compact")
+
+    if fields or output != "text":
+        found = [reports[dataset_id] for dataset_id in requested if dataset_id in reports]
+        not_reported = {
+            "invalid": invalid,
+            "not_found": [dataset_id for dataset_id in requested if dataset_id not in reports],
+            "over_limit": skipped,
+        }
+        notes = [f"{reason}: {', '.join(ids)}" for reason, ids in not_reported.items() if ids]
+        return render_records(
+            found, selected_fields(fields, DATASET_REPORT_COLUMNS), output,
+            empty="\n".join(["No datasets found.", *notes]), footer="\n".join(notes),
+            extra={"not_reported": {reason: ids for reason, ids in not_reported.items() if ids}},
+        )
+
+    output = [f"Dataset {raw} is not a valid dataset ID." for raw in invalid]
+    for dataset_id in requested:
+        meta = reports.get(dataset_id)
+        output.append(format_dataset_report(meta) if meta else f"Dataset {dataset_id} not found or is private.")
+    if skipped:
+        output.append(f"Only the first {REPORT_MAX_DATASETS} datasets are reported; request the remaining {len(skipped)} separately.")
+
+    return "\n\n".join(output)
@@ -1,7 +1,105 @@
 from puddle_server.mcp import mcp
-from puddle_server.utils import run_pg_sql
+from puddle_server.utils import run_pg_sql_async, run_pg_sql_with_followup_async
+from puddle_server.events import get_event_hub, notify_returning, EVENT_WAIT_MAX_SECONDS
+from puddle_server.output_modes import (
+    ToolResult, check_output, selected_fields, select_list, truncate_sql, render_records, structured_result,
+)
+import asyncio
 import json
-from typing import Dict, Any, List
+import logging
+import os
+import time
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Work leases for concurrent vendor agents (see claim_vendor_work)
+VENDOR_LEASE_SECONDS = int(os.environ.get("VENDOR_LEASE_SECONDS", 300))
+VENDOR_LEASE_MAX_SECONDS = int(os.environ.get("VENDOR_LEASE_MAX_SECONDS", 3600))
+VENDOR_CLAIM_MAX_ITEMS = int(os.environ.get("VENDOR_CLAIM_MAX_ITEMS", 20))
+
+# Appends the next part of the narrative in place: params (separator, new_text).
+# The summary is never sent back by the agent, so concurrent appends cannot overwrite each other.
+SUMMARY_APPEND_SQL = "summary = concat_ws(%s, nullif(summary, ''), nullif(%s, ''))"
+
+# Fields get_inquiry_full_state can return selectively (see its `paths` argument)
+INQUIRY_PATH_ROOTS = ("buyer_inquiry", "vendor_response", "summary")
+
+
+async def versioned_update(
+    inquiry_id: str,
+    expected_version: int,
+    set_sql: str,
+    set_params: tuple,
+    condition_sql: str = "",
+    condition_params: tuple = (),
+    event: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Applies an optimistic-concurrency write to one inquiry: the row is updated (and its
+    version bumped) only if it is still at `expected_version` and matches `condition_sql`.
+    Returns {new_version, current_version, status}; new_version is None when nothing was
+    written. Returns None if the inquiry does not exist.
+
+    The version and status are read by a second statement in the same transaction, which
+    under READ COMMITTED takes a fresh snapshot: when a concurrent writer commits first,
+    they are that writer's, not the ones this statement started from.
+    """
+    notify_sql = f", {notify_returning(event)}" if event else ""
+    sql = f"""
+        UPDATE inquiries
+        SET {set_sql}, version = version + 1, updated_at = NOW()
+        WHERE id = %s AND version = %s{condition_sql}
+        RETURNING version{notify_sql};
+    """
+    params = (*set_params, inquiry_id, expected_version, *condition_params)
+    updated, current = await run_pg_sql_with_followup_async(
+        sql, params, "SELECT version, status FROM inquiries WHERE id = %s;", (inquiry_id,)
+    )
+    if current is None:
+        return None
+    return {
+        "new_version": updated["version"] if updated else None,
+        "current_version": current["version"],
+        "status": current["status"],
+    }
+
+
+def format_conflict(row: Dict[str, Any]) -> str:
+    """Cheap conflict response: tells the agent the version to re-read and retry from."""
+    return (
+        f"CONFLICT: The inquiry was changed by someone else (current version: {row['current_version']}, "
+        f"status: '{row['status']}'). Call get_inquiry_full_state, re-apply your change, and retry "
+        f"with expected_version={row['current_version']}."
+    )
+
+
+async def write_vendor_response(
+    inquiry_id: str,
+    expected_version: int,
+    value_sql: str,
+    value_param: str,
+    summary_addition: str,
+    worker_id: Optional[str]
+) -> str:
+    """Shared write path of update_vendor_response_json and patch_vendor_response_json."""
+    result = await versioned_update(
+        inquiry_id, expected_version,
+        f"vendor_response = {value_sql}, {SUMMARY_APPEND_SQL}, status = 'responded', lease_owner = NULL, lease_expires_at = NULL",
+        (value_param, " ", summary_addition),
+        " AND (lease_owner IS NOT DISTINCT FROM %s OR lease_expires_at IS NULL OR lease_expires_at < NOW())",
+        (worker_id,),
+        event='responded',
+    )
+    if not result:
+        return "Error: Inquiry not found."
+    if result['new_version'] is None:
+        if result['current_version'] != expected_version:
+            return format_conflict(result)
+        return "Error: Inquiry is currently leased by another vendor agent."
+    
+    return f"Vendor response updated and summary appended (version: {result['new_version']}). Status changed to 'responded' - buyer will be notified."
+
 
 # ==========================================
 # BUYER TOOLS (Chatbot -> DB)
@@ -10,7 +108,7 @@ from typing import Dict, Any, List
 @mcp.tool(
     description="Initialize a new inquiry and submit it to vendor. The AI can define the initial structure of the buyer's inquiry JSON and provide an initial summary."
 )
-def create_buyer_inquiry(
+async def create_buyer_inquiry(
     buyer_id: str,
     dataset_id: str,
     conversation_id: str,
@@ -31,93 +129,128 @@ def create_buyer_inquiry(
     """
     # 1. Lookup Vendor
     vendor_sql = "SELECT vendor_id FROM datasets WHERE id = %s"
-    ds_info = run_pg_sql(vendor_sql, (dataset_id,), fetch_one=True)
+    ds_info = await run_pg_sql_async(vendor_sql, (dataset_id,), fetch_one=True)
     
     if not ds_info:
         return "Error: Dataset not found."
 
     # 2. Insert with flexible JSON and summary
-    insert_sql = """
+    insert_sql = f"""
         INSERT INTO inquiries (
             buyer_id, dataset_id, vendor_id, conversation_id, 
             buyer_inquiry, summary, status
         ) VALUES (%s, %s, %s, %s, %s, %s, 'submitted')
-        RETURNING id;
+        RETURNING id, {notify_returning('created')};
     """
     
     # Ensure dict is dumped to string for SQL
     json_payload = json.dumps(initial_state_json)
     
-    result = run_pg_sql(insert_sql, (
+    result = await run_pg_sql_async(insert_sql, (
         buyer_id, dataset_id, ds_info['vendor_id'], conversation_id, 
         json_payload, initial_summary
     ), fetch_one=True)
 
-    return f"Inquiry created and submitted to vendor (ID: {result['id']}). Status is 'submitted'."
+    return f"Inquiry created and submitted to vendor (ID: {result['id']}, version: 1). Status is 'submitted'."
 
 
 @mcp.tool(
-    description="Update the Buyer's Inquiry JSON blob and append to the historical summary narrative. CRITICAL: You MUST first call get_inquiry_full_state to get the existing summary, then append your new text to it."
+    description="Update the Buyer's Inquiry JSON blob and append new sentence(s) to the historical summary narrative. Send ONLY the new sentence(s); the server appends them to the existing summary."
 )
-def update_buyer_json(
+async def update_buyer_json(
     inquiry_id: str,
+    expected_version: int,
     new_state_json: Dict[str, Any],
-    updated_summary: str
+    summary_addition: str
 ) -> str:
     """
-    Overwrites the 'buyer_inquiry' column with the new JSON provided and updates the summary.
+    Overwrites the 'buyer_inquiry' column with the new JSON provided and appends to the summary.
     
-    CRITICAL WORKFLOW:
-    1. FIRST call get_inquiry_full_state to get the existing summary
-    2. Modify the buyer_inquiry JSON
-    3. Take the ENTIRE existing summary text
-    4. APPEND new sentence(s) describing this change to the END of existing summary
-    5. Pass the COMPLETE cumulative text (old + new) as updated_summary
+    The summary is a cumulative NARRATIVE HISTORY kept by the server. Pass only what happened
+    in this step; it is appended to the end of the existing summary.
     
     Example: 
     - Existing: "Buyer asked for X with budget Y."
     - New change: Buyer adds requirement for region Z
-    - updated_summary param: "Buyer asked for X with budget Y. Buyer then added requirement for region Z."
-    
-    WARNING: If updated_summary is shorter than existing, the update will FAIL.
+    - summary_addition param: "Buyer then added requirement for region Z."
+    - Resulting summary: "Buyer asked for X with budget Y. Buyer then added requirement for region Z."
+
+    Args:
+        inquiry_id: The UUID of the inquiry.
+        expected_version: The version returned by get_inquiry_full_state; the update is refused if the inquiry changed since.
+        new_state_json: The complete new buyer_inquiry JSON.
+        summary_addition: New narrative sentence(s) (past tense) describing this change.
     """
-    # Get existing summary to validate
-    check_sql = "SELECT summary FROM inquiries WHERE id = %s"
-    existing = run_pg_sql(check_sql, (inquiry_id,), fetch_one=True)
+    result = await versioned_update(
+        inquiry_id, expected_version,
+        f"buyer_inquiry = %s, {SUMMARY_APPEND_SQL}", (json.dumps(new_state_json), " ", summary_addition),
+    )
+    if not result:
+        return "Error: Inquiry not found."
+    if result['new_version'] is None:
+        return format_conflict(result)
     
-    if existing and existing.get('summary'):
-        existing_summary = existing['summary']
-        # Validate that new summary contains the old one (basic check)
-        if existing_summary and existing_summary not in updated_summary:
-            return f"ERROR: The updated_summary must CONTAIN the entire existing summary. You provided a summary that doesn't include the existing text. EXISTING SUMMARY: '{existing_summary}'. Please call get_inquiry_full_state, read the existing summary, and APPEND to it."
-    
-    sql = """
-        UPDATE inquiries 
-        SET buyer_inquiry = %s, summary = %s, updated_at = NOW() 
-        WHERE id = %s
+    return f"Buyer JSON state updated and summary appended successfully (version: {result['new_version']})."
+
+
+@mcp.tool(
+    description="Change only some fields of the Buyer's Inquiry JSON with a JSON merge patch (RFC 7396) and append new sentence(s) to the summary. Prefer this over update_buyer_json for small changes."
+)
+async def patch_buyer_json(
+    inquiry_id: str,
+    expected_version: int,
+    merge_patch: Dict[str, Any],
+    summary_addition: str
+) -> str:
     """
-    run_pg_sql(sql, (json.dumps(new_state_json), updated_summary, inquiry_id))
-    
-    return "Buyer JSON state and summary updated successfully."
+    Applies a JSON merge patch to 'buyer_inquiry' on the server, so only the changed fields are sent.
+    Objects are merged recursively, a null value removes the key, and any other value (including
+    a list) replaces the existing value.
+
+    Example: {"constraints": {"region": "Japan"}, "deadline": null} sets constraints.region,
+    keeps every other constraint, and removes "deadline".
+
+    Args:
+        inquiry_id: The UUID of the inquiry.
+        expected_version: The version returned by get_inquiry_full_state; the update is refused if the inquiry changed since.
+        merge_patch: The fields to change.
+        summary_addition: New narrative sentence(s) (past tense) describing this change.
+    """
+    result = await versioned_update(
+        inquiry_id, expected_version,
+        f"buyer_inquiry = puddle_jsonb_merge_patch(buyer_inquiry, %s::jsonb), {SUMMARY_APPEND_SQL}",
+        (json.dumps(merge_patch), " ", summary_addition),
+    )
+    if not result:
+        return "Error: Inquiry not found."
+    if result['new_version'] is None:
+        return format_conflict(result)
+
+    return f"Buyer JSON state patched and summary appended successfully (version: {result['new_version']})."
 
 
 @mcp.tool(
     description="Re-submit the inquiry to the vendor after modifications. Changes status back to 'submitted' from 'responded'."
 )
-def resubmit_inquiry_to_vendor(inquiry_id: str) -> str:
+async def resubmit_inquiry_to_vendor(inquiry_id: str, expected_version: int) -> str:
     """
     Re-flags the inquiry for the Vendor Agent after buyer makes changes to a responded inquiry.
     This changes status from 'responded' back to 'submitted'.
+
+    Args:
+        inquiry_id: The UUID of the inquiry.
+        expected_version: The latest known version (e.g. returned by update_buyer_json).
     """
-    sql = """
-        UPDATE inquiries 
-        SET status = 'submitted', updated_at = NOW() 
-        WHERE id = %s AND status = 'responded'
-        RETURNING status;
-    """
-    result = run_pg_sql(sql, (inquiry_id,), fetch_one=True)
-    if result:
-        return "Inquiry re-submitted. The Vendor Agent will now see the updated inquiry."
+    result = await versioned_update(
+        inquiry_id, expected_version,
+        "status = 'submitted'", (),
+        " AND status = 'responded'", (),
+        event='resubmitted',
+    )
+    if result and result['new_version'] is not None:
+        return f"Inquiry re-submitted (version: {result['new_version']}). The Vendor Agent will now see the updated inquiry."
+    if result and result['current_version'] != expected_version:
+        return format_conflict(result)
     return "Error: Inquiry not found or not in 'responded' status."
 
 # ==========================================
@@ -127,30 +260,82 @@ def resubmit_inquiry_to_vendor(inquiry_id: str) -> str:
 @mcp.tool(
     description="Get the raw JSON states for both Buyer and Vendor, including the cumulative historical summary. Use this to read the full negotiation story."
 )
-def get_inquiry_full_state(inquiry_id: str) -> str:
+async def get_inquiry_full_state(
+    inquiry_id: str,
+    paths: Optional[List[str]] = None,
+    output: str = "text"
+) -> ToolResult:
     """
     Returns the raw JSONs and summary so the AI can parse and decide what to do next.
     When updating either buyer_inquiry or vendor_response, the AI should:
     1. Read this full state (especially the existing summary - the story so far)
     2. Make the changes to the appropriate JSON
-    3. Generate a new summary by APPENDING to the existing one (keep 100% of old text, add new development)
-    4. Update with the new JSON and cumulative summary
+    3. Write only the new development as summary_addition; the server appends it to the summary
+    4. Pass the returned version as expected_version; if someone changed the inquiry in between,
+       the update returns a CONFLICT with the current version instead of overwriting their change
     
-    CRITICAL: The summary field contains a NARRATIVE HISTORY. Never replace it - always append to it.
+    The summary field contains a NARRATIVE HISTORY that only ever grows.
+
+    Args:
+        inquiry_id: The UUID of the inquiry.
+        paths: Optional dotted paths to return instead of the full JSONs, e.g.
+               ["vendor_response.answers", "buyer_inquiry.constraints.budget", "summary"].
+               List elements are addressed by index ("buyer_inquiry.questions.0").
+        output: "text" (default, a JSON dump), "compact" (JSON without spaces, summary shortened to
+                its latest part) or "structured" (the same object as structured content).
     """
-    sql = """
+    error = check_output(output, None, ())
+    if error:
+        return f"Error: {error}"
+
+    # Compact reads keep the end of the summary: the newest developments
+    summary_sql = "i.summary"
+    if output == "compact":
+        summary_sql = f"reverse({truncate_sql('reverse(i.summary)')})"
+
+    if not paths:
+        selected_sql, selected_params = f"i.buyer_inquiry, i.vendor_response, {summary_sql} as summary", []
+    else:
+        # Extract only the requested values inside the query
+        columns, selected_params = [], []
+        for n, path in enumerate(paths):
+            root, *rest = path.split(".")
+            if root not in INQUIRY_PATH_ROOTS or (rest and root == "summary"):
+                return f"Error: Invalid path '{path}'. Paths start with one of: {', '.join(INQUIRY_PATH_ROOTS)}."
+            if rest:
+                columns.append(f"i.{root} #> %s::text[] as p{n}")
+                selected_params.append(rest)
+            elif root == "summary":
+                columns.append(f"{summary_sql} as p{n}")
+            else:
+                columns.append(f"i.{root} as p{n}")
+        selected_sql = ", ".join(columns)
+
+    sql = f"""
         SELECT 
-            i.status, i.buyer_inquiry, i.vendor_response, i.summary,
+            i.status, i.version, {selected_sql},
             d.title as dataset_title, v.name as vendor_name
         FROM inquiries i
         JOIN datasets d ON i.dataset_id = d.id
         JOIN vendors v ON i.vendor_id = v.id
         WHERE i.id = %s
     """
-    row = run_pg_sql(sql, (inquiry_id,), fetch_one=True)
+    row = await run_pg_sql_async(sql, (*selected_params, inquiry_id), fetch_one=True)
     if not row:
         return "Inquiry not found."
 
+    if paths:
+        row = {
+            "status": row['status'], "version": row['version'],
+            "dataset_title": row['dataset_title'], "vendor_name": row['vendor_name'],
+            "paths": {path: row[f"p{n}"] for n, path in enumerate(paths)},
+        }
+
+    if output == "structured":
+        return structured_result(row)
+    if output == "compact":
+        return json.dumps(row, default=str, separators=(",", ":"))
+
     # Return as a string dump of the whole object
     return json.dumps(row, default=str)
 
@@ -158,25 +343,253 @@ def get_inquiry_full_state(inquiry_id: str) -> str:
 # VENDOR AGENT TOOLS (Vendor AI -> DB)
 # ==========================================
 
+# Fields of a work item and their SQL (see the `fields` argument of the vendor work tools)
+VENDOR_WORK_COLUMNS = {
+    "id": "i.id",
+    "version": "i.version",
+    "title": "d.title",
+    "buyer_inquiry": "i.buyer_inquiry",
+}
+CLAIMED_WORK_COLUMNS = {**VENDOR_WORK_COLUMNS, "lease_expires_at": "i.lease_expires_at"}
+
+# Inquiries under an active lease are being worked on by another agent and are not listed
+VENDOR_WORK_SQL = """
+    SELECT {columns}
+    FROM inquiries i
+    JOIN datasets d ON i.dataset_id = d.id
+    WHERE i.vendor_id = %s AND i.status = 'submitted'
+      AND (i.lease_expires_at IS NULL OR i.lease_expires_at < NOW())
+"""
+
+# Seconds until the vendor's earliest active lease lapses. Nothing announces an expired
+# lease, so a long-poll waits no longer than this before checking the queue again.
+NEXT_LEASE_EXPIRY_SQL = """
+    SELECT EXTRACT(EPOCH FROM min(lease_expires_at) - NOW())::float AS seconds
+    FROM inquiries
+    WHERE vendor_id = %s AND status = 'submitted' AND lease_expires_at >= NOW();
+"""
+# Slack after a lease's expiry before re-checking, so the check sees it as expired
+LEASE_EXPIRY_SLACK_SECONDS = 0.05
+
+
+def work_columns(columns: Dict[str, str], fields: Optional[List[str]], output: str) -> str:
+    """Work item SELECT list; compact output previews buyer_inquiry as shortened JSON text."""
+    if output == "compact":
+        columns = {**columns, "buyer_inquiry": truncate_sql(f"{columns['buyer_inquiry']}::text")}
+    return select_list(columns, fields, required=("id",))
+
+
+def format_work(
+    results: List[Dict[str, Any]],
+    fields: Optional[List[str]],
+    output: str,
+    available: Dict[str, str]
+) -> ToolResult:
+    """Work items as the tools' JSON list (text), one line each (compact) or structured items."""
+    if output == "text":
+        if fields:
+            results = [{f: r[f] for f in selected_fields(fields, available)} for r in results]
+        return json.dumps(results, default=str) if results else "No pending inquiries."
+    return render_records(results, selected_fields(fields, available), output, empty="No pending inquiries.")
+
+
+def _lease_seconds(lease_seconds: int) -> int:
+    return max(1, min(int(lease_seconds), VENDOR_LEASE_MAX_SECONDS))
+
 @mcp.tool(
     description="Find inquiries waiting for the vendor (status='submitted')."
 )
-def get_vendor_work_queue(vendor_id: str) -> str:
+async def get_vendor_work_queue(
+    vendor_id: str,
+    fields: Optional[List[str]] = None,
+    output: str = "text"
+) -> ToolResult:
     """
     Returns a list of inquiries that need attention.
+
+    Args:
+        vendor_id: The UUID of the vendor.
+        fields: Optional subset of fields to return (default: all): id, version, title, buyer_inquiry.
+        output: "text" (default, a JSON list), "compact" (one line per inquiry, buyer_inquiry shortened)
+                or "structured" (JSON items in the structured result).
+    """
+    error = check_output(output, fields, VENDOR_WORK_COLUMNS)
+    if error:
+        return f"Error: {error}"
+
+    sql = VENDOR_WORK_SQL.format(columns=work_columns(VENDOR_WORK_COLUMNS, fields, output))
+    results = await run_pg_sql_async(sql, (vendor_id,))
+    return format_work(results or [], fields, output, VENDOR_WORK_COLUMNS)
+
+
+@mcp.tool(
+    description="Wait until the vendor has inquiries to work on (status='submitted'), or until the timeout expires. Use this instead of calling get_vendor_work_queue in a loop."
+)
+async def wait_for_vendor_work(
+    vendor_id: str,
+    timeout_seconds: int = 60,
+    fields: Optional[List[str]] = None,
+    output: str = "text"
+) -> ToolResult:
+    """
+    Long-poll version of get_vendor_work_queue: returns the pending inquiries as soon as
+    there are any. Wakes on inquiry events (NOTIFY) instead of polling the database, and
+    when another agent's lease expires, which puts its inquiry back in the queue silently.
+
+    Args:
+        vendor_id: The UUID of the vendor.
+        timeout_seconds: How long to wait for work before giving up (capped by the server).
+        fields: Optional subset of fields to return, as in get_vendor_work_queue.
+        output: "text" (default), "compact" or "structured", as in get_vendor_work_queue.
+
+    Returns:
+        The same JSON list as get_vendor_work_queue, or "No pending inquiries." on timeout.
+    """
+    error = check_output(output, fields, VENDOR_WORK_COLUMNS)
+    if error:
+        return f"Error: {error}"
+
+    try:
+        hub = await get_event_hub()
+    except Exception as e:
+        logger.warning("Event hub unavailable, falling back to a single queue check: %s", e)
+        return await get_vendor_work_queue(vendor_id, fields, output)
+
+    sql = VENDOR_WORK_SQL.format(columns=work_columns(VENDOR_WORK_COLUMNS, fields, output))
+
+    deadline = time.monotonic() + max(0, min(timeout_seconds, EVENT_WAIT_MAX_SECONDS))
+    while True:
+        # Subscribe before checking so an event between the check and the wait is not lost
+        waiter = hub.subscribe(vendor_id)
+        try:
+            results = await run_pg_sql_async(sql, (vendor_id,))
+            if results:
+                return format_work(results, fields, output, VENDOR_WORK_COLUMNS)
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return format_work([], fields, output, VENDOR_WORK_COLUMNS)
+            wait = remaining
+            lease = await run_pg_sql_async(NEXT_LEASE_EXPIRY_SQL, (vendor_id,), fetch_one=True)
+            if lease and lease["seconds"] is not None:
+                wait = min(remaining, max(0.0, lease["seconds"]) + LEASE_EXPIRY_SLACK_SECONDS)
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter), wait)
+            except asyncio.TimeoutError:
+                if wait >= remaining:
+                    return format_work([], fields, output, VENDOR_WORK_COLUMNS)
+        finally:
+            hub.unsubscribe(vendor_id, waiter)
+
+
+@mcp.tool(
+    description="Claim up to max_items submitted inquiries for this vendor agent under a time-limited lease, so concurrent agents never work on the same inquiry. Respond with update_vendor_response_json passing the same worker_id."
+)
+async def claim_vendor_work(
+    vendor_id: str,
+    worker_id: str,
+    max_items: int = 1,
+    lease_seconds: int = VENDOR_LEASE_SECONDS,
+    fields: Optional[List[str]] = None,
+    output: str = "text"
+) -> ToolResult:
+    """
+    Atomically leases the oldest unclaimed 'submitted' inquiries of a vendor. Rows locked or
+    leased by other agents are skipped (FOR UPDATE SKIP LOCKED), so agents never block each other.
+    A lease that is neither extended nor answered expires and the inquiry returns to the queue.
+
+    Args:
+        vendor_id: The UUID of the vendor.
+        worker_id: A stable identifier of the calling agent (e.g. replica name).
+        max_items: Maximum number of inquiries to claim (capped by the server).
+        lease_seconds: How long the lease lasts before the inquiry returns to the queue.
+        fields: Optional subset of fields to return (default: all): id, version, title, buyer_inquiry,
+                lease_expires_at. The id is always returned.
+        output: "text" (default, a JSON list), "compact" (one line per inquiry, buyer_inquiry shortened)
+                or "structured" (JSON items in the structured result).
+
+    Returns:
+        A JSON list of the claimed inquiries with their lease expiry, or "No pending inquiries."
+    """
+    error = check_output(output, fields, CLAIMED_WORK_COLUMNS)
+    if error:
+        return f"Error: {error}"
+
+    sql = f"""
+        WITH claimable AS (
+            SELECT id
+            FROM inquiries
+            WHERE vendor_id = %s AND status = 'submitted'
+              AND (lease_expires_at IS NULL OR lease_expires_at < NOW())
+            ORDER BY updated_at, id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+        UPDATE inquiries i
+        SET lease_owner = %s, lease_expires_at = NOW() + make_interval(secs => %s)
+        FROM claimable c, datasets d
+        WHERE i.id = c.id AND d.id = i.dataset_id
+        RETURNING {work_columns(CLAIMED_WORK_COLUMNS, fields, output)};
+    """
+    max_items = max(1, min(int(max_items), VENDOR_CLAIM_MAX_ITEMS))
+    results = await run_pg_sql_async(sql, (vendor_id, max_items, worker_id, _lease_seconds(lease_seconds)))
+
+    # The id is what the agent needs to respond, so it is kept even if not requested
+    if fields and "id" not in fields:
+        fields = ["id", *fields]
+    return format_work(results or [], fields, output, CLAIMED_WORK_COLUMNS)
+
+
+@mcp.tool(
+    description="Extend (heartbeat) the lease on an inquiry claimed with claim_vendor_work while still working on it."
+)
+async def extend_vendor_lease(
+    inquiry_id: str,
+    worker_id: str,
+    lease_seconds: int = VENDOR_LEASE_SECONDS
+) -> str:
+    """
+    Pushes the lease expiry to now + lease_seconds, provided this worker still owns the lease
+    (an expired lease can be renewed as long as no other agent has claimed the inquiry since).
+
+    Args:
+        inquiry_id: The UUID of the inquiry.
+        worker_id: The worker_id used to claim it.
+        lease_seconds: New lease duration from now.
     """
     sql = """
-        SELECT i.id, d.title, i.buyer_inquiry
-        FROM inquiries i
-        JOIN datasets d ON i.dataset_id = d.id
-        WHERE i.vendor_id = %s AND i.status = 'submitted'
+        UPDATE inquiries
+        SET lease_expires_at = NOW() + make_interval(secs => %s)
+        WHERE id = %s AND lease_owner = %s AND status = 'submitted'
+        RETURNING lease_expires_at;
     """
-    results = run_pg_sql(sql, (vendor_id,))
-    
-    if not results:
-        return "No pending inquiries."
-        
-    return json.dumps(results, default=str)
+    result = await run_pg_sql_async(sql, (_lease_seconds(lease_seconds), inquiry_id, worker_id), fetch_one=True)
+    if result:
+        return f"Lease extended until {result['lease_expires_at']}."
+    return "Error: Lease not held by this worker (expired and claimed by another agent, answered, or not found)."
+
+
+@mcp.tool(
+    description="Give an inquiry claimed with claim_vendor_work back to the queue without responding."
+)
+async def release_vendor_lease(inquiry_id: str, worker_id: str) -> str:
+    """
+    Ends this worker's lease immediately so another agent can claim the inquiry.
+
+    Args:
+        inquiry_id: The UUID of the inquiry.
+        worker_id: The worker_id used to claim it.
+    """
+    sql = f"""
+        UPDATE inquiries
+        SET lease_owner = NULL, lease_expires_at = NULL
+        WHERE id = %s AND lease_owner = %s AND status = 'submitted'
+        RETURNING id, {notify_returning('released')};
+    """
+    result = await run_pg_sql_async(sql, (inquiry_id, worker_id), fetch_one=True)
+    if result:
+        return "Lease released. The inquiry is back in the vendor queue."
+    return "Error: Lease not held by this worker."
 
 
 # ==========================================
@@ -186,121 +599,131 @@ def get_vendor_work_queue(vendor_id: str) -> str:
 @mcp.tool(
     description="Accept the vendor's response and finalize the deal. Changes status to 'accepted'."
 )
-def accept_vendor_response(
+async def accept_vendor_response(
     inquiry_id: str,
+    expected_version: int,
     final_notes: str = ""
 ) -> str:
     """
     Buyer accepts the vendor's response. This marks the inquiry as 'accepted' (deal done).
+    Refused with a CONFLICT if the inquiry changed since the buyer read it (e.g. a newer vendor response).
     
     Args:
         inquiry_id: The UUID of the inquiry.
+        expected_version: The version of the vendor response the buyer is accepting (from get_inquiry_full_state).
         final_notes: Optional notes from the buyer about acceptance.
     """
-    # Get current state to append to summary
-    current_state = get_inquiry_full_state(inquiry_id)
-    if "Inquiry not found" in current_state:
-        return current_state
-    
-    state_data = json.loads(current_state)
-    existing_summary = state_data.get('summary', '')
-    
     # Append acceptance to summary
-    acceptance_note = f"\n\nDEAL ACCEPTED by buyer. {final_notes if final_notes else 'No additional notes.'}"
-    new_summary = existing_summary + acceptance_note
+    acceptance_note = f"DEAL ACCEPTED by buyer. {final_notes if final_notes else 'No additional notes.'}"
     
-    sql = """
-        UPDATE inquiries 
-        SET status = 'accepted', summary = %s, updated_at = NOW()
-        WHERE id = %s AND status = 'responded'
-        RETURNING status;
-    """
-    result = run_pg_sql(sql, (new_summary, inquiry_id), fetch_one=True)
+    result = await versioned_update(
+        inquiry_id, expected_version,
+        f"status = 'accepted', {SUMMARY_APPEND_SQL}", ("\n\n", acceptance_note),
+        " AND status = 'responded'", (),
+        event='accepted',
+    )
     
-    if result:
+    if result and result['new_version'] is not None:
         return "Inquiry accepted! Deal finalized. The vendor will be notified."
+    if result and result['current_version'] != expected_version:
+        return format_conflict(result)
     return "Error: Inquiry not found or not in 'responded' status."
 
 
 @mcp.tool(
     description="Reject the vendor's response. Changes status to 'rejected'."
 )
-def reject_vendor_response(
+async def reject_vendor_response(
     inquiry_id: str,
+    expected_version: int,
     rejection_reason: str
 ) -> str:
     """
     Buyer rejects the vendor's response. This marks the inquiry as 'rejected' (deal lost).
+    Refused with a CONFLICT if the inquiry changed since the buyer read it.
     
     Args:
         inquiry_id: The UUID of the inquiry.
+        expected_version: The version of the vendor response the buyer is rejecting (from get_inquiry_full_state).
         rejection_reason: Reason for rejection (required for vendor feedback).
     """
-    # Get current state to append to summary
-    current_state = get_inquiry_full_state(inquiry_id)
-    if "Inquiry not found" in current_state:
-        return current_state
-    
-    state_data = json.loads(current_state)
-    existing_summary = state_data.get('summary', '')
-    
     # Append rejection to summary
-    rejection_note = f"\n\nDEAL REJECTED by buyer. Reason: {rejection_reason}"
-    new_summary = existing_summary + rejection_note
+    rejection_note = f"DEAL REJECTED by buyer. Reason: {rejection_reason}"
     
-    sql = """
-        UPDATE inquiries 
-        SET status = 'rejected', summary = %s, updated_at = NOW()
-        WHERE id = %s AND status = 'responded'
-        RETURNING status;
-    """
-    result = run_pg_sql(sql, (new_summary, inquiry_id), fetch_one=True)
+    result = await versioned_update(
+        inquiry_id, expected_version,
+        f"status = 'rejected', {SUMMARY_APPEND_SQL}", ("\n\n", rejection_note),
+        " AND status = 'responded'", (),
+        event='rejected',
+    )
     
-    if result:
+    if result and result['new_version'] is not None:
         return "Inquiry rejected. The vendor will be notified."
+    if result and result['current_version'] != expected_version:
+        return format_conflict(result)
     return "Error: Inquiry not found or not in 'responded' status."
 
 
 @mcp.tool(
-    description="Update the Vendor's Response JSON and append to the historical summary narrative. Changes status to 'responded'. CRITICAL: You MUST first call get_inquiry_full_state to get the existing summary, then append your new text to it."
+    description="Update the Vendor's Response JSON and append new sentence(s) to the historical summary narrative. Changes status to 'responded'. Send ONLY the new sentence(s); the server appends them to the existing summary."
 )
-def update_vendor_response_json(
+async def update_vendor_response_json(
     inquiry_id: str,
+    expected_version: int,
     new_response_json: Dict[str, Any],
-    updated_summary: str
+    summary_addition: str,
+    worker_id: Optional[str] = None
 ) -> str:
     """
-    Overwrites the 'vendor_response' column, updates summary, and changes status to 'responded'.
+    Overwrites the 'vendor_response' column, appends to the summary, and changes status to 'responded'.
     
-    CRITICAL WORKFLOW:
-    1. FIRST call get_inquiry_full_state to get the existing summary
-    2. Construct the vendor response JSON
-    3. Take the ENTIRE existing summary text
-    4. APPEND new sentence(s) describing the vendor's response to the END
-    5. Pass the COMPLETE cumulative text (old + new) as updated_summary
+    The summary is a cumulative NARRATIVE HISTORY kept by the server. Pass only what the vendor
+    did in this step; it is appended to the end of the existing summary.
     
     Example:
     - Existing: "Buyer requested real-time data with budget $5k."
     - Vendor responds with counter offer
-    - updated_summary param: "Buyer requested real-time data with budget $5k. Vendor confirmed availability but counter-offered at $7k due to API costs."
-    
-    WARNING: If updated_summary is shorter than existing, the update will FAIL.
+    - summary_addition param: "Vendor confirmed availability but counter-offered at $7k due to API costs."
+
+    If the inquiry was claimed with claim_vendor_work, pass the same worker_id; the update is
+    refused while another agent holds an active lease. Responding ends the lease.
+
+    Args:
+        inquiry_id: The UUID of the inquiry.
+        expected_version: The version returned by get_inquiry_full_state / claim_vendor_work; the update is refused if the inquiry changed since.
+        new_response_json: The complete new vendor_response JSON.
+        summary_addition: New narrative sentence(s) (past tense) describing the vendor's response.
+        worker_id: The worker_id used with claim_vendor_work, if the inquiry was claimed.
     """
-    # Get existing summary to validate
-    check_sql = "SELECT summary FROM inquiries WHERE id = %s"
-    existing = run_pg_sql(check_sql, (inquiry_id,), fetch_one=True)
-    
-    if existing and existing.get('summary'):
-        existing_summary = existing['summary']
-        # Validate that new summary contains the old one
-        if existing_summary and existing_summary not in updated_summary:
-            return f"ERROR: The updated_summary must CONTAIN the entire existing summary. You provided a summary that doesn't include the existing text. EXISTING SUMMARY: '{existing_summary}'. Please call get_inquiry_full_state, read the existing summary, and APPEND to it."
-    
-    sql = """
-        UPDATE inquiries 
-        SET vendor_response = %s, summary = %s, status = 'responded', updated_at = NOW()
-        WHERE id = %s
+    return await write_vendor_response(
+        inquiry_id, expected_version, "%s", json.dumps(new_response_json), summary_addition, worker_id
+    )
+
+
+@mcp.tool(
+    description="Change only some fields of the Vendor's Response JSON with a JSON merge patch (RFC 7396) and append new sentence(s) to the summary. Changes status to 'responded'. Prefer this over update_vendor_response_json for small changes."
+)
+async def patch_vendor_response_json(
+    inquiry_id: str,
+    expected_version: int,
+    merge_patch: Dict[str, Any],
+    summary_addition: str,
+    worker_id: Optional[str] = None
+) -> str:
     """
-    run_pg_sql(sql, (json.dumps(new_response_json), updated_summary, inquiry_id))
-    
-    return "Vendor response and summary updated. Status changed to 'responded' - buyer will be notified."
\ No newline at end of file
+    Applies a JSON merge patch to 'vendor_response' on the server, so only the changed fields are sent,
+    and changes status to 'responded'. Objects are merged recursively, a null value removes the key,
+    and any other value (including a list) replaces the existing value.
+
+    Args:
+        inquiry_id: The UUID of the inquiry.
+        expected_version: The version returned by get_inquiry_full_state / claim_vendor_work; the update is refused if the inquiry changed since.
+        merge_patch: The fields to change.
+        summary_addition: New narrative sentence(s) (past tense) describing the vendor's response.
+        worker_id: The worker_id used with claim_vendor_work, if the inquiry was claimed.
+    """
+    return await write_vendor_response(
+        inquiry_id, expected_version,
+        "puddle_jsonb_merge_patch(vendor_response, %s::jsonb)", json.dumps(merge_patch),
+        summary_addition, worker_id,
+    )
@@ -0,0 +1,108 @@
+"""
+Records MCP tool calls as JSON lines, for benchmarks.loadgen to replay.
+
+Enabled by TOOL_TRACE_PATH. Each line holds the session key, start time, tool
+name, arguments and duration. Calls are grouped into sessions by the
+X-Trace-Session request header (falling back to Mcp-Session-Id, then the client
+address). For calls whose result introduces an inquiry (create_buyer_inquiry,
+claim_vendor_work), the inquiry ID is recorded as `result_id`, so a replay can
+map it to the ID its own call returns.
+"""
+import os
+import re
+import json
+import time
+import inspect
+import logging
+import functools
+import threading
+from typing import Any, Callable, Optional
+
+from mcp.server.lowlevel.server import request_ctx
+from mcp.types import CallToolResult
+
+from puddle_server.output_modes import result_text
+
+logger = logging.getLogger(__name__)
+
+# JSON-lines trace file; empty disables recording
+TOOL_TRACE_PATH = os.environ.get("TOOL_TRACE_PATH", "")
+TRACE_SESSION_HEADER = "x-trace-session"
+
+RESULT_ID_TOOLS = ("create_buyer_inquiry", "claim_vendor_work")
+_CREATED_ID = re.compile(r"ID: ([0-9a-fA-F-]{36})")
+# First row of a compact table (see puddle_server.output_modes)
+_COMPACT_ROW_ID = re.compile(r"^([0-9a-fA-F-]{36}) \|", re.MULTILINE)
+
+
+def result_id(tool: str, result: Any) -> Optional[str]:
+    """The inquiry a create/claim result refers to (the first one for multi-item claims)."""
+    if tool not in RESULT_ID_TOOLS:
+        return None
+    if isinstance(result, CallToolResult):
+        result = result_text(result)
+    if not isinstance(result, str):
+        return None
+    if result.startswith(("[", "{")):
+        # A JSON list of items, or structured output mode's {"items": [...]}
+        try:
+            items = json.loads(result)
+            return str((items["items"] if isinstance(items, dict) else items)[0]["id"])
+        except (ValueError, LookupError, TypeError):
+            return None
+    match = _CREATED_ID.search(result) or _COMPACT_ROW_ID.search(result)
+    return match.group(1) if match else None
+
+
+def _session_key() -> str:
+    try:
+        request = request_ctx.get().request
+    except LookupError:
+        return "local"
+    if request is None:
+        return "local"
+    key = request.headers.get(TRACE_SESSION_HEADER) or request.headers.get("mcp-session-id")
+    if key:
+        return key
+    return f"{request.client.host}:{request.client.port}" if request.client else "unknown"
+
+
+_lock = threading.Lock()
+_file = None
+
+
+def _write(entry: dict):
+    global _file
+    try:
+        with _lock:
+            if _file is None:
+                _file = open(TOOL_TRACE_PATH, "a", buffering=1)
+            _file.write(json.dumps(entry, default=str) + "\n")
+    except OSError as e:
+        logger.error("Tool trace write error: %s", e)
+
+
+def record_tool(func: Callable, name: str) -> Callable:
+    """Wraps an async tool to append every call to TOOL_TRACE_PATH (a no-op when unset)."""
+    if not TOOL_TRACE_PATH or not inspect.iscoroutinefunction(func):
+        return func
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started_at = time.time()
+        t0 = time.perf_counter()
+        result = await func(*args, **kwargs)
+        entry = {
+            "session": _session_key(),
+            "at": started_at,
+            "tool": name,
+            "args": kwargs,
+            "duration_ms": round((time.perf_counter() - t0) * 1000, 3),
+        }
+        rid = result_id(name, result)
+        if rid:
+            entry["result_id"] = rid
+        _write(entry)
+        return result
+
+    return wrapper
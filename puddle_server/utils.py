@@ -1,68 +1,255 @@
 import os
+import time
+import logging
+import random
+import asyncio
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 import psycopg2
 from psycopg2.extras import RealDictCursor
-import json
+from psycopg.rows import dict_row
 from google import genai
 from google.genai import types
 from dotenv import load_dotenv
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from puddle_server.db_pool import get_pool, SYNC_DATABASE_URL
+from puddle_server.async_db_pool import get_async_pool
+from puddle_server.embedding_cache import get_embedding_cache, make_key
+from puddle_server.metrics import record_db, record_embedding, record_pool_wait, row_count
+from puddle_server.slow_queries import observe_query
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
-DATABASE_URL = os.environ.get("DATABASE_URL")
+
+# 'psycopg' runs async tools on the psycopg 3 async pool;
+# 'threadpool' runs them on the sync pool via the bounded worker threads below.
+DB_ASYNC_DRIVER = os.environ.get("DB_ASYNC_DRIVER", "psycopg")
+SYNC_WORKER_THREADS = int(os.environ.get("SYNC_WORKER_THREADS", 8))
+
+# 'gemini' (default) or 'fake' for the deterministic local client
+EMBEDDING_CLIENT = os.environ.get("EMBEDDING_CLIENT", "gemini")
+
+# Batch embedding limits (Gemini accepts up to 100 texts per embed_content request)
+EMBEDDING_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", 100))
+EMBEDDING_BATCH_MAX_CHARS = int(os.environ.get("EMBEDDING_BATCH_MAX_CHARS", 200_000))
+EMBEDDING_BATCH_CONCURRENCY = int(os.environ.get("EMBEDDING_BATCH_CONCURRENCY", 4))
+EMBEDDING_MAX_RETRIES = int(os.environ.get("EMBEDDING_MAX_RETRIES", 4))
 
 # Initialize Gemini Client
-client = genai.Client(api_key=GEMINI_API_KEY)
+if EMBEDDING_CLIENT == "fake":
+    from puddle_server.fake_embeddings import FakeEmbeddingClient
+    client = FakeEmbeddingClient()
+else:
+    client = genai.Client(api_key=GEMINI_API_KEY)
+
+def set_embedding_client(new_client):
+    """
+    Replaces the embedding client (e.g. with fake_embeddings.FakeEmbeddingClient in tests and benchmarks).
+    """
+    global client
+    client = new_client
+
+# Bounded pool for blocking work called from async tools
+_sync_executor = ThreadPoolExecutor(max_workers=SYNC_WORKER_THREADS, thread_name_prefix="puddle-sync")
+
+async def run_in_worker(func, *args, **kwargs):
+    """
+    Runs a blocking function on the bounded worker thread pool so it does not stall the event loop.
+    The caller's context goes along, so DB and embedding time is attributed to the calling tool.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_sync_executor, functools.partial(context.run, func, *args, **kwargs))
+
+def submit_to_worker(func, *args, **kwargs):
+    """
+    Fire-and-forget counterpart of run_in_worker, for blocking work the caller does not wait
+    for (e.g. background cache writes). Returns the concurrent.futures.Future.
+    """
+    context = contextvars.copy_context()
+    return _sync_executor.submit(context.run, func, *args, **kwargs)
 
 def get_db_connection():
-    """Establishes a connection to the PostgreSQL database."""
+    """
+    Opens a dedicated (non-pooled) connection to the PostgreSQL database.
+    Tools should go through run_pg_sql, which borrows connections from the shared pool.
+    """
     try:
-        # FIX: psycopg2 does not support 'postgresql+asyncpg://' scheme.
-        # We replace it with 'postgresql://' to make it compatible.
-        sync_db_url = DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://")
-        
-        conn = psycopg2.connect(sync_db_url)
-        return conn
+        return psycopg2.connect(SYNC_DATABASE_URL)
     except Exception as e:
-        print(f"Database connection error: {e}")
+        logger.error("Database connection error: %s", e)
         raise e
 
-def run_pg_sql(query: str, params: tuple = None, fetch_one: bool = False):
+def _settings_statement(settings: Dict[str, Any]):
+    """
+    Builds one statement applying transaction-local settings (e.g. hnsw.ef_search),
+    so they only affect the query that follows in the same transaction.
+    """
+    sql = "SELECT " + ", ".join(["set_config(%s, %s, true)"] * len(settings))
+    params = []
+    for name, value in settings.items():
+        params.extend([name, str(value)])
+    return sql, tuple(params)
+
+def _finish_query(t0: float, query: str, params, settings, result=None, error: bool = False):
+    """
+    Reports a finished statement to the metrics and the slow-query log.
+    `t0` is taken once the connection is checked out, so pool wait does not rank statements as slow.
+    """
+    seconds = time.perf_counter() - t0
+    rows = row_count(result)
+    record_db(seconds, rows, error=error, statement=query)
+    observe_query(query, params, seconds, rows, settings, error)
+
+def run_pg_sql(query: str, params: tuple = None, fetch_one: bool = False, settings: Dict[str, Any] = None):
     """
     Executes a SQL query and returns the results as a dictionary.
-    Handles connection opening/closing automatically.
+    Borrows a connection from the shared pool and returns it automatically.
+    `settings` are applied with SET LOCAL semantics for this query only.
     """
-    conn = get_db_connection()
-    try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(query, params)
-            
-            # handling cases where no result is returned (e.g. INSERT/UPDATE)
-            if cur.description is None:
+    wait_start = time.perf_counter()
+    with get_pool().connection() as conn:
+        t0 = time.perf_counter()
+        record_pool_wait(t0 - wait_start)
+        try:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                if settings:
+                    cur.execute(*_settings_statement(settings))
+                cur.execute(query, params)
+                
+                # handling cases where no result is returned (e.g. INSERT/UPDATE)
+                if cur.description is None:
+                    conn.commit()
+                    _finish_query(t0, query, params, settings)
+                    return {"status": "success"}
+
+                if fetch_one:
+                    result = cur.fetchone()
+                else:
+                    result = cur.fetchall()
+                
                 conn.commit()
-                return {"status": "success"}
+                _finish_query(t0, query, params, settings, result)
+                
+                # Convert RealDictRow to standard dict for JSON serialization
+                if isinstance(result, list):
+                    return [dict(row) for row in result]
+                elif result:
+                    return dict(result)
+                return None
+                
+        except Exception as e:
+            if not conn.closed:
+                conn.rollback()
+            _finish_query(t0, query, params, settings, error=True)
+            logger.error("SQL Error: %s", e)
+            raise e
+
+async def run_pg_sql_async(query: str, params: tuple = None, fetch_one: bool = False, settings: Dict[str, Any] = None):
+    """
+    Async counterpart of run_pg_sql with the same return conventions.
+    Uses the psycopg 3 async pool, or offloads run_pg_sql to the worker threads
+    when DB_ASYNC_DRIVER=threadpool.
+    """
+    if DB_ASYNC_DRIVER == "threadpool":
+        return await run_in_worker(run_pg_sql, query, params, fetch_one, settings)
+
+    pool = await get_async_pool()
+    wait_start = time.perf_counter()
+    async with pool.connection() as conn:
+        t0 = time.perf_counter()
+        record_pool_wait(t0 - wait_start)
+        try:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                if settings:
+                    # Pipelined with the query, so the settings cost no extra round trip
+                    async with conn.pipeline():
+                        await cur.execute(*_settings_statement(settings))
+                        await cur.execute(query, params)
+                else:
+                    await cur.execute(query, params)
 
-            if fetch_one:
-                result = cur.fetchone()
-            else:
-                result = cur.fetchall()
-            
+                # handling cases where no result is returned (e.g. INSERT/UPDATE)
+                if cur.description is None:
+                    await conn.commit()
+                    _finish_query(t0, query, params, settings)
+                    return {"status": "success"}
+
+                if fetch_one:
+                    result = await cur.fetchone()
+                else:
+                    result = await cur.fetchall()
+
+                await conn.commit()
+                _finish_query(t0, query, params, settings, result)
+                return result
+
+        except Exception as e:
+            if not conn.closed:
+                await conn.rollback()
+            _finish_query(t0, query, params, settings, error=True)
+            logger.error("SQL Error: %s", e)
+            raise e
+
+def run_pg_sql_with_followup(query: str, params: tuple, followup: str, followup_params: tuple):
+    """
+    Runs `query` and then the `followup` read in one transaction and returns the first row
+    of each (None where there is none). Under READ COMMITTED the followup takes a fresh
+    snapshot, so it sees rows that concurrent writers committed while `query` ran.
+    """
+    wait_start = time.perf_counter()
+    with get_pool().connection() as conn:
+        t0 = time.perf_counter()
+        record_pool_wait(t0 - wait_start)
+        try:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(query, params)
+                result = cur.fetchone() if cur.description is not None else None
+                cur.execute(followup, followup_params)
+                current = cur.fetchone()
             conn.commit()
-            
-            # Convert RealDictRow to standard dict for JSON serialization
-            if isinstance(result, list):
-                return [dict(row) for row in result]
-            elif result:
-                return dict(result)
-            return None
-            
-    except Exception as e:
-        conn.rollback()
-        print(f"SQL Error: {e}")
-        raise e
-    finally:
-        conn.close()
+            _finish_query(t0, query, params, None, result)
+            return (dict(result) if result else None), (dict(current) if current else None)
+        except Exception as e:
+            if not conn.closed:
+                conn.rollback()
+            _finish_query(t0, query, params, None, error=True)
+            logger.error("SQL Error: %s", e)
+            raise e
+
+async def run_pg_sql_with_followup_async(query: str, params: tuple, followup: str, followup_params: tuple):
+    """
+    Async counterpart of run_pg_sql_with_followup. Both statements are pipelined, so the
+    followup costs no extra round trip.
+    """
+    if DB_ASYNC_DRIVER == "threadpool":
+        return await run_in_worker(run_pg_sql_with_followup, query, params, followup, followup_params)
+
+    pool = await get_async_pool()
+    wait_start = time.perf_counter()
+    async with pool.connection() as conn:
+        t0 = time.perf_counter()
+        record_pool_wait(t0 - wait_start)
+        try:
+            async with conn.cursor(row_factory=dict_row) as cur, conn.cursor(row_factory=dict_row) as followup_cur:
+                async with conn.pipeline():
+                    await cur.execute(query, params)
+                    await followup_cur.execute(followup, followup_params)
+                result = await cur.fetchone() if cur.description is not None else None
+                current = await followup_cur.fetchone()
+            await conn.commit()
+            _finish_query(t0, query, params, None, result)
+            return result, current
+        except Exception as e:
+            if not conn.closed:
+                await conn.rollback()
+            _finish_query(t0, query, params, None, error=True)
+            logger.error("SQL Error: %s", e)
+            raise e
 
 def get_embedding(
         text: str,     
@@ -71,7 +258,15 @@ def get_embedding(
     ) -> List[float]:
     """
     Generates an embedding vector for the given text using Gemini.
+    Repeated (normalized) texts are served from the embedding cache without a network call.
     """
+    cache = get_embedding_cache()
+    key = make_key(text, model, output_dim)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    t0 = time.perf_counter()
     try:
         # Using the model specified in your schema default
         # Ensure you are using a model you have access to, e.g., 'text-embedding-004'
@@ -83,8 +278,197 @@ def get_embedding(
 				output_dimensionality=output_dim,
 			),
         )
-        return result.embeddings[0].values
+        values = result.embeddings[0].values
     except Exception as e:
-        print(f"Embedding Error: {e}")
+        record_embedding(time.perf_counter() - t0, error=True)
+        logger.error("Embedding Error: %s", e)
         # Return a zero vector or handle specific error logic
-        return []
\ No newline at end of file
+        return []
+    record_embedding(time.perf_counter() - t0)
+
+    cache.put(key, values)
+    return values
+
+async def get_embedding_async(
+        text: str,
+        model: str = "gemini-embedding-001",
+        output_dim: int = 1536
+    ) -> List[float]:
+    """
+    Async counterpart of get_embedding using the Gemini client's native async API.
+    The in-process cache tier is checked inline; the persistent tier runs on the worker threads.
+    """
+    cache = get_embedding_cache()
+    key = make_key(text, model, output_dim)
+    cached = cache.get_memory(key)
+    if cached is None and cache.persistent is not None:
+        cached = await run_in_worker(cache.get_persistent, key)
+    if cached is not None:
+        return cached
+    cache.record_miss()
+
+    t0 = time.perf_counter()
+    try:
+        result = await client.aio.models.embed_content(
+            model=model,
+            contents=text,
+            config=types.EmbedContentConfig(
+                task_type="SEMANTIC_SIMILARITY",
+                output_dimensionality=output_dim,
+            ),
+        )
+        values = result.embeddings[0].values
+    except Exception as e:
+        record_embedding(time.perf_counter() - t0, error=True)
+        logger.error("Embedding Error: %s", e)
+        return []
+    record_embedding(time.perf_counter() - t0)
+
+    cache.put_memory(key, values)
+    if cache.persistent is not None:
+        # Persist in the background; the caller can start its search right away
+        asyncio.get_running_loop().run_in_executor(_sync_executor, cache.put_persistent, key, values)
+    return values
+
+def _retry_delay(attempt: int) -> float:
+    """Exponential backoff with jitter before retry `attempt` + 1 of an embedding request."""
+    return min(30.0, 0.5 * 2 ** attempt) * (0.5 + random.random())
+
+async def get_embeddings_async(
+        texts: List[str],
+        model: str = "gemini-embedding-001",
+        output_dim: int = 1536,
+        max_retries: int = EMBEDDING_MAX_RETRIES
+    ) -> List[Optional[List[float]]]:
+    """
+    Async counterpart of get_embeddings_batch for the few texts of one tool call.
+    Cached texts are served from the embedding cache; the rest go out in a single
+    embed_content request (or as few as the batch limits allow), retried with the
+    same backoff as get_embeddings_batch.
+
+    Returns:
+        One vector per input text, None where embedding failed.
+    """
+    cache = get_embedding_cache()
+    keys = [make_key(text, model, output_dim) for text in texts]
+    embeddings: List[Optional[List[float]]] = [cache.get_memory(key) for key in keys]
+    if cache.persistent is not None:
+        for i, key in enumerate(keys):
+            if embeddings[i] is None:
+                embeddings[i] = await run_in_worker(cache.get_persistent, key)
+
+    missing = [i for i, vector in enumerate(embeddings) if vector is None]
+    for _ in missing:
+        cache.record_miss()
+    config = types.EmbedContentConfig(
+        task_type="SEMANTIC_SIMILARITY",
+        output_dimensionality=output_dim,
+    )
+
+    async def embed_chunk(indices: List[int]):
+        for attempt in range(max_retries + 1):
+            t0 = time.perf_counter()
+            try:
+                result = await client.aio.models.embed_content(
+                    model=model,
+                    contents=[texts[missing[i]] for i in indices],
+                    config=config,
+                )
+                if len(result.embeddings) != len(indices):
+                    raise ValueError(f"Expected {len(indices)} embeddings, got {len(result.embeddings)}")
+                break
+            except Exception as e:
+                record_embedding(time.perf_counter() - t0, texts=len(indices), error=True)
+                if attempt == max_retries:
+                    logger.error("Embedding Error (batch of %d): %s", len(indices), e)
+                    return
+                await asyncio.sleep(_retry_delay(attempt))
+        record_embedding(time.perf_counter() - t0, texts=len(indices))
+        for i, emb in zip(indices, result.embeddings):
+            key = keys[missing[i]]
+            embeddings[missing[i]] = emb.values
+            cache.put_memory(key, emb.values)
+            if cache.persistent is not None:
+                asyncio.get_running_loop().run_in_executor(_sync_executor, cache.put_persistent, key, emb.values)
+
+    chunks = _chunk_texts([texts[i] for i in missing], EMBEDDING_BATCH_SIZE, EMBEDDING_BATCH_MAX_CHARS)
+    await asyncio.gather(*(embed_chunk(chunk) for chunk in chunks))
+    return embeddings
+
+def _chunk_texts(texts: List[str], batch_size: int, max_chars: int) -> List[List[int]]:
+    """
+    Groups text indices into requests of at most batch_size texts and roughly max_chars characters.
+    A single text longer than max_chars gets a request of its own.
+    """
+    chunks, current, current_chars = [], [], 0
+    for i, text in enumerate(texts):
+        size = len(text)
+        if current and (len(current) >= batch_size or current_chars + size > max_chars):
+            chunks.append(current)
+            current, current_chars = [], 0
+        current.append(i)
+        current_chars += size
+    if current:
+        chunks.append(current)
+    return chunks
+
+def get_embeddings_batch(
+        texts: List[str],
+        model: str = "gemini-embedding-001",
+        output_dim: int = 1536,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+        max_chars: int = EMBEDDING_BATCH_MAX_CHARS,
+        max_concurrency: int = EMBEDDING_BATCH_CONCURRENCY,
+        max_retries: int = EMBEDDING_MAX_RETRIES,
+    ) -> Dict[str, Any]:
+    """
+    Embeds many texts with as few embed_content requests as possible.
+
+    Texts are packed into size-aware requests that run with bounded concurrency.
+    Each request is retried with exponential backoff; a request that still fails
+    only fails its own texts.
+
+    Returns:
+        {"embeddings": [vector or None per input text], "errors": {index: "error message"}}
+    """
+    embeddings: List[Optional[List[float]]] = [None] * len(texts)
+    errors: Dict[int, str] = {}
+    config = types.EmbedContentConfig(
+        task_type="SEMANTIC_SIMILARITY",
+        output_dimensionality=output_dim,
+    )
+
+    def embed_chunk(indices: List[int]):
+        for attempt in range(max_retries + 1):
+            t0 = time.perf_counter()
+            try:
+                result = client.models.embed_content(
+                    model=model,
+                    contents=[texts[i] for i in indices],
+                    config=config,
+                )
+                if len(result.embeddings) != len(indices):
+                    raise ValueError(f"Expected {len(indices)} embeddings, got {len(result.embeddings)}")
+                for i, emb in zip(indices, result.embeddings):
+                    embeddings[i] = emb.values
+                record_embedding(time.perf_counter() - t0, texts=len(indices))
+                return
+            except Exception as e:
+                record_embedding(time.perf_counter() - t0, texts=len(indices), error=True)
+                if attempt == max_retries:
+                    logger.error("Embedding Error (batch of %d): %s", len(indices), e)
+                    for i in indices:
+                        errors[i] = str(e)
+                    return
+                time.sleep(_retry_delay(attempt))
+
+    chunks = _chunk_texts(texts, batch_size, max_chars)
+    if len(chunks) == 1:
+        embed_chunk(chunks[0])
+    elif chunks:
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="puddle-embed") as pool:
+            # One context copy per request, so their timings count towards the calling tool
+            contexts = [contextvars.copy_context() for _ in chunks]
+            list(pool.map(lambda ctx, chunk: ctx.run(embed_chunk, chunk), contexts, chunks))
+
+    return {"embeddings": embeddings, "errors": errors}
@@ -0,0 +1,444 @@
+"""
+In-process exact vector search over a memory-mapped NumPy snapshot of the dataset embeddings.
+
+With VECTOR_SEARCH_BACKEND=numpy, unfiltered semantic searches skip the pgvector
+query. The embeddings of all searchable datasets, L2-normalized, form one
+contiguous matrix that is memory-mapped from VECTOR_SNAPSHOT_DIR, so every worker
+on a host shares a single copy in the page cache. A search is a blocked matrix
+product followed by `argpartition` top-k. It is exact, not approximate, for the
+stored precision: float32, float16 (half the size) or int8 with a per-row scale
+(a quarter of the size).
+
+The snapshot is built offline and stamped with a fingerprint of the searchable
+rows and their embedding hashes:
+
+    python -m puddle_server.vector_engine                 # float32
+    python -m puddle_server.vector_engine --dtype int8    # int8 with per-row scales
+
+Running servers pick up a rebuilt snapshot by itself. They re-check the
+fingerprint every VECTOR_SNAPSHOT_CHECK_SECONDS and right after catalog change
+and embedding change notifications (the latter sent when a backfill re-embeds
+rows). While the fingerprint differs, searches go to pgvector. Filtered
+searches always go to pgvector, which applies the filters inside its index scan.
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+import argparse
+import contextlib
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+
+from puddle_server.utils import run_pg_sql_async, run_in_worker, get_db_connection
+from puddle_server.events import CATALOG_EVENTS_CHANNEL, EMBEDDING_EVENTS_CHANNEL, register_listener
+
+try:
+    import numpy as np
+except ImportError:  # only needed for VECTOR_SEARCH_BACKEND=numpy
+    np = None
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# 'pgvector' (default) or 'numpy' to serve unfiltered semantic searches from the snapshot
+VECTOR_SEARCH_BACKEND = os.environ.get("VECTOR_SEARCH_BACKEND", "pgvector")
+VECTOR_SNAPSHOT_DIR = os.environ.get("VECTOR_SNAPSHOT_DIR", ".vector_snapshot")
+# How often running servers compare the snapshot fingerprint with the database
+VECTOR_SNAPSHOT_CHECK_SECONDS = float(os.environ.get("VECTOR_SNAPSHOT_CHECK_SECONDS", 60))
+# Rows multiplied per block; bounds the float32 copies made for float16/int8 snapshots
+VECTOR_ENGINE_BLOCK_ROWS = int(os.environ.get("VECTOR_ENGINE_BLOCK_ROWS", 65536))
+# The engine's float32 distances and pgvector's differ in their last bits, so a page cursor
+# resumes this far before its last distance, skipping the rows it already returned there.
+# float16 and int8 snapshots approximate distances further and need a wider window.
+VECTOR_CURSOR_WINDOW = float(os.environ.get("VECTOR_CURSOR_WINDOW", 1e-5))
+
+SNAPSHOT_DTYPES = ("float32", "float16", "int8")
+META_FILE = "meta.json"
+
+# Searchable rows in id order; repeatable-read with SNAPSHOT_ROWS_SQL so both see the same rows
+FINGERPRINT_SQL = """
+    SELECT count(*) as rows,
+           md5(coalesce(string_agg(id::text || ':' || coalesce(embedding_hash, ''), ',' ORDER BY id), '')) as digest
+    FROM datasets
+    WHERE visibility = 'public' AND status = 'active' AND embedding IS NOT NULL;
+"""
+
+SNAPSHOT_ROWS_SQL = """
+    SELECT id, embedding::real[]
+    FROM datasets
+    WHERE visibility = 'public' AND status = 'active' AND embedding IS NOT NULL
+    ORDER BY id
+"""
+
+ROWS_BY_ID_SQL = """
+    SELECT d.id, d.title, d.description, v.name as vendor_name, d.domain, d.pricing_model
+    FROM datasets d
+    JOIN vendors v ON d.vendor_id = v.id
+    WHERE d.id = ANY(%s::uuid[]) AND d.visibility = 'public' AND d.status = 'active';
+"""
+
+
+def _fingerprint(row: Dict[str, Any]) -> str:
+    return f"{row['rows']}:{row['digest']}"
+
+# ==========================================
+# SNAPSHOT
+# ==========================================
+
+class VectorSnapshot:
+    """One memory-mapped snapshot: normalized embeddings, their dataset IDs and (int8) row scales."""
+
+    def __init__(self, directory: str, meta: Dict[str, Any]):
+        self.meta = meta
+        self.fingerprint = meta["fingerprint"]
+        self.dtype = meta["dtype"]
+        self.matrix = np.load(os.path.join(directory, meta["matrix"]), mmap_mode="r")
+        self.ids = np.load(os.path.join(directory, meta["ids"]), mmap_mode="r")
+        self.scales = np.load(os.path.join(directory, meta["scales"]), mmap_mode="r") if meta.get("scales") else None
+        self.rows, self.dims = self.matrix.shape
+
+    def scores(self, queries: "np.ndarray") -> "np.ndarray":
+        """Cosine similarity of every row with each (normalized) query: shape (rows, queries)."""
+        out = np.empty((self.rows, queries.shape[0]), dtype=np.float32)
+        for start in range(0, self.rows, VECTOR_ENGINE_BLOCK_ROWS):
+            stop = min(start + VECTOR_ENGINE_BLOCK_ROWS, self.rows)
+            block = self.matrix[start:stop]
+            if block.dtype != np.float32:
+                block = block.astype(np.float32)
+            np.matmul(block, queries.T, out=out[start:stop])
+            if self.scales is not None:
+                out[start:stop] *= self.scales[start:stop, None]
+        return out
+
+    def search(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        limit: int,
+        after: Optional[Dict[str, Any]] = None
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        Top `limit` (dataset ID, cosine distance) per query, ordered by distance, id like the
+        SQL path. `after` resumes a page the same way semantic_search_rows does, including
+        cursors issued by it.
+        """
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
+        all_scores = self.scores(queries)
+
+        results = []
+        for column in range(queries.shape[0]):
+            distances = 1.0 - all_scores[:, column].astype(np.float64)
+            if after:
+                distances = self._skip_seen(distances, float(after["distance"]), set(after.get("ties", [])))
+            k = min(limit, self.rows)
+            if k <= 0:
+                results.append([])
+                continue
+            # argpartition finds the k-th distance; rows tied with it are then ranked by id
+            kth = distances[np.argpartition(distances, k - 1)[k - 1]]
+            top = np.concatenate([np.nonzero(distances < kth)[0], np.nonzero(distances == kth)[0]])
+            hits = [(self.dataset_id(i), float(distances[i])) for i in top if np.isfinite(distances[i])]
+            hits.sort(key=lambda hit: (hit[1], uuid.UUID(hit[0])))
+            results.append(hits[:k])
+        return results
+
+    def _skip_seen(self, distances: "np.ndarray", after_distance: float, ties: set) -> "np.ndarray":
+        """Excludes rows before the cursor's window, and the rows already returned inside it."""
+        distances = distances.copy()
+        distances[distances < after_distance - VECTOR_CURSOR_WINDOW] = np.inf
+        for i in np.nonzero(np.isfinite(distances) & (distances <= after_distance + VECTOR_CURSOR_WINDOW))[0]:
+            if self.dataset_id(i) in ties:
+                distances[i] = np.inf
+        return distances
+
+    def dataset_id(self, index: int) -> str:
+        return str(uuid.UUID(bytes=bytes(self.ids[index])))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "dims": self.dims,
+            "dtype": self.dtype,
+            "matrix_bytes": int(self.matrix.nbytes),
+            "built_at": self.meta.get("built_at"),
+            "fingerprint": self.fingerprint,
+        }
+
+
+def load_snapshot(directory: str = VECTOR_SNAPSHOT_DIR) -> Optional[VectorSnapshot]:
+    try:
+        with open(os.path.join(directory, META_FILE)) as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        return None
+    return VectorSnapshot(directory, meta)
+
+
+def build_snapshot(directory: str = VECTOR_SNAPSHOT_DIR, dtype: str = "float32", batch_size: int = 5000) -> Dict[str, Any]:
+    """
+    Writes a snapshot of the searchable embeddings from one consistent database snapshot.
+    Files are versioned and meta.json is replaced last, so running servers never read a
+    half-written snapshot; files of older snapshots other than the previous one are removed.
+    """
+    if np is None:
+        raise RuntimeError("numpy is required to build a vector snapshot")
+    if dtype not in SNAPSHOT_DTYPES:
+        raise ValueError(f"dtype must be one of {SNAPSHOT_DTYPES}")
+    os.makedirs(directory, exist_ok=True)
+    stamp = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+    names = {"matrix": f"embeddings-{stamp}.npy", "ids": f"ids-{stamp}.npy"}
+    if dtype == "int8":
+        names["scales"] = f"scales-{stamp}.npy"
+
+    conn = get_db_connection()
+    try:
+        conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+        with conn.cursor() as cur:
+            cur.execute(FINGERPRINT_SQL)
+            rows, digest = cur.fetchone()
+            cur.execute(
+                "SELECT vector_dims(embedding) FROM datasets "
+                "WHERE visibility = 'public' AND status = 'active' AND embedding IS NOT NULL LIMIT 1"
+            )
+            first = cur.fetchone()
+        dims = first[0] if first else 0
+
+        path = lambda name: os.path.join(directory, names[name])
+        matrix = np.lib.format.open_memmap(path("matrix"), mode="w+", dtype=np.dtype(dtype), shape=(rows, dims))
+        ids = np.lib.format.open_memmap(path("ids"), mode="w+", dtype=np.uint8, shape=(rows, 16))
+        scales = np.lib.format.open_memmap(path("scales"), mode="w+", dtype=np.float32, shape=(rows,)) if dtype == "int8" else None
+
+        position = 0
+        with conn.cursor(name="vector_snapshot") as cur:
+            cur.itersize = batch_size
+            cur.execute(SNAPSHOT_ROWS_SQL)
+            while True:
+                batch = cur.fetchmany(batch_size)
+                if not batch:
+                    break
+                vectors = np.asarray([embedding for _, embedding in batch], dtype=np.float32)
+                norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+                vectors /= np.where(norms == 0, 1, norms)
+                end = position + len(batch)
+                if dtype == "int8":
+                    row_scale = np.abs(vectors).max(axis=1) / 127
+                    row_scale[row_scale == 0] = 1
+                    matrix[position:end] = np.round(vectors / row_scale[:, None]).astype(np.int8)
+                    scales[position:end] = row_scale
+                else:
+                    matrix[position:end] = vectors
+                ids[position:end] = [np.frombuffer(uuid.UUID(str(i)).bytes, dtype=np.uint8) for i, _ in batch]
+                position = end
+        conn.rollback()
+    finally:
+        conn.close()
+
+    for array in (matrix, ids, scales):
+        if array is not None:
+            array.flush()
+    meta = {
+        **names,
+        "dtype": dtype,
+        "rows": rows,
+        "dims": dims,
+        "fingerprint": _fingerprint({"rows": rows, "digest": digest}),
+        "built_at": time.time(),
+    }
+    meta_path = os.path.join(directory, META_FILE)
+    previous = {}
+    with contextlib.suppress(FileNotFoundError, ValueError), open(meta_path) as f:
+        previous = json.load(f)
+    with open(meta_path + ".tmp", "w") as f:
+        json.dump(meta, f)
+    os.replace(meta_path + ".tmp", meta_path)
+
+    # Servers may still map the previous snapshot until their next check
+    keep = set(names.values()) | {previous.get(k) for k in ("matrix", "ids", "scales")} | {META_FILE}
+    for name in os.listdir(directory):
+        if name.endswith(".npy") and name not in keep:
+            os.remove(os.path.join(directory, name))
+    return meta
+
+# ==========================================
+# SERVING
+# ==========================================
+
+class VectorEngine:
+    """Owns the mapped snapshot and whether it still matches the database."""
+
+    def __init__(self, directory: str, check_seconds: float):
+        self.directory = directory
+        self.check_seconds = check_seconds
+        self._snapshot: Optional[VectorSnapshot] = None
+        self._meta_mtime = None
+        self._fresh = False
+        self._pending: Optional[asyncio.Task] = None
+        self._check_task: Optional[asyncio.Task] = None
+        self.searches = 0
+        self.fallbacks = 0
+        self.checks = 0
+
+    @property
+    def snapshot(self) -> Optional[VectorSnapshot]:
+        """The snapshot to search, or None while it is missing or differs from the database."""
+        return self._snapshot if self._fresh else None
+
+    async def start(self):
+        register_listener(CATALOG_EVENTS_CHANNEL, self.on_catalog_event)
+        register_listener(EMBEDDING_EVENTS_CHANNEL, self.on_embedding_event)
+        await self.check()
+        if self._snapshot is None:
+            logger.warning(
+                "No vector snapshot in %s; build one with `python -m puddle_server.vector_engine`. Using pgvector.",
+                self.directory,
+            )
+        if self.check_seconds > 0:
+            self._check_task = asyncio.create_task(self._check_periodically(), name="puddle-vector-snapshot")
+
+    async def close(self):
+        for task in (self._pending, self._check_task):
+            if task:
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+
+    async def check(self):
+        """Maps a newly built snapshot if there is one, then compares its fingerprint with the database."""
+        self.checks += 1
+        try:
+            mtime = os.path.getmtime(os.path.join(self.directory, META_FILE))
+        except OSError:
+            mtime = None
+        if mtime is not None and mtime != self._meta_mtime:
+            try:
+                self._snapshot = await run_in_worker(load_snapshot, self.directory)
+                self._meta_mtime = mtime
+            except Exception as e:
+                logger.error("Vector snapshot load failed: %s", e)
+        if self._snapshot is None:
+            self._fresh = False
+            return
+        row = await run_pg_sql_async(FINGERPRINT_SQL, fetch_one=True)
+        fresh = bool(row) and _fingerprint(row) == self._snapshot.fingerprint
+        if self._fresh and not fresh:
+            logger.warning("Vector snapshot no longer matches the database; using pgvector until it is rebuilt.")
+        self._fresh = fresh
+
+    def mark_stale(self):
+        self._fresh = False
+        if self._pending is None or self._pending.done():
+            self._pending = asyncio.create_task(self.check())
+
+    def on_catalog_event(self, event: Optional[Dict[str, Any]]):
+        """Event hub listener: dataset changes (or an embedding profile switch) may add, hide or re-embed rows."""
+        if event is None or event.get("table") in ("datasets", "embedding_profile"):
+            self.mark_stale()
+
+    def on_embedding_event(self, event: Optional[Dict[str, Any]]):
+        """Event hub listener: stored embeddings changed (e.g. a backfill), or events were missed."""
+        self.mark_stale()
+
+    async def _check_periodically(self):
+        while True:
+            await asyncio.sleep(self.check_seconds)
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error("Vector snapshot check failed: %s", e)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            "backend": VECTOR_SEARCH_BACKEND,
+            "fresh": self._fresh,
+            "searches": self.searches,
+            "fallbacks": self.fallbacks,
+            "checks": self.checks,
+        }
+        if self._snapshot:
+            stats.update(self._snapshot.stats())
+        return stats
+
+
+_engine: Optional[VectorEngine] = None
+
+
+async def engine_search_rows(
+    query_embeddings: List[List[float]],
+    limit: int,
+    after: Optional[Dict[str, Any]] = None
+) -> Optional[List[List[Dict[str, Any]]]]:
+    """
+    semantic_search_rows-shaped rows for each query from the snapshot, or None when the
+    engine cannot answer (disabled, no current snapshot, other dimensions) and the caller
+    should query pgvector instead.
+    """
+    snapshot = _engine.snapshot if _engine else None
+    if snapshot is None or any(len(q) != snapshot.dims for q in query_embeddings):
+        return None
+    hits = await run_in_worker(snapshot.search, query_embeddings, limit, after)
+    ids = list({dataset_id for query_hits in hits for dataset_id, _ in query_hits})
+
+    from puddle_server.catalog_snapshot import current_snapshot
+
+    catalog = current_snapshot()
+    if catalog is not None:
+        records = (catalog.datasets.get(uuid.UUID(i)) for i in ids)
+        by_id = {str(r.id): r.as_row() for r in records if r is not None}
+    else:
+        by_id = {str(r["id"]): r for r in await run_pg_sql_async(ROWS_BY_ID_SQL, (ids,)) or []}
+    if len(by_id) < len(ids):
+        # A row was hidden or deleted after the snapshot was built
+        _engine.mark_stale()
+        _engine.fallbacks += 1
+        return None
+
+    _engine.searches += 1
+    return [
+        [{**by_id[dataset_id], "distance": distance, "similarity_score": 1 - distance} for dataset_id, distance in query_hits]
+        for query_hits in hits
+    ]
+
+
+async def start_vector_engine():
+    """Maps the snapshot when VECTOR_SEARCH_BACKEND=numpy (called from the server lifespan)."""
+    global _engine
+    if VECTOR_SEARCH_BACKEND != "numpy" or _engine is not None:
+        return
+    if np is None:
+        logger.warning("VECTOR_SEARCH_BACKEND=numpy needs numpy installed; using pgvector.")
+        return
+    _engine = VectorEngine(VECTOR_SNAPSHOT_DIR, VECTOR_SNAPSHOT_CHECK_SECONDS)
+    await _engine.start()
+
+
+async def close_vector_engine():
+    global _engine
+    if _engine is not None:
+        await _engine.close()
+        _engine = None
+
+
+def get_vector_engine_stats() -> Dict[str, Any]:
+    return _engine.stats() if _engine else {"backend": VECTOR_SEARCH_BACKEND}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=VECTOR_SNAPSHOT_DIR, help="Snapshot directory")
+    parser.add_argument("--dtype", default="float32", choices=SNAPSHOT_DTYPES, help="Stored precision")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Rows fetched per round")
+    opts = parser.parse_args()
+
+    t0 = time.perf_counter()
+    meta = build_snapshot(opts.dir, opts.dtype, opts.batch_size)
+    print(f"Vector snapshot written to {opts.dir}: {meta['rows']} rows x {meta['dims']} dims ({meta['dtype']}) in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,461 @@
+"""
+Dataset retrieval: ANN index configuration and the SQL behind the dataset search tools.
+"""
+import os
+from typing import Dict, Any, Optional, List, Sequence
+
+from dotenv import load_dotenv
+
+from puddle_server.utils import run_pg_sql_async
+from puddle_server.vector_engine import engine_search_rows, VECTOR_CURSOR_WINDOW
+from puddle_server.embedding_profiles import (
+    BINARY_RERANK_FACTOR, active_profile, binary_expression, column_type,
+)
+from puddle_server.output_modes import select_list, truncate_sql, truncate_text
+
+load_dotenv()
+
+# ANN index on datasets.embedding: 'hnsw' (default) or 'ivfflat'
+VECTOR_INDEX_TYPE = os.environ.get("VECTOR_INDEX_TYPE", "hnsw")
+
+# Build parameters (used by schema.ensure_vector_index)
+HNSW_M = int(os.environ.get("HNSW_M", 16))
+HNSW_EF_CONSTRUCTION = int(os.environ.get("HNSW_EF_CONSTRUCTION", 64))
+IVFFLAT_LISTS = int(os.environ.get("IVFFLAT_LISTS", 0))  # 0 = derive from row count
+
+# Query-time parameters: the recall/latency operating point
+HNSW_EF_SEARCH = int(os.environ.get("HNSW_EF_SEARCH", 40))
+IVFFLAT_PROBES = int(os.environ.get("IVFFLAT_PROBES", 10))
+
+# Iterative index scans (pgvector >= 0.8) keep scanning the ANN index until enough rows
+# pass the filters, instead of filtering a fixed-size candidate list. 'relaxed_order'
+# (default), 'strict_order', or 'off' for older pgvector versions.
+VECTOR_ITERATIVE_SCAN = os.environ.get("VECTOR_ITERATIVE_SCAN", "relaxed_order")
+
+# The ANN index only covers searchable rows; search queries must repeat this predicate
+# verbatim so the planner can use the partial index.
+SEARCHABLE_DATASETS_PREDICATE = "visibility = 'public' AND status = 'active'"
+
+# Full-text configuration used by datasets.search_tsv / vendors.search_tsv (see schema.py)
+TEXT_SEARCH_CONFIG = "english"
+
+# Typo tolerance of trigram lookups: minimum pg_trgm word_similarity for a fuzzy match
+TRGM_WORD_SIMILARITY_THRESHOLD = float(os.environ.get("TRGM_WORD_SIMILARITY_THRESHOLD", 0.5))
+
+# Hybrid ranking defaults: each retriever contributes weight / (RRF_K + rank)
+HYBRID_RRF_K = int(os.environ.get("HYBRID_RRF_K", 60))
+HYBRID_CANDIDATES = int(os.environ.get("HYBRID_CANDIDATES", 50))
+
+# Upper bounds for per-call overrides coming from tool arguments
+MAX_EF_SEARCH = 1000
+MAX_PROBES = 1000
+MAX_CANDIDATES = 500
+
+
+def trigram_settings() -> Dict[str, Any]:
+    """Transaction-local pg_trgm settings for fuzzy (<%) lookups."""
+    return {"pg_trgm.word_similarity_threshold": TRGM_WORD_SIMILARITY_THRESHOLD}
+
+
+def search_settings(
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+    filtered: bool = False,
+    min_candidates: int = 0
+) -> Dict[str, Any]:
+    """
+    Transaction-local settings for one vector query (see run_pg_sql's `settings`).
+    Per-call values override the server defaults and are clamped to sane bounds.
+    Filtered queries also enable iterative index scans so selective filters keep their recall.
+    `min_candidates` widens the HNSW search so deep pages still find enough neighbours.
+    """
+    if VECTOR_INDEX_TYPE == "ivfflat":
+        value = probes or IVFFLAT_PROBES
+        settings = {"ivfflat.probes": max(1, min(int(value), MAX_PROBES))}
+    else:
+        value = max(ef_search or HNSW_EF_SEARCH, min_candidates)
+        settings = {"hnsw.ef_search": max(1, min(int(value), MAX_EF_SEARCH))}
+
+    if filtered:
+        settings.update(trigram_settings())
+        if VECTOR_ITERATIVE_SCAN != "off":
+            # IVFFlat only supports relaxed ordering
+            mode = "relaxed_order" if VECTOR_INDEX_TYPE == "ivfflat" else VECTOR_ITERATIVE_SCAN
+            settings[f"{VECTOR_INDEX_TYPE}.iterative_scan"] = mode
+    return settings
+
+
+def vector_ordering(profile: Dict[str, Any], limit: int, query_vector: str = "%s"):
+    """
+    Returns (distance_sql, scan_order_sql, scan_limit) for the ANN scan of a vector query.
+    `query_vector` is the SQL for the query vector: a parameter placeholder by default
+    (each fragment then takes it as its one parameter), or a column of a query list.
+
+    Distances are always exact cosine distances at the profile's storage precision.
+    Binary profiles scan the Hamming index of the sign bits instead, for
+    BINARY_RERANK_FACTOR times the rows, and leave the final order to the exact distance.
+    """
+    query_sql = f"{query_vector}::{column_type(profile)}"
+    distance_sql = f"d.embedding <=> {query_sql}"
+    if not profile["binary"]:
+        return distance_sql, distance_sql, limit
+    scan_order_sql = f"{binary_expression(profile)} <~> binary_quantize({query_sql})"
+    return distance_sql, scan_order_sql, limit * BINARY_RERANK_FACTOR
+
+
+def build_dataset_filters(
+    domain: Optional[str] = None,
+    price_model: Optional[str] = None,
+    vendor: Optional[str] = None,
+    geography: Optional[str] = None,
+    time_range: Optional[str] = None
+):
+    """
+    Builds the optional structured predicates shared by the dataset search tools
+    (expects `datasets d JOIN vendors v`). Returns (sql_fragment, params); the
+    fragment starts with ' AND' or is empty.
+
+    Domain, pricing model and vendor match by substring or, to tolerate typos, by
+    trigram word similarity (both served by the pg_trgm GIN indexes).
+    """
+    clauses, params = [], []
+    for column, value in (("d.domain", domain), ("d.pricing_model", price_model), ("v.name", vendor)):
+        if value:
+            clauses.append(f"({column} ILIKE %s OR %s <%% {column})")
+            params.extend([f"%{value}%", value])
+    if geography:
+        clauses.append("d.geographic_coverage::text ILIKE %s")
+        params.append(f"%{geography}%")
+    if time_range:
+        clauses.append("d.temporal_coverage::text ILIKE %s")
+        params.append(f"%{time_range}%")
+
+    sql = "".join(f" AND {c}" for c in clauses)
+    return sql, params
+
+
+# Fields of dataset search results and their SQL; tools may request a subset (see output_modes)
+DATASET_RESULT_COLUMNS = {
+    "id": "d.id",
+    "title": "d.title",
+    "description": "d.description",
+    "vendor_name": "v.name",
+    "domain": "d.domain",
+    "pricing_model": "d.pricing_model",
+}
+
+
+def dataset_result_columns(
+    fields: Optional[Sequence[str]] = None,
+    compact: bool = False,
+    columns: Dict[str, str] = DATASET_RESULT_COLUMNS
+) -> str:
+    """SELECT list of dataset search results: the requested fields (all by default) and the id."""
+    return select_list(columns, fields, compact, long_fields=("description",), required=("id",))
+
+
+def vendor_join(fields: Optional[Sequence[str]], vendor: Optional[str]) -> str:
+    """The vendors join, needed only for the vendor filter or the vendor_name field."""
+    if vendor or not fields or "vendor_name" in fields:
+        return "JOIN vendors v ON d.vendor_id = v.id"
+    return ""
+
+
+def _compact_engine_rows(rows: List[Dict[str, Any]], compact: bool) -> List[Dict[str, Any]]:
+    # Engine rows are fresh dicts, so they can be truncated in place
+    if compact:
+        for row in rows:
+            row["description"] = truncate_text(row.get("description"))
+    return rows
+
+
+# ==========================================
+# PURE VECTOR SEARCH
+# ==========================================
+
+async def semantic_search_rows(
+    query_embedding: List[float],
+    limit: int,
+    domain: Optional[str] = None,
+    price_model: Optional[str] = None,
+    vendor: Optional[str] = None,
+    geography: Optional[str] = None,
+    time_range: Optional[str] = None,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+    after: Optional[Dict[str, Any]] = None,
+    fields: Optional[Sequence[str]] = None,
+    compact: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Nearest public/active datasets to the query embedding, with optional filters
+    applied inside the same ANN scan. Rows carry distance and similarity_score.
+
+    `after` resumes a previous page (see cursor_position): rows from VECTOR_CURSOR_WINDOW
+    before its last distance on, less the ids it already returned there. The ANN index
+    can only order by distance, so those are excluded by id rather than by an id range,
+    and the window lets a cursor from the in-process engine resume here and vice versa.
+
+    `fields` limits the columns read (and drops the vendors join when neither the vendor
+    name nor the vendor filter needs it); `compact` truncates descriptions in SQL.
+
+    Unfiltered searches are answered by the in-process engine when VECTOR_SEARCH_BACKEND=numpy
+    and its snapshot is current (see vector_engine). The query embedding must have been
+    built with the active embedding profile.
+    """
+    if not any((domain, price_model, vendor, geography, time_range)):
+        engine_rows = await engine_search_rows([query_embedding], limit, after)
+        if engine_rows is not None:
+            return _compact_engine_rows(engine_rows[0], compact)
+
+    filter_sql, filter_params = build_dataset_filters(domain, price_model, vendor, geography, time_range)
+    vector_param = str(query_embedding)
+    distance_sql, scan_order_sql, scan_limit = vector_ordering(active_profile(), limit)
+
+    keyset_sql, keyset_params, seen = "", [], 0
+    if after:
+        keyset_sql = (
+            f"\n              AND {distance_sql} >= %s AND d.id::text <> ALL(%s)"
+        )
+        keyset_params = [vector_param, float(after["distance"]) - VECTOR_CURSOR_WINDOW, list(after.get("ties", []))]
+        seen = int(after.get("seen", 0))
+
+    # The inner query is the (iterative) ANN scan; relaxed ordering can leave
+    # neighbours slightly out of order, so the outer query re-sorts the few rows kept
+    # (and, for binary profiles, re-ranks the Hamming candidates by exact distance).
+    sql = f"""
+        WITH nearest AS MATERIALIZED (
+            SELECT 
+                {dataset_result_columns(fields, compact)},
+                {distance_sql} as distance
+            FROM datasets d
+            {vendor_join(fields, vendor)}
+            WHERE d.visibility = 'public' 
+              AND d.status = 'active'{filter_sql}{keyset_sql}
+            ORDER BY {scan_order_sql}
+            LIMIT %s
+        )
+        SELECT *, 1 - distance as similarity_score
+        FROM nearest
+        ORDER BY distance, id
+        LIMIT %s;
+    """
+
+    # A later page skips the rows already seen inside the ANN scan, which behaves like a
+    # filter: the scan must look past them, hence iterative scans and a wider ef_search.
+    return await run_pg_sql_async(
+        sql,
+        (vector_param, *filter_params, *keyset_params, vector_param, scan_limit, limit),
+        settings=search_settings(
+            ef_search, probes,
+            filtered=bool(filter_params) or bool(after),
+            min_candidates=seen + scan_limit,
+        ),
+    )
+
+
+def cursor_position(rows: List[Dict[str, Any]], after: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    The `after` position of a semantic search page ending at rows[-1]: its distance, the ids
+    returned within two cursor windows of it (a resuming backend may see them up to one
+    window later) and the number of rows seen.
+    """
+    distance = rows[-1]["distance"]
+    floor = distance - 2 * VECTOR_CURSOR_WINDOW
+    ties = [str(row["id"]) for row in rows if row["distance"] >= floor]
+    if after and after["distance"] >= floor:
+        ties += after["ties"]
+    return {"distance": distance, "ties": ties, "seen": (after or {}).get("seen", 0) + len(rows)}
+
+
+async def batch_semantic_search_rows(
+    query_embeddings: List[List[float]],
+    limit: int,
+    domain: Optional[str] = None,
+    price_model: Optional[str] = None,
+    vendor: Optional[str] = None,
+    geography: Optional[str] = None,
+    time_range: Optional[str] = None,
+    description_chars: Optional[int] = None,
+    fields: Optional[Sequence[str]] = None
+) -> List[List[Dict[str, Any]]]:
+    """
+    semantic_search_rows for several query embeddings at once: one statement runs the
+    (filtered) ANN scan for each query vector through a LATERAL join, so a fan-out of
+    rephrased queries costs one round trip and one connection.
+
+    Returns one list of rows per query, in query order. `description_chars` cuts
+    descriptions in SQL, ending those that were cut with '...'; `fields` limits the columns read.
+    """
+    if not any((domain, price_model, vendor, geography, time_range)):
+        engine_rows = await engine_search_rows(query_embeddings, limit)
+        if engine_rows is not None:
+            if description_chars is not None:
+                for row in (row for rows in engine_rows for row in rows):
+                    row["description"] = truncate_text(row["description"], description_chars)
+            return engine_rows
+
+    filter_sql, filter_params = build_dataset_filters(domain, price_model, vendor, geography, time_range)
+    profile = active_profile()
+    distance_sql, scan_order_sql, scan_limit = vector_ordering(profile, limit, query_vector="q.embedding")
+    columns = DATASET_RESULT_COLUMNS
+    if description_chars is not None:
+        columns = {**columns, "description": truncate_sql("d.description", description_chars)}
+
+    # Each lateral subquery is the same ANN scan as semantic_search_rows, parameterized
+    # by the query row; its outer level re-sorts (or re-ranks, for binary profiles).
+    sql = f"""
+        WITH queries AS (
+            SELECT q.ord, q.embedding::{column_type(profile)} AS embedding
+            FROM unnest(%s::text[]) WITH ORDINALITY AS q(embedding, ord)
+        )
+        SELECT q.ord, hit.*, 1 - hit.distance AS similarity_score
+        FROM queries q
+        CROSS JOIN LATERAL (
+            SELECT * FROM (
+                SELECT
+                    {dataset_result_columns(fields, columns=columns)},
+                    {distance_sql} AS distance
+                FROM datasets d
+                {vendor_join(fields, vendor)}
+                WHERE d.visibility = 'public'
+                  AND d.status = 'active'{filter_sql}
+                ORDER BY {scan_order_sql}
+                LIMIT %s
+            ) candidates
+            ORDER BY distance, id
+            LIMIT %s
+        ) hit
+        ORDER BY q.ord, hit.distance, hit.id;
+    """
+    rows = await run_pg_sql_async(
+        sql,
+        ([str(e) for e in query_embeddings], *filter_params, scan_limit, limit),
+        settings=search_settings(filtered=bool(filter_params), min_candidates=scan_limit),
+    )
+
+    results: List[List[Dict[str, Any]]] = [[] for _ in query_embeddings]
+    for row in rows or []:
+        results[row.pop("ord") - 1].append(row)
+    return results
+
+
+# ==========================================
+# HYBRID (FULL-TEXT + VECTOR) SEARCH
+# ==========================================
+
+async def hybrid_search_rows(
+    query: str,
+    query_embedding: List[float],
+    limit: int,
+    vector_weight: float = 1.0,
+    text_weight: float = 1.0,
+    rrf_k: int = HYBRID_RRF_K,
+    candidates: int = HYBRID_CANDIDATES,
+    domain: Optional[str] = None,
+    price_model: Optional[str] = None,
+    vendor: Optional[str] = None,
+    geography: Optional[str] = None,
+    time_range: Optional[str] = None,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+    fields: Optional[Sequence[str]] = None,
+    compact: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Fuses a full-text candidate set with a vector candidate set by weighted
+    reciprocal rank fusion, in a single statement.
+
+    - Vector candidates: the top `candidates` rows of the ANN scan (binary embedding
+      profiles re-rank a wider Hamming candidate set by exact distance first).
+    - Text candidates: datasets whose title/domain/description match the query
+      (ranked by ts_rank_cd), plus datasets of vendors whose name or industry match.
+    - Score: vector_weight / (rrf_k + vector_rank) + text_weight / (rrf_k + text_rank).
+
+    `fields` and `compact` shape the result columns as in semantic_search_rows.
+    """
+    filter_sql, filter_params = build_dataset_filters(domain, price_model, vendor, geography, time_range)
+    candidates = max(limit, min(int(candidates), MAX_CANDIDATES))
+    distance_sql, scan_order_sql, scan_limit = vector_ordering(active_profile(), candidates)
+    ts_query = f"websearch_to_tsquery('{TEXT_SEARCH_CONFIG}', %s)"
+    # fused already carries the id
+    result_columns = {k: v for k, v in DATASET_RESULT_COLUMNS.items() if k != "id"}
+    output_sql = ", ".join(filter(None, ["f.*", dataset_result_columns(fields, compact, columns=result_columns)]))
+
+    sql = f"""
+        WITH vector_hits AS MATERIALIZED (
+            SELECT d.id, {distance_sql} AS distance
+            FROM datasets d
+            JOIN vendors v ON d.vendor_id = v.id
+            WHERE d.visibility = 'public'
+              AND d.status = 'active'{filter_sql}
+            ORDER BY {scan_order_sql}
+            LIMIT %s
+        ),
+        vector_ranked AS (
+            SELECT * FROM (
+                SELECT id, distance, row_number() OVER (ORDER BY distance, id) AS rnk
+                FROM vector_hits
+            ) ranked
+            WHERE rnk <= %s
+        ),
+        text_matches AS (
+            SELECT d.id, ts_rank_cd(d.search_tsv, {ts_query}) AS score
+            FROM datasets d
+            WHERE d.search_tsv @@ {ts_query}
+              AND d.visibility = 'public' AND d.status = 'active'
+            UNION ALL
+            -- An exact vendor hit outranks any description match
+            SELECT d.id, 1.0 AS score
+            FROM vendors vm
+            JOIN datasets d ON d.vendor_id = vm.id
+            WHERE vm.search_tsv @@ {ts_query}
+              AND d.visibility = 'public' AND d.status = 'active'
+        ),
+        text_hits AS MATERIALIZED (
+            SELECT m.id, max(m.score) AS text_score
+            FROM text_matches m
+            JOIN datasets d ON d.id = m.id
+            JOIN vendors v ON d.vendor_id = v.id
+            WHERE true{filter_sql}
+            GROUP BY m.id
+            ORDER BY text_score DESC, m.id
+            LIMIT %s
+        ),
+        text_ranked AS (
+            SELECT id, text_score, row_number() OVER (ORDER BY text_score DESC, id) AS rnk
+            FROM text_hits
+        ),
+        fused AS (
+            SELECT
+                COALESCE(vr.id, tr.id) AS id,
+                COALESCE(%s / (%s + vr.rnk), 0) + COALESCE(%s / (%s + tr.rnk), 0) AS hybrid_score,
+                1 - vr.distance AS similarity_score,
+                tr.text_score,
+                vr.rnk AS vector_rank,
+                tr.rnk AS text_rank
+            FROM vector_ranked vr
+            FULL OUTER JOIN text_ranked tr ON vr.id = tr.id
+        )
+        SELECT
+            {output_sql}
+        FROM fused f
+        JOIN datasets d ON d.id = f.id
+        {vendor_join(fields, None)}
+        ORDER BY f.hybrid_score DESC, f.id
+        LIMIT %s;
+    """
+
+    vector_param = str(query_embedding)
+    params = (
+        vector_param, *filter_params, vector_param, scan_limit, candidates,
+        query, query, query,
+        *filter_params, candidates,
+        float(vector_weight), int(rrf_k), float(text_weight), int(rrf_k),
+        limit,
+    )
+    return await run_pg_sql_async(
+        sql,
+        params,
+        settings=search_settings(ef_search, probes, filtered=bool(filter_params), min_candidates=scan_limit),
+    )
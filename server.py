@@ -2,14 +2,28 @@ import contextlib
 from fastapi import FastAPI, Request, HTTPException, status
 from dotenv import load_dotenv
 import os
+import logging
 from puddle_server.mcp import mcp
+from puddle_server.db_pool import close_pool, get_pool_stats
+from puddle_server.async_db_pool import close_async_pool, get_async_pool_stats
+from puddle_server.embedding_cache import get_embedding_cache
+from puddle_server.events import get_event_hub, close_event_hub, get_event_hub_stats
+from puddle_server.metrics import render_prometheus
+from puddle_server.slow_queries import get_slow_query_log
+from puddle_server.response_cache import get_response_cache, invalidate_vendor, invalidate_dataset
+from puddle_server.catalog_snapshot import start_catalog_snapshot, close_catalog_snapshot, get_catalog_snapshot_stats
+from puddle_server.vector_engine import start_vector_engine, close_vector_engine, get_vector_engine_stats
+from puddle_server.embedding_profiles import load_active_profile_async
 # Import tools and prompts so they register with FastMCP on load
 import puddle_server.tools.context_tools 
 import puddle_server.tools.query_tool 
 import puddle_server.tools.inquiry_tools
 # import puddle_server.prompts
 load_dotenv()
+logger = logging.getLogger(__name__)
 API_KEY = os.environ["API_KEY"]
+# Separate key for /admin routes; they are disabled when it is unset
+ADMIN_API_KEY = os.environ.get("ADMIN_API_KEY")
 
 # ASGI middleware for API key authentication
 class APIKeyMiddleware:
@@ -40,10 +54,93 @@ class APIKeyMiddleware:
 async def lifespan(app: FastAPI):
     async with contextlib.AsyncExitStack() as stack:
         await stack.enter_async_context(mcp.session_manager.run())
+        stack.callback(close_pool)
+        stack.push_async_callback(close_async_pool)
+        stack.push_async_callback(close_event_hub)
+        stack.push_async_callback(close_catalog_snapshot)
+        stack.push_async_callback(close_vector_engine)
+        try:
+            # Catalog change events keep the response cache and catalog snapshot fresh
+            await get_event_hub()
+        except Exception as e:
+            logger.warning("Event listener unavailable, cached responses expire by TTL only: %s", e)
+        # Queries are embedded with the profile the stored vectors were built with
+        await load_active_profile_async()
+        await start_catalog_snapshot()
+        await start_vector_engine()
         yield
 
 app = FastAPI(lifespan=lifespan)
 # app.add_middleware(APIKeyMiddleware)
+
+@app.get("/metrics")
+async def metrics():
+    """Per-tool calls, errors, latency, DB/embedding time, rows and response size in Prometheus format."""
+    from starlette.responses import PlainTextResponse
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/stats/db-pool")
+async def db_pool_stats():
+    """Connection pool stats (size, in-use, idle, wait time) for scraping."""
+    return {"sync": get_pool_stats(), "async": get_async_pool_stats()}
+
+@app.get("/stats/catalog-snapshot")
+async def catalog_snapshot_stats():
+    """In-memory catalog size, age, staleness and reload counters."""
+    return get_catalog_snapshot_stats()
+
+@app.get("/stats/vector-engine")
+async def vector_engine_stats():
+    """In-process vector snapshot size, precision, freshness and search/fallback counters."""
+    return get_vector_engine_stats()
+
+@app.get("/stats/embedding-cache")
+async def embedding_cache_stats():
+    """Query-embedding cache hit/miss counters."""
+    return get_embedding_cache().stats()
+
+@app.get("/stats/events")
+async def event_stats():
+    """Inquiry event listener status and waiting long-poll count."""
+    return get_event_hub_stats()
+
+@app.get("/stats/response-cache")
+async def response_cache_stats():
+    """Catalog tool response cache counters, with hit rates per tool."""
+    return get_response_cache().stats()
+
+def require_admin(request: Request):
+    """Rejects requests without `Authorization: Bearer <ADMIN_API_KEY>`."""
+    if not ADMIN_API_KEY:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Admin routes are disabled")
+    if request.headers.get("authorization", "") != f"Bearer {ADMIN_API_KEY}":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin key")
+
+@app.post("/admin/cache/invalidate")
+async def invalidate_response_cache(request: Request, vendor_id: str = None, dataset_id: str = None):
+    """Drops cached responses for a vendor and/or dataset, or everything if neither is given."""
+    require_admin(request)
+    if vendor_id:
+        invalidate_vendor(vendor_id)
+    if dataset_id:
+        invalidate_dataset(dataset_id)
+    if not vendor_id and not dataset_id:
+        get_response_cache().clear()
+    return get_response_cache().stats()
+
+@app.get("/admin/slow-queries")
+async def slow_queries(request: Request, limit: int = 50):
+    """Slowest statements (normalized SQL, timings, sampled EXPLAIN plans) and recent slow executions."""
+    require_admin(request)
+    return get_slow_query_log().snapshot(limit)
+
+@app.delete("/admin/slow-queries")
+async def reset_slow_queries(request: Request):
+    """Clears the slow-query log."""
+    require_admin(request)
+    get_slow_query_log().reset()
+    return {"status": "cleared"}
+
 app.mount("/puddle-mcp", mcp.streamable_http_app())
 
 PORT = os.environ.get("PORT", 8002)
\ No newline at end of file
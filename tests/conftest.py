@@ -0,0 +1,54 @@
+"""
+Shared fixtures. Tests that touch the database use `run` (or a fixture built on it)
+and are skipped when DATABASE_URL is not set; the others need no services.
+"""
+import os
+import asyncio
+import uuid
+
+import pytest
+
+# Deterministic local embeddings, so the tests need no API key
+os.environ.setdefault("EMBEDDING_CLIENT", "fake")
+
+
+@pytest.fixture(scope="session")
+def run():
+    """Runs a coroutine on one event loop shared by the session (the async pool is bound to it)."""
+    if not os.environ.get("DATABASE_URL"):
+        pytest.skip("DATABASE_URL is not set")
+    from puddle_server.async_db_pool import close_async_pool
+
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.run_until_complete(close_async_pool())
+    loop.close()
+
+
+@pytest.fixture
+def db_conn():
+    """A dedicated psycopg2 connection, closed afterwards."""
+    if not os.environ.get("DATABASE_URL"):
+        pytest.skip("DATABASE_URL is not set")
+    from puddle_server.utils import get_db_connection
+
+    conn = get_db_connection()
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def inquiry_id(run):
+    """A fresh 'submitted' inquiry at version 1, deleted afterwards."""
+    from puddle_server.utils import run_pg_sql_async
+    from puddle_server.tools.inquiry_tools import create_buyer_inquiry
+
+    dataset = run(run_pg_sql_async("SELECT id FROM datasets LIMIT 1", fetch_one=True))
+    if not dataset:
+        pytest.skip("No datasets in the database; seed some first")
+    message = run(create_buyer_inquiry(
+        str(uuid.uuid4()), str(dataset["id"]), str(uuid.uuid4()), {"answers": {}}, "Test inquiry created.",
+    ))
+    inquiry = message.split("ID: ")[1].split(",")[0]
+    yield inquiry
+    run(run_pg_sql_async("DELETE FROM inquiries WHERE id = %s", (inquiry,)))
@@ -0,0 +1,78 @@
+import uuid
+
+import pytest
+
+from puddle_server.utils import run_pg_sql_async
+from puddle_server.catalog_snapshot import CatalogSnapshot, float4, fuzzy_match, load_catalog_snapshot, word_similarity
+from puddle_server.tools.context_tools import _filter_datasets_sql, _search_vendors_sql
+
+
+def _vendor(name: str, industry: str = "Health") -> dict:
+    return {"id": uuid.uuid4(), "name": name, "industry_focus": industry}
+
+
+def test_names_sort_by_codepoint_like_collate_c():
+    names = ["beta Health", "Alpha Health", "Éclair Health", "alpha Health", "Zeta Health"]
+    snapshot = CatalogSnapshot([_vendor(name) for name in names], [])
+    rows = snapshot.search_vendors("Health", limit=10)
+    assert [row["name"] for row in rows] == sorted(names)
+
+
+@pytest.mark.parametrize("query", ["analytcs", "health", "Acme", "a", "-", "x%y", "x_y", "ünï", "Helthcare Analytcs", ""])
+def test_vendor_search_matches_a_full_scan(query):
+    names = [
+        "Acme Health Analytics", "Northwind Analytics Labs", "Healthline Data", "x_y Co", "xAy Weather",
+        "Ünïcode Labs", "Data-Driven Health", "Analytic Signals", "Zeta Insights",
+    ]
+    vendors = [_vendor(name, industry) for name in names for industry in ("Health", "Finance", None)]
+    expected = []
+    for vendor in vendors:
+        name_match, name_score = fuzzy_match(query, vendor["name"])
+        industry_match, industry_score = fuzzy_match(query, vendor["industry_focus"])
+        if name_match or industry_match:
+            expected.append((-max(name_score, industry_score), vendor["name"], vendor["id"]))
+    rows = CatalogSnapshot(vendors, []).search_vendors(query, limit=len(vendors))
+    assert [(-row["match_score"], row["name"], row["id"]) for row in rows] == sorted(expected)
+
+
+def test_scores_are_single_precision():
+    for query, text in (("weather", "Weather history"), ("finance", "Pioneer Finance Research 2"), ("xyz", "abc")):
+        score = word_similarity(query, text)
+        assert float4(score) == score
+
+
+@pytest.fixture
+def snapshot(run):
+    """The catalog loaded from Postgres; the scores only agree with the real pg_trgm extension."""
+    if not run(run_pg_sql_async("SELECT 1 AS installed FROM pg_extension WHERE extname = 'pg_trgm'", fetch_one=True)):
+        pytest.skip("pg_trgm is not installed")
+    return run(load_catalog_snapshot())
+
+
+def _position(row: dict, sort_field: str) -> dict:
+    return {"score": row["match_score"], sort_field: row[sort_field], "id": str(row["id"])}
+
+
+@pytest.mark.parametrize("query", ["Healthcare", "Finance", "Helthcare Analytcs"])
+def test_vendor_cursor_resumes_across_backends(run, snapshot, query):
+    expected = run(_search_vendors_sql(query, 100, None))
+    assert len(expected) > 4
+    assert [(r["id"], r["match_score"]) for r in snapshot.search_vendors(query, 100)] == \
+        [(r["id"], r["match_score"]) for r in expected]
+
+    # Page 1 from memory, page 2 from Postgres (the SQL helpers return limit + 1 rows), and the other way round
+    first = snapshot.search_vendors(query, 3)
+    second = run(_search_vendors_sql(query, 3, _position(first[-1], "name")))
+    assert [r["id"] for r in first + second[:3]] == [r["id"] for r in expected[:6]]
+    first = run(_search_vendors_sql(query, 3, None))
+    second = snapshot.search_vendors(query, 3, _position(first[2], "name"))
+    assert [r["id"] for r in first[:3] + second] == [r["id"] for r in expected[:6]]
+
+
+def test_dataset_cursor_resumes_across_backends(run, snapshot):
+    expected = run(_filter_datasets_sql("Finanse", "Subscripton", 50, None))
+    assert len(expected) > 4
+    first = snapshot.filter_datasets("Finanse", "Subscripton", 3)
+    assert [(r["id"], r["match_score"]) for r in first] == [(r["id"], r["match_score"]) for r in expected[:3]]
+    second = run(_filter_datasets_sql("Finanse", "Subscripton", 3, _position(first[-1], "title")))
+    assert [r["id"] for r in first + second[:3]] == [r["id"] for r in expected[:6]]
@@ -0,0 +1,67 @@
+import time
+import asyncio
+
+import pytest
+
+from puddle_server import cursors
+from puddle_server.cursors import InvalidCursor, decode_cursor, encode_cursor
+from puddle_server.tools.context_tools import batch_search, filter_datasets, search_datasets_semantic, search_vendors
+
+ARGS = {"query": "weather", "domain": None, "limit": 10}
+POSITION = {"score": 0.8125, "id": "5b3c9c1e-0000-0000-0000-000000000001"}
+
+
+def test_round_trip():
+    token = encode_cursor("search_datasets", ARGS, POSITION)
+    assert decode_cursor(token, "search_datasets", dict(ARGS)) == POSITION
+
+
+def test_tampered_payload_is_rejected():
+    body, signature = encode_cursor("search_datasets", ARGS, POSITION).split(".")
+    forged = cursors._b64encode(cursors._b64decode(body).replace(b"0.8125", b"0.9999"))
+    with pytest.raises(InvalidCursor, match="signature"):
+        decode_cursor(f"{forged}.{signature}", "search_datasets", ARGS)
+
+
+def test_malformed_cursor_is_rejected():
+    with pytest.raises(InvalidCursor, match="Malformed"):
+        decode_cursor("not-a-cursor", "search_datasets", ARGS)
+
+
+def test_other_tool_is_rejected():
+    token = encode_cursor("search_datasets", ARGS, POSITION)
+    with pytest.raises(InvalidCursor, match="different tool"):
+        decode_cursor(token, "list_vendors", ARGS)
+
+
+def test_other_arguments_are_rejected():
+    token = encode_cursor("search_datasets", ARGS, POSITION)
+    with pytest.raises(InvalidCursor, match="different search arguments"):
+        decode_cursor(token, "search_datasets", {**ARGS, "domain": "Finance"})
+
+
+def test_expired_cursor_is_rejected(monkeypatch):
+    token = encode_cursor("search_datasets", ARGS, POSITION)
+    now = time.time()
+    monkeypatch.setattr(cursors.time, "time", lambda: now + cursors.CURSOR_TTL_SECONDS + 1)
+    with pytest.raises(InvalidCursor, match="expired"):
+        decode_cursor(token, "search_datasets", ARGS)
+
+
+def test_other_secret_is_rejected(monkeypatch):
+    token = encode_cursor("search_datasets", ARGS, POSITION)
+    monkeypatch.setattr(cursors, "CURSOR_SECRET", b"another worker's key")
+    with pytest.raises(InvalidCursor, match="signature"):
+        decode_cursor(token, "search_datasets", ARGS)
+
+
+@pytest.mark.parametrize("call", [
+    lambda limit: search_vendors("weather", limit=limit),
+    lambda limit: filter_datasets(domain="Finance", limit=limit),
+    lambda limit: search_datasets_semantic("weather", limit=limit),
+    lambda limit: batch_search(["weather"], limit=limit),
+])
+@pytest.mark.parametrize("limit", [0, -1])
+def test_paginated_tools_reject_a_limit_below_one(call, limit):
+    # Checked before any query, so the page-size arithmetic never sees an empty page
+    assert asyncio.run(call(limit)) == "Error: limit must be at least 1."
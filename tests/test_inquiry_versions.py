@@ -0,0 +1,69 @@
+import asyncio
+import threading
+
+from puddle_server.utils import get_db_connection
+from puddle_server.tools.inquiry_tools import versioned_update, format_conflict
+
+
+def test_conflict_reports_version_of_concurrent_writer(run, inquiry_id):
+    # Writer A bumps the version and holds the row lock until B's UPDATE is waiting on it
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("UPDATE inquiries SET version = version + 1 WHERE id = %s RETURNING version", (inquiry_id,))
+            (version_a,) = cur.fetchone()
+
+        async def writer_b():
+            update = asyncio.ensure_future(
+                versioned_update(inquiry_id, 1, "summary = summary || %s", (" B.",))
+            )
+            # Commit A only once B is blocked on the row lock, i.e. after B's snapshot was taken
+            for _ in range(200):
+                await asyncio.sleep(0.01)
+                if await asyncio.to_thread(_waiting_on_lock, inquiry_id):
+                    break
+            threading.Thread(target=conn.commit).start()
+            return await update
+
+        result = run(writer_b())
+    finally:
+        conn.close()
+
+    assert result["new_version"] is None
+    assert result["current_version"] == version_a == 2
+    assert "expected_version=2" in format_conflict(result)
+
+
+def test_update_at_current_version_succeeds(run, inquiry_id):
+    result = run(versioned_update(inquiry_id, 1, "summary = summary || %s", (" A.",)))
+    assert result == {"new_version": 2, "current_version": 2, "status": "submitted"}
+
+    stale = run(versioned_update(inquiry_id, 1, "summary = summary || %s", (" B.",)))
+    assert stale["new_version"] is None
+    assert stale["current_version"] == 2
+
+
+def test_condition_failure_at_current_version(run, inquiry_id):
+    result = run(versioned_update(
+        inquiry_id, 1, "status = 'accepted'", (), " AND status = %s", ("responded",),
+    ))
+    assert result["new_version"] is None
+    assert result["current_version"] == 1
+    assert result["status"] == "submitted"
+
+
+def test_missing_inquiry(run):
+    assert run(versioned_update("00000000-0000-0000-0000-000000000000", 1, "summary = %s", ("x",))) is None
+
+
+def _waiting_on_lock(inquiry_id: str) -> bool:
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT count(*) FROM pg_stat_activity WHERE wait_event_type = 'Lock' AND query LIKE %s",
+                ("%UPDATE inquiries%",),
+            )
+            return cur.fetchone()[0] > 0
+    finally:
+        conn.close()
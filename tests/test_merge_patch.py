@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+from puddle_server.utils import run_pg_sql_async
+from puddle_server.tools.inquiry_tools import get_inquiry_full_state, patch_buyer_json
+
+
+# RFC 7396, Appendix A
+@pytest.mark.parametrize("target, patch, expected", [
+    ({"a": "b"}, {"a": "c"}, {"a": "c"}),
+    ({"a": "b"}, {"b": "c"}, {"a": "b", "b": "c"}),
+    ({"a": "b"}, {"a": None}, {}),
+    ({"a": "b", "b": "c"}, {"a": None}, {"b": "c"}),
+    ({"a": ["b"]}, {"a": "c"}, {"a": "c"}),
+    ({"a": "c"}, {"a": ["b"]}, {"a": ["b"]}),
+    ({"a": {"b": "c"}}, {"a": {"b": "d", "c": None}}, {"a": {"b": "d"}}),
+    ({"a": [{"b": "c"}]}, {"a": [1]}, {"a": [1]}),
+    (["a", "b"], ["c", "d"], ["c", "d"]),
+    ({"a": "b"}, ["c"], ["c"]),
+    ({"a": "foo"}, None, None),
+    ({"a": "foo"}, "bar", "bar"),
+    ({"e": None}, {"a": 1}, {"e": None, "a": 1}),
+    ([1, 2], {"a": "b", "c": None}, {"a": "b"}),
+    ({}, {"a": {"bb": {"ccc": None}}}, {"a": {"bb": {}}}),
+])
+def test_rfc7396_examples(run, target, patch, expected):
+    row = run(run_pg_sql_async(
+        "SELECT puddle_jsonb_merge_patch(%s::jsonb, %s::jsonb) AS result",
+        (json.dumps(target), json.dumps(patch)), fetch_one=True,
+    ))
+    # A JSON null patch arrives as jsonb 'null', which replaces the target
+    assert row["result"] == expected
+
+
+def test_patch_buyer_json_merges_into_stored_state(run, inquiry_id):
+    result = run(patch_buyer_json(inquiry_id, 1, {"budget": 500, "answers": {"q1": "yes"}}, "Buyer set a budget."))
+    assert "version: 2" in result
+    result = run(patch_buyer_json(inquiry_id, 2, {"budget": None}, "Buyer dropped the budget."))
+    assert "version: 3" in result
+
+    state = json.loads(run(get_inquiry_full_state(inquiry_id)))
+    assert state["buyer_inquiry"] == {"answers": {"q1": "yes"}}
+    assert state["summary"].endswith("Buyer set a budget. Buyer dropped the budget.")
+
+
+def test_patch_buyer_json_with_stale_version_conflicts(run, inquiry_id):
+    run(patch_buyer_json(inquiry_id, 1, {"budget": 500}, "Buyer set a budget."))
+    result = run(patch_buyer_json(inquiry_id, 1, {"budget": 900}, "Buyer raised the budget."))
+    assert result.startswith("CONFLICT")
+    assert "expected_version=2" in result
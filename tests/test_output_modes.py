@@ -0,0 +1,79 @@
+import json
+import uuid
+from decimal import Decimal
+
+from mcp.types import CallToolResult
+
+from puddle_server.output_modes import (
+    COMPACT_TEXT_CHARS, check_output, from_cached, render_record, render_records,
+    select_list, to_cached, truncate_text,
+)
+
+ROWS = [
+    {"id": uuid.UUID(int=1), "title": "Weather\nhistory", "price": Decimal("12.5"), "score": 0.91234, "tags": ["a", "b"]},
+    {"id": uuid.UUID(int=2), "title": "Tides", "price": None, "score": 0.5, "tags": []},
+]
+FIELDS = ["id", "title", "price", "score", "tags"]
+
+
+def test_text_mode_renders_one_block_per_record():
+    text = render_records(ROWS, ["title", "score"], "text", header="2 datasets")
+    assert text == "2 datasets\ntitle: Weather\nhistory\nscore: 0.9123\n---\ntitle: Tides\nscore: 0.5000"
+
+
+def test_compact_mode_renders_a_table():
+    text = render_records(ROWS, FIELDS, "compact")
+    lines = text.split("\n")
+    assert lines[0] == "id | title | price | score | tags"
+    assert lines[1] == f"{uuid.UUID(int=1)} | Weather history | 12.50 | 0.91 | a, b"
+    assert lines[2] == f"{uuid.UUID(int=2)} | Tides |  | 0.50 | "
+
+
+def test_structured_mode_returns_json_safe_items_and_cursor():
+    result = render_records(ROWS, ["id", "price"], "structured", next_cursor="abc", extra={"total": 2})
+    assert isinstance(result, CallToolResult)
+    assert result.structuredContent == {
+        "items": [{"id": str(uuid.UUID(int=1)), "price": 12.5}, {"id": str(uuid.UUID(int=2)), "price": None}],
+        "total": 2,
+        "next_cursor": "abc",
+    }
+    assert json.loads(result.content[0].text) == result.structuredContent
+
+
+def test_empty_results_and_footer():
+    assert render_records([], FIELDS, "compact", empty="No datasets.") == "No datasets."
+    assert render_records([], FIELDS, "structured").structuredContent == {"items": []}
+    assert render_records(ROWS[:1], ["title"], "text", footer="More: cursor=abc").endswith("\nMore: cursor=abc")
+
+
+def test_single_record():
+    assert render_record(ROWS[1], ["title", "price"], "text") == "title: Tides\nprice: None"
+    assert render_record(ROWS[1], ["title", "price"], "compact") == "title: Tides"
+    assert render_record(ROWS[1], ["title"], "structured").structuredContent == {"title": "Tides"}
+
+
+def test_structured_results_survive_the_response_cache():
+    result = render_records(ROWS, ["id", "score"], "structured")
+    restored = from_cached(to_cached(result))
+    assert restored.structuredContent == result.structuredContent
+    assert from_cached(to_cached("plain text")) == "plain text"
+
+
+def test_check_output():
+    assert check_output("text", None, FIELDS) is None
+    assert "Unknown output mode" in check_output("xml", None, FIELDS)
+    assert "Unknown field(s) nope" in check_output("compact", ["title", "nope"], FIELDS)
+    assert "at least one field" in check_output("text", [], FIELDS)
+
+
+def test_truncation_marks_only_text_that_was_cut():
+    assert truncate_text("x" * COMPACT_TEXT_CHARS) == "x" * COMPACT_TEXT_CHARS
+    assert truncate_text("x" * (COMPACT_TEXT_CHARS + 1)) == "x" * COMPACT_TEXT_CHARS + "..."
+    assert truncate_text(None) is None
+
+
+def test_select_list_reads_only_requested_and_required_columns():
+    columns = {"id": "d.id", "title": "d.title", "description": "d.description"}
+    assert select_list(columns, ["description"], required=["id"]) == "d.id AS id, d.description AS description"
+    compact = select_list(columns, None, compact=True, long_fields=["description"])
+    assert f"left(d.description, {COMPACT_TEXT_CHARS}) || '...'" in compact
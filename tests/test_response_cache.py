@@ -0,0 +1,145 @@
+import time
+import asyncio
+
+from puddle_server import response_cache
+from puddle_server.response_cache import (
+    DATASETS_TABLE, VENDORS_TABLE, ResponseCache, SQLiteResponseStore,
+    cached_tool, dataset_tag, tags_for_catalog_event, vendor_tag,
+)
+
+
+def test_invalidating_a_tag_drops_only_its_entries():
+    cache = ResponseCache(max_size=10, ttl=0)
+    cache.put_memory("a", "vendor A", [vendor_tag("A")], cache.generation)
+    cache.put_memory("b", "vendor B", [vendor_tag("B")], cache.generation)
+    cache.put_memory("search", "all vendors", [VENDORS_TABLE], cache.generation)
+
+    cache.invalidate([vendor_tag("A"), VENDORS_TABLE])
+
+    assert cache.get_memory("t", "a") is None
+    assert cache.get_memory("t", "search") is None
+    assert cache.get_memory("t", "b") == "vendor B"
+
+
+def test_response_computed_across_an_invalidation_is_not_stored():
+    cache = ResponseCache(max_size=10, ttl=0)
+    generation = cache.generation
+    cache.invalidate([dataset_tag("D")])
+    cache.put_memory("d", "stale dataset D", [dataset_tag("D")], generation)
+    assert cache.get_memory("t", "d") is None
+
+
+def test_lru_eviction_keeps_the_tag_index_consistent():
+    cache = ResponseCache(max_size=2, ttl=0)
+    for key in ("a", "b", "c"):
+        cache.put_memory(key, key, [dataset_tag(key)], cache.generation)
+    assert cache.get_memory("t", "a") is None
+    assert cache.stats()["evictions"] == 1
+    assert dataset_tag("a") not in cache._by_tag
+
+
+def test_shared_tier_invalidation(tmp_path):
+    store = SQLiteResponseStore(str(tmp_path / "cache.sqlite3"), ttl=0)
+    cache = ResponseCache(max_size=10, ttl=0, shared=store)
+    cache.put_shared("a", "dataset A", [dataset_tag("A"), DATASETS_TABLE], cache.generation)
+    cache.put_shared("b", "dataset B", [dataset_tag("B")], cache.generation)
+
+    # Another worker's invalidation reaches the shared file
+    ResponseCache(max_size=10, ttl=0, shared=SQLiteResponseStore(store.path, ttl=0)).invalidate([DATASETS_TABLE])
+
+    assert cache.get_shared("t", "a") is None
+    assert cache.get_shared("t", "b") == "dataset B"
+    # Shared hits are promoted into memory with their tags
+    cache.invalidate([dataset_tag("B")])
+    assert cache.get_memory("t", "b") is None
+
+
+def test_catalog_events_map_to_tags():
+    assert tags_for_catalog_event({"table": "vendors", "vendor_id": "V"}) == [vendor_tag("V"), VENDORS_TABLE]
+    assert tags_for_catalog_event({"table": "datasets", "dataset_id": "D"}) == [dataset_tag("D"), DATASETS_TABLE]
+    assert tags_for_catalog_event({"table": "dataset_columns", "dataset_id": "D"}) == [dataset_tag("D")]
+    assert tags_for_catalog_event({"table": "inquiries"}) == []
+
+
+def test_cached_tool_is_invalidated_by_tag(monkeypatch):
+    cache = ResponseCache(max_size=10, ttl=0)
+    monkeypatch.setattr(response_cache, "_cache", cache)
+    calls = []
+
+    @cached_tool(lambda dataset_id: [dataset_tag(dataset_id)])
+    async def describe(dataset_id: str) -> str:
+        calls.append(dataset_id)
+        return f"dataset {dataset_id} v{len(calls)}"
+
+    async def scenario():
+        first = await describe("D")
+        again = await describe("D")
+        response_cache.invalidate_dataset("D")
+        return first, again, await describe("D")
+
+    assert asyncio.run(scenario()) == ("dataset D v1", "dataset D v1", "dataset D v2")
+    assert calls == ["D", "D"]
+
+
+def test_cached_tool_does_not_cache_errors(monkeypatch):
+    monkeypatch.setattr(response_cache, "_cache", ResponseCache(max_size=10, ttl=0))
+    calls = []
+
+    @cached_tool(lambda dataset_id: [dataset_tag(dataset_id)])
+    async def describe(dataset_id: str) -> str:
+        calls.append(dataset_id)
+        return "Error: Dataset not found."
+
+    async def scenario():
+        await describe("D")
+        await describe("D")
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+
+
+def test_cancelled_caller_does_not_fail_the_callers_waiting_on_it(monkeypatch):
+    monkeypatch.setattr(response_cache, "_cache", ResponseCache(max_size=10, ttl=0))
+    calls = []
+
+    @cached_tool(lambda dataset_id: [dataset_tag(dataset_id)])
+    async def describe(dataset_id: str) -> str:
+        calls.append(dataset_id)
+        await asyncio.sleep(0.05)
+        return f"dataset {dataset_id}"
+
+    async def scenario():
+        leader = asyncio.create_task(describe("D"))
+        await asyncio.sleep(0.01)
+        waiters = [asyncio.create_task(describe("D")) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await asyncio.gather(*waiters)
+
+    assert asyncio.run(scenario()) == ["dataset D"] * 3
+    # One waiter took over the computation, the others shared its result
+    assert calls == ["D", "D"]
+
+
+def test_shared_tier_evicts_the_oldest_beyond_its_cap(tmp_path):
+    store = SQLiteResponseStore(str(tmp_path / "cache.sqlite3"), ttl=0, max_entries=3, evict_every=2)
+    for n in range(6):
+        store.put(f"k{n}", f"response {n}", [dataset_tag(n)])
+
+    conn = store._conn()
+    assert conn.execute("SELECT count(*) FROM response_cache").fetchone()[0] == 3
+    assert conn.execute("SELECT count(*) FROM response_cache_tags").fetchone()[0] == 3
+    assert store.get("k0") is None
+    assert store.get("k5") == ("response 5", [dataset_tag(5)])
+    assert store.evictions == 3
+
+
+def test_shared_tier_evicts_expired_entries_that_are_never_read(tmp_path, monkeypatch):
+    store = SQLiteResponseStore(str(tmp_path / "cache.sqlite3"), ttl=60, max_entries=0, evict_every=1)
+    store.put("old", "old response", [dataset_tag("old")])
+    now = time.time()
+    monkeypatch.setattr(response_cache.time, "time", lambda: now + 61)
+    store.put("new", "new response", [dataset_tag("new")])
+
+    keys = [row[0] for row in store._conn().execute("SELECT cache_key FROM response_cache")]
+    assert keys == [store._digest("new")]
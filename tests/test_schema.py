@@ -0,0 +1,75 @@
+import json
+import select
+
+from puddle_server.schema import _drop_invalid_index
+
+
+def _notifications(conn, channel: str, timeout: float = 0.2) -> list:
+    payloads = []
+    if select.select([conn], [], [], timeout) != ([], [], []):
+        conn.poll()
+    while conn.notifies:
+        notify = conn.notifies.pop(0)
+        if notify.channel == channel:
+            payloads.append(json.loads(notify.payload))
+    return payloads
+
+
+def test_catalog_trigger_skips_updates_of_ignored_columns(db_conn):
+    db_conn.autocommit = True
+    with db_conn.cursor() as cur:
+        cur.execute("SELECT id, title, embedding_hash FROM datasets LIMIT 1")
+        dataset_id, title, embedding_hash = cur.fetchone()
+        cur.execute("LISTEN puddle_catalog_events")
+        try:
+            cur.execute("UPDATE datasets SET embedding_hash = 'test' WHERE id = %s", (dataset_id,))
+            assert _notifications(db_conn, "puddle_catalog_events") == []
+
+            cur.execute("UPDATE datasets SET title = title || ' (test)' WHERE id = %s", (dataset_id,))
+            events = _notifications(db_conn, "puddle_catalog_events")
+            assert [(e["table"], e["op"], e["dataset_id"]) for e in events] == [("datasets", "update", str(dataset_id))]
+        finally:
+            cur.execute("UPDATE datasets SET title = %s, embedding_hash = %s WHERE id = %s", (title, embedding_hash, dataset_id))
+            cur.execute("UNLISTEN puddle_catalog_events")
+
+
+def test_embedding_updates_publish_one_embedding_event_per_transaction(db_conn):
+    with db_conn.cursor() as cur:
+        cur.execute("SELECT id, embedding_hash FROM datasets ORDER BY id LIMIT 2")
+        rows = cur.fetchall()
+        cur.execute("LISTEN puddle_embedding_events")
+        cur.execute("LISTEN puddle_catalog_events")
+        db_conn.commit()
+        try:
+            for dataset_id, _ in rows:
+                cur.execute("UPDATE datasets SET embedding_hash = 'test' WHERE id = %s", (dataset_id,))
+            db_conn.commit()
+            assert _notifications(db_conn, "puddle_embedding_events") == [{"table": "datasets"}]
+            assert _notifications(db_conn, "puddle_catalog_events") == []
+        finally:
+            cur.executemany("UPDATE datasets SET embedding_hash = %s WHERE id = %s", [(h, i) for i, h in rows])
+            cur.execute("UNLISTEN *")
+            db_conn.commit()
+
+
+def test_invalid_concurrent_index_is_rebuilt(db_conn):
+    db_conn.autocommit = True
+    statement = "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS puddle_test_v_idx ON puddle_test_invalid_index (v)"
+    with db_conn.cursor() as cur:
+        cur.execute("DROP TABLE IF EXISTS puddle_test_invalid_index")
+        cur.execute("CREATE TABLE puddle_test_invalid_index (v int)")
+        try:
+            # A failed concurrent build (duplicate keys) leaves an INVALID index behind
+            cur.execute("INSERT INTO puddle_test_invalid_index VALUES (1), (1)")
+            try:
+                cur.execute(statement)
+            except Exception:
+                pass
+            cur.execute("DELETE FROM puddle_test_invalid_index")
+
+            _drop_invalid_index(cur, statement, verbose=False)
+            cur.execute(statement)
+            cur.execute("SELECT indisvalid FROM pg_index WHERE indexrelid = 'puddle_test_v_idx'::regclass")
+            assert cur.fetchone()[0] is True
+        finally:
+            cur.execute("DROP TABLE puddle_test_invalid_index")
@@ -0,0 +1,70 @@
+import json
+import asyncio
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from puddle_server.utils import run_pg_sql_async
+from puddle_server.vector_search import cursor_position, semantic_search_rows
+from puddle_server.vector_engine import VectorEngine, build_snapshot, load_snapshot
+
+
+def test_embedding_event_stops_serving_the_snapshot(monkeypatch):
+    engine = VectorEngine("unused", check_seconds=0)
+    checks = []
+
+    async def check():
+        checks.append(True)
+
+    monkeypatch.setattr(engine, "check", check)
+    engine._snapshot, engine._fresh = object(), True
+
+    async def scenario():
+        engine.on_embedding_event({"table": "datasets"})
+        served = engine.snapshot
+        await engine._pending
+        return served
+
+    assert asyncio.run(scenario()) is None
+    assert checks == [True]
+
+
+@pytest.fixture
+def vector_snapshot(run, tmp_path):
+    """A float32 snapshot of the searchable embeddings, built into a temporary directory."""
+    build_snapshot(str(tmp_path))
+    snapshot = load_snapshot(str(tmp_path))
+    if snapshot.rows < 10:
+        pytest.skip("Not enough embedded datasets; seed and backfill some first")
+    return snapshot
+
+
+def test_vector_cursor_resumes_across_backends(run, vector_snapshot):
+    rows = run(run_pg_sql_async(
+        "SELECT embedding::text AS embedding FROM datasets WHERE embedding IS NOT NULL ORDER BY id LIMIT 20"
+    ))
+    # A query off the stored vectors whose nearest rows are not tied: the ANN scan cuts exact ties arbitrarily
+    for row in rows:
+        query = [x + 0.01 * (i % 7 - 3) for i, x in enumerate(json.loads(row["embedding"]))]
+        expected = run(semantic_search_rows(query, 7))
+        distances = [r["distance"] for r in expected]
+        if all(b - a > 1e-4 for a, b in zip(distances, distances[1:])):
+            break
+    else:
+        pytest.skip("No query with untied nearest rows")
+    expected = expected[:6]
+
+    def engine_rows(limit, after=None):
+        return [{"id": i, "distance": d} for i, d in vector_snapshot.search([query], limit, after)[0]]
+
+    # The distances differ in their last bits, which the cursor window absorbs
+    assert [r["distance"] for r in engine_rows(6)] == pytest.approx([r["distance"] for r in expected], abs=1e-6)
+
+    # Page 1 from the engine, page 2 from Postgres, and the other way round
+    first = engine_rows(3)
+    second = run(semantic_search_rows(query, 3, after=cursor_position(first)))
+    assert [r["id"] for r in first] + [str(r["id"]) for r in second] == [str(r["id"]) for r in expected]
+    first = run(semantic_search_rows(query, 3))
+    second = engine_rows(3, cursor_position(first))
+    assert [str(r["id"]) for r in first] + [r["id"] for r in second] == [str(r["id"]) for r in expected]
@@ -0,0 +1,24 @@
+import time
+import json
+
+from puddle_server.utils import run_pg_sql_async
+from puddle_server.events import close_event_hub
+from puddle_server.tools.inquiry_tools import claim_vendor_work, wait_for_vendor_work
+
+
+def test_wait_wakes_when_a_lease_expires(run, inquiry_id):
+    inquiry = run(run_pg_sql_async("SELECT vendor_id FROM inquiries WHERE id = %s", (inquiry_id,), fetch_one=True))
+    vendor_id = str(inquiry["vendor_id"])
+    # Lease the vendor's whole queue for a second; its expiry sends no event
+    while run(claim_vendor_work(vendor_id, "test-worker", max_items=20, lease_seconds=1)) != "No pending inquiries.":
+        pass
+
+    try:
+        t0 = time.monotonic()
+        work = run(wait_for_vendor_work(vendor_id, timeout_seconds=30))
+        waited = time.monotonic() - t0
+    finally:
+        run(close_event_hub())
+
+    assert inquiry_id in [item["id"] for item in json.loads(work)]
+    assert waited < 5